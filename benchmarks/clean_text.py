@@ -0,0 +1,99 @@
+"""Compares the fused text cleaner to the original one regex pass per removal.
+
+The input is the example document repeated up to the requested size, with URLs, emails and non-ASCII text mixed
+in. Both the one-shot and the chunked cleaner must produce exactly the reference output.
+
+    uv run python benchmarks/clean_text.py --size_mb 8
+"""
+
+import argparse
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from document_to_podcast.preprocessing.data_cleaners import (  # noqa: E402
+    clean_chunks,
+    clean_markdown,
+    clean_with_regex,
+)
+
+EXAMPLE_FILE = Path(__file__).parent.parent / "example_data" / "Mozilla-Trustworthy_AI.md"
+
+EXTRA_TEXT = (
+    "Contact: someone@example.com or visit https://example.com/path?q=1&x=%20 for more.\n"
+    "Naïve café — “quoted” text, ünïcödé and 中文 characters\t\tplus   extra   spaces.\n"
+    '![An image](https://example.com/image.png "Title") followed by text.\n'
+)
+
+
+def reference_clean_with_regex(text: str) -> str:
+    """The cleaner before fusing, one regex pass per removal."""
+    text = re.sub(r"http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\(\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+", "", text)
+    text = re.sub(r"[\w\.-]+@[\w\.-]+\.[\w]+", "", text)
+    text = re.sub(r'[^a-zA-Z0-9\s.,!?;:"\']', "", text)
+    text = re.sub(r"\s+", " ", text).strip()
+    return text
+
+
+def reference_clean_markdown(text: str) -> str:
+    text = re.sub(r'!\[.*?\]\(.*?(".*?")?\)', "", text)
+    return reference_clean_with_regex(text)
+
+
+def make_input(size_mb: float) -> str:
+    unit = EXAMPLE_FILE.read_text() + EXTRA_TEXT
+    return unit * max(1, int(size_mb * 1024 * 1024 / len(unit)))
+
+
+def best_of(fn, text: str, runs: int) -> float:
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn(text)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def chunked(markdown: bool, chunk_size: int = 4096):
+    def clean(text: str) -> str:
+        chunks = (text[i : i + chunk_size] for i in range(0, len(text), chunk_size))
+        return "".join(clean_chunks(chunks, markdown=markdown))
+
+    return clean
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size_mb", type=float, default=8)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    text = make_input(args.size_mb)
+    print(f"input: {len(text) / 1024 / 1024:.1f} MB")
+
+    failed = False
+    cases = [
+        ("regex", reference_clean_with_regex, clean_with_regex, chunked(markdown=False)),
+        ("markdown", reference_clean_markdown, clean_markdown, chunked(markdown=True)),
+    ]
+    for name, reference, fused, streaming in cases:
+        expected = reference(text)
+        for variant, fn in (("fused", fused), ("chunked", streaming)):
+            if fn(text) != expected:
+                print(f"FAIL {name} {variant}: output differs from the reference")
+                failed = True
+        before = best_of(reference, text, args.runs)
+        after = best_of(fused, text, args.runs)
+        after_chunked = best_of(streaming, text, args.runs)
+        print(
+            f"{name:9} reference {before:6.3f}s  fused {after:6.3f}s ({before / after:4.1f}x)  "
+            f"chunked {after_chunked:6.3f}s ({before / after_chunked:4.1f}x)"
+        )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
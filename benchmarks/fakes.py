@@ -0,0 +1,115 @@
+"""Deterministic stand-ins for the models, so the benchmarks measure this project's own code, not inference."""
+
+import time
+import zlib
+from collections.abc import Iterator
+
+import numpy as np
+
+
+def canned_script(turns: int, words_per_turn: int = 40) -> str:
+    """A podcast script in the format the LLM is prompted for, alternating between two speakers."""
+    lines = []
+    for turn in range(turns):
+        words = " ".join(f"word{(turn * words_per_turn + i) % 997}" for i in range(words_per_turn))
+        lines.append(f'  "Speaker {turn % 2 + 1}": "{words.capitalize()}. And that is turn {turn}!"')
+    return "{\n" + ",\n".join(lines) + "\n}"
+
+
+class FakeLlama:
+    """Mimics `llama_cpp.Llama.create_chat_completion`, replaying a fixed script one token at a time.
+
+    Tokens are the script's words with their leading whitespace. With `tokens_per_second`, token `i` is emitted
+    no earlier than `i / tokens_per_second` after the call, like a model decoding at that rate; otherwise as fast as
+    they are consumed. Like llama.cpp, the model keeps the tokens it evaluated in `input_ids`, and a completion only
+    evaluates the part of its prompt after the longest prefix already there, once the stream is iterated.
+    """
+
+    model_path = "fake.gguf"
+
+    def __init__(self, script: str, tokens_per_second: float | None = None):
+        self.script = script
+        self.tokens_per_second = tokens_per_second
+        self.tokens = self._split(script)
+        self.input_ids = np.zeros(0, dtype=np.intc)
+        self.n_tokens = 0
+
+    @staticmethod
+    def _split(text: str) -> list[str]:
+        tokens, start = [], 0
+        for index in range(1, len(text)):
+            if text[index].isspace() and not text[index - 1].isspace():
+                tokens.append(text[start:index])
+                start = index
+        tokens.append(text[start:])
+        return tokens
+
+    def tokenize(self, text: bytes, add_bos: bool = True, special: bool = False) -> list[int]:
+        # Token ids derived from the text, so that every instance tokenizes alike.
+        return [zlib.crc32(token.encode("utf-8")) & 0x7FFFFFFF for token in self._split(text.decode("utf-8"))]
+
+    def n_ctx(self) -> int:
+        return 131072
+
+    def reset(self) -> None:
+        self.n_tokens = 0
+
+    def eval(self, tokens: list[int]) -> None:
+        self.input_ids = np.concatenate([self.input_ids[: self.n_tokens], np.asarray(tokens, dtype=np.intc)])
+        self.n_tokens = len(self.input_ids)
+
+    def save_state(self) -> tuple[int, np.ndarray]:
+        return self.n_tokens, self.input_ids.copy()
+
+    def load_state(self, state: tuple[int, np.ndarray]) -> None:
+        self.n_tokens, input_ids = state
+        self.input_ids = input_ids.copy()
+
+    def _evaluate_prompt(self, messages) -> None:
+        prompt = self.tokenize(" ".join(message["content"] for message in messages).encode("utf-8"))
+        reused = 0
+        while reused < min(self.n_tokens, len(prompt)) and self.input_ids[reused] == prompt[reused]:
+            reused += 1
+        self.n_tokens = reused
+        self.eval(prompt[reused:])
+
+    def _stream(self, messages) -> Iterator[dict]:
+        start = time.perf_counter()
+        self._evaluate_prompt(messages)
+        for index, token in enumerate(self.tokens):
+            if self.tokens_per_second:
+                delay = start + index / self.tokens_per_second - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            yield {"choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]}
+            self.eval(self.tokenize(token.encode("utf-8")))
+        yield {"choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+
+    def create_chat_completion(self, messages, response_format=None, stream=False, stop=None, **kwargs):
+        if stream:
+            return self._stream(messages)
+        self._evaluate_prompt(messages)
+        return {"choices": [{"index": 0, "message": {"role": "assistant", "content": self.script}}]}
+
+
+class FakeKPipeline:
+    """Mimics `kokoro.KPipeline`: one fixed-length chunk of audio per sentence, without running any model."""
+
+    def __init__(self, samples_per_chunk: int):
+        self.chunk = np.linspace(-0.5, 0.5, samples_per_chunk, dtype=np.float32)
+
+    def __call__(self, text: str, voice: str):
+        for sentence in filter(None, (part.strip() for part in text.replace("!", ".").split("."))):
+            yield sentence, "", self.chunk
+
+
+def fake_tts_model(sample_rate: int = 24000, seconds_per_sentence: float = 2.0):
+    """A `TTSModel` with the Kokoro model id, so it goes through the same inference path as the real one."""
+    from preprocessing.model_loaders import TTSModel
+
+    return TTSModel(
+        model=FakeKPipeline(int(sample_rate * seconds_per_sentence)),
+        model_id="hexgrad/Kokoro-82M",
+        sample_rate=sample_rate,
+        custom_args={},
+    )
@@ -0,0 +1,76 @@
+"""Checks the import time of each entry point against a budget.
+
+Heavy backends (torch, kokoro, llama.cpp, streamlit, document parsers) must only be imported on first use, so
+validating a config or cleaning text starts fast. Each module is imported in a fresh interpreter, several times,
+and the fastest run is compared to its budget.
+
+    uv run python benchmarks/import_time.py
+"""
+
+import argparse
+import re
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+SOURCE_DIR = Path(__file__).parent.parent / "src" / "document_to_podcast"
+
+# Seconds, on a warm page cache.
+IMPORT_BUDGETS = {
+    "models": 0.5,
+    "load_data": 0.5,
+    "load_urls": 0.5,
+    "generate_script": 0.6,
+    "generate_audio": 0.7,
+    "generate_podcast": 0.7,
+    "server": 0.7,
+    "batch": 0.7,
+    "autotune": 0.6,
+    "populate_model_store": 0.6,
+}
+
+# Must never be imported just by importing an entry point.
+HEAVY_MODULES = ("torch", "kokoro", "llama_cpp", "streamlit", "PyPDF2", "docx", "bs4", "requests")
+
+
+def measure_import(module: str, runs: int) -> tuple[float, list[str]]:
+    """Returns the fastest import time of `module`, and which heavy modules it imported."""
+    timings = []
+    imported_heavy = set()
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=SOURCE_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        timings.append(time.perf_counter() - start)
+        for line in result.stderr.splitlines():
+            match = re.search(r"\|\s+(\S+)$", line)
+            if match and match.group(1).split(".")[0] in HEAVY_MODULES:
+                imported_heavy.add(match.group(1).split(".")[0])
+    return min(timings), sorted(imported_heavy)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    baseline, _ = measure_import("sys", args.runs)
+    failed = False
+    for module, budget in IMPORT_BUDGETS.items():
+        seconds, heavy = measure_import(module, args.runs)
+        seconds -= baseline  # Only count our own imports, not interpreter startup
+        ok = seconds <= budget and not heavy
+        failed |= not ok
+        status = "ok" if ok else "FAIL"
+        print(f"{status:4} {module:18} {seconds:6.3f}s (budget {budget:.1f}s) {' '.join(heavy)}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,230 @@
+"""Measures the overhead of the pipeline's own code, separately from model inference.
+
+- load: `data_load` + `data_clean` of the example document in each format, in characters per second.
+- script: `generate_script` and the streaming turn parser over a fake LLM replaying a fixed script, in tokens per
+  second. With `--tokens_per_second`, the fake decodes at that rate and the time lost behind it is reported instead.
+- audio: `generate_audio` over a fake TTS model returning fixed-length chunks, and `stack_audio_segments`, in
+  seconds of audio per second.
+- real: with `--real`, the same script and audio stages on the real models, only if they are already downloaded.
+
+Each benchmark keeps its best of `--runs` runs. The results can be saved as JSON and compared to a baseline saved
+the same way; a metric more than `--tolerance` worse than its baseline fails the run.
+
+    uv run python benchmarks/pipeline.py --output benchmarks/baseline.json
+    uv run python benchmarks/pipeline.py --baseline benchmarks/baseline.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+SOURCE_DIR = Path(__file__).parent.parent / "src" / "document_to_podcast"
+EXAMPLE_FILE = Path(__file__).parent.parent / "example_data" / "Mozilla-Trustworthy_AI.md"
+
+sys.path.insert(0, str(SOURCE_DIR))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from fakes import FakeLlama, canned_script, fake_tts_model  # noqa: E402
+from generate_audio import generate_audio  # noqa: E402
+from generate_script import generate_script, stream_script  # noqa: E402
+from load_data import data_clean  # noqa: E402
+from loguru import logger  # noqa: E402
+from models import AudioGenerationConfig, ScriptGenerationConfig  # noqa: E402
+from preprocessing.data_loaders import data_load  # noqa: E402
+from script_parsing import parse_script_stream  # noqa: E402
+from utils import stack_audio_segments  # noqa: E402
+
+
+def best_time(fn: Callable[[], object], runs: int) -> float:
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def result(value: float, unit: str, higher_is_better: bool = True, comparable: bool = True) -> dict:
+    """A metric. Only `comparable` ones are checked against the baseline, the others hover around zero."""
+    return {"value": value, "unit": unit, "higher_is_better": higher_is_better, "comparable": comparable}
+
+
+def write_documents(folder: Path, repeat: int) -> dict[str, Path]:
+    """The example document, repeated `repeat` times, in each format whose parser is installed."""
+    text = EXAMPLE_FILE.read_text() * repeat
+    paragraphs = [paragraph for paragraph in text.split("\n\n") if paragraph.strip()]
+    documents = {ext: folder / f"document.{ext}" for ext in ("md", "txt", "html")}
+    documents["md"].write_text(text)
+    documents["txt"].write_text(text)
+    body = "\n".join(f"<p>{paragraph}</p>" for paragraph in paragraphs)
+    documents["html"].write_text(f"<html><head><style>p {{}}</style></head><body>{body}</body></html>")
+    try:
+        from docx import Document
+    except ImportError:
+        logger.warning("python-docx is not installed, skipping the docx benchmark")
+    else:
+        document = Document()
+        for paragraph in paragraphs:
+            document.add_paragraph(paragraph)
+        documents["docx"] = folder / "document.docx"
+        document.save(documents["docx"])
+    return documents
+
+
+def bench_load(runs: int, repeat: int = 2) -> dict[str, dict]:
+    results = {}
+    with tempfile.TemporaryDirectory() as folder:
+        for extension, path in write_documents(Path(folder), repeat).items():
+            characters = len(data_load(path))
+            seconds = best_time(lambda path=path: data_clean(path, data_load(path)), runs)
+            results[f"load.{extension}"] = result(characters / seconds, "chars/s")
+    return results
+
+
+def bench_script(runs: int, turns: int, tokens_per_second: float | None) -> dict[str, dict]:
+    config = ScriptGenerationConfig.model_construct()
+    model = FakeLlama(canned_script(turns), tokens_per_second=tokens_per_second)
+    tokens = len(model.tokens)
+
+    def generate():
+        generate_script("input", model, config.text_to_text_prompt, config.speakers)
+
+    def parse():
+        list(parse_script_stream(stream_script("input", model, config.text_to_text_prompt, config.speakers)))
+
+    if tokens_per_second:
+        # Decoding sets the pace, so measure how far behind it the stream handling falls.
+        decoding = tokens / tokens_per_second
+        return {
+            "script.generate_lag": result(
+                (best_time(generate, runs) - decoding) * 1000, "ms", higher_is_better=False, comparable=False
+            ),
+            "script.parse_lag": result(
+                (best_time(parse, runs) - decoding) * 1000, "ms", higher_is_better=False, comparable=False
+            ),
+        }
+    return {
+        "script.generate": result(tokens / best_time(generate, runs), "tokens/s"),
+        "script.parse": result(tokens / best_time(parse, runs), "tokens/s"),
+    }
+
+
+def bench_audio(runs: int, turns: int) -> dict[str, dict]:
+    config = AudioGenerationConfig.model_construct()
+    model = fake_tts_model()
+    script = canned_script(turns)
+    audio = generate_audio(script, model, config.speakers)
+    audio_seconds = len(audio) / model.sample_rate
+
+    segments = [model.model.chunk] * turns
+    stack_seconds = best_time(lambda: stack_audio_segments(segments, model.sample_rate, silence_pad=1.0), runs)
+    return {
+        "audio.generate": result(
+            audio_seconds / best_time(lambda: generate_audio(script, model, config.speakers), runs), "audio s/s"
+        ),
+        "audio.stack": result(
+            len(stack_audio_segments(segments, model.sample_rate)) / model.sample_rate / stack_seconds, "audio s/s"
+        ),
+    }
+
+
+def is_downloaded(model_id: str) -> bool:
+    try:
+        from huggingface_hub import try_to_load_from_cache
+    except ImportError:
+        return False
+    if model_id.endswith(".gguf"):
+        owner, repo, filename = model_id.split("/", maxsplit=2)
+        return isinstance(try_to_load_from_cache(f"{owner}/{repo}", filename), str)
+    return isinstance(try_to_load_from_cache(model_id, "config.json"), str)
+
+
+def bench_real(turns: int) -> dict[str, dict]:
+    """The script and audio stages on the default models, single runs, in model throughput."""
+    os.environ["HF_HUB_OFFLINE"] = "1"  # Never download in a benchmark
+    from generate_audio import load_text_to_speech_model
+    from generate_script import load_text_to_text_model
+
+    results = {}
+    script_config = ScriptGenerationConfig.model_construct()
+    if is_downloaded(script_config.text_to_text_model):
+        model = load_text_to_text_model(script_config.text_to_text_model, n_ctx=8192)
+        text = EXAMPLE_FILE.read_text()[:4000]
+        start = time.perf_counter()
+        chunks = list(stream_script(text, model, script_config.text_to_text_prompt, script_config.speakers))
+        results["real.script"] = result(len(chunks) / (time.perf_counter() - start), "tokens/s")
+    else:
+        logger.warning(f"{script_config.text_to_text_model} is not downloaded, skipping it")
+
+    audio_config = AudioGenerationConfig.model_construct()
+    if is_downloaded(audio_config.text_to_speech_model):
+        model = load_text_to_speech_model(audio_config.text_to_speech_model, audio_config.speakers[0].voice_profile[0])
+        script = canned_script(turns, words_per_turn=20)
+        start = time.perf_counter()
+        audio = generate_audio(script, model, audio_config.speakers)
+        results["real.audio"] = result(len(audio) / model.sample_rate / (time.perf_counter() - start), "audio s/s")
+    else:
+        logger.warning(f"{audio_config.text_to_speech_model} is not downloaded, skipping it")
+    return results
+
+
+def compare(results: dict[str, dict], baseline: dict[str, dict], tolerance: float) -> bool:
+    """Print each metric next to its baseline, and return whether any regressed by more than `tolerance`."""
+    regressed = False
+    for name, current in results.items():
+        line = f"{name:22} {current['value']:14.1f} {current['unit']}"
+        if current["comparable"] and baseline.get(name, {}).get("value"):
+            change = current["value"] / baseline[name]["value"] - 1
+            worse = -change if current["higher_is_better"] else change
+            failed = worse > tolerance
+            regressed |= failed
+            line += f"  ({change:+.0%} vs baseline{', REGRESSION' if failed else ''})"
+        print(line)
+    return regressed
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--turns", type=int, default=2000, help="Turns of the fake script for the LLM")
+    parser.add_argument("--audio_turns", type=int, default=100, help="Turns of the fake script for the TTS model")
+    parser.add_argument("--tokens_per_second", type=float, help="Decoding rate of the fake LLM, unlimited if not set")
+    parser.add_argument("--real", action="store_true", help="Also benchmark the real models, if downloaded")
+    parser.add_argument("--output", type=Path, help="Save the results as JSON, e.g. to make a baseline")
+    parser.add_argument("--baseline", type=Path, help="Results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown vs the baseline, 0.25 = 25%%")
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    results = {
+        **bench_load(args.runs),
+        **bench_script(args.runs, args.turns, args.tokens_per_second),
+        **bench_audio(args.runs, args.audio_turns),
+    }
+    if args.real:
+        results.update(bench_real(turns=4))
+
+    baseline = json.loads(args.baseline.read_text())["results"] if args.baseline else {}
+    regressed = compare(results, baseline, args.tolerance)
+
+    if args.output:
+        report = {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+            "results": results,
+        }
+        args.output.write_text(json.dumps(report, indent=2))
+    return 1 if regressed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
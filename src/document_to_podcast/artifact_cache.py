@@ -0,0 +1,126 @@
+import hashlib
+import json
+import shutil
+from collections.abc import Callable
+from pathlib import Path
+
+from loguru import logger
+from models import ArtifactCacheConfig, Speaker
+from utils import atomic_path, evict_least_recently_used
+
+
+def file_digest(path: Path) -> str:
+    """The sha256 of a file's content, read in blocks."""
+    with Path.open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def speakers_params(speakers: list[Speaker]) -> list[dict]:
+    """The speakers, as cache key parameters independent of their order in the config."""
+    return [speaker.model_dump() for speaker in sorted(speakers, key=lambda speaker: speaker.id)]
+
+
+class ArtifactCache:
+    """A persistent, content-addressed cache of the outputs of the pipeline stages.
+
+    Each artifact is keyed on its stage, the content of the stage's input, and the config values that affect its
+    output, so an unchanged stage is skipped on the next run. Artifacts are stored one file each, in a folder per
+    stage. Once the cache grows past `max_bytes`, the least recently used artifacts are evicted.
+
+    Examples:
+        >>> cache = ArtifactCache(Path("~/.cache/document_to_podcast/artifacts").expanduser())
+        >>> key = cache.key("script", cleaned_text, {"model": "owner/repo/file.gguf"})
+        >>> script = cache.get_text("script", key)
+
+    Args:
+        cache_dir (Path): Directory holding the artifacts, created if missing.
+        max_bytes (int): Size cap of the cache directory.
+        force (bool): Treat every artifact as missing, so every stage runs again and refreshes the cache.
+    """
+
+    def __init__(self, cache_dir: Path, max_bytes: int = 4 * 1024 * 1024 * 1024, force: bool = False):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.force = force
+        self._size = sum(path.stat().st_size for path in self._artifacts())
+
+    @staticmethod
+    def key(stage: str, content: str | bytes, params: dict) -> str:
+        """The key of an artifact produced by `stage` from `content`, with the config values in `params`."""
+        if isinstance(content, str):
+            content = content.encode("utf-8")
+        payload = json.dumps([stage, hashlib.sha256(content).hexdigest(), params], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, stage: str, key: str, suffix: str) -> Path:
+        return self.cache_dir / stage / f"{key}{suffix}"
+
+    def _artifacts(self):
+        return (path for path in self.cache_dir.glob("*/*") if not path.name.endswith(".tmp"))
+
+    def get(self, stage: str, key: str, suffix: str) -> Path | None:
+        """The path of a stored artifact, or None if it is missing or `force` is set."""
+        path = self._path(stage, key, suffix)
+        if self.force or not path.exists():
+            return None
+        path.touch()
+        logger.info(f"Reusing the cached {stage} output {path.name}")
+        return path
+
+    def put(self, stage: str, key: str, suffix: str, write: Callable[[Path], object]) -> Path:
+        """Store an artifact, written to the path passed to `write`."""
+        path = self._path(stage, key, suffix)
+        path.parent.mkdir(exist_ok=True)
+        with atomic_path(path) as tmp_path:
+            write(tmp_path)
+        self._size += path.stat().st_size
+        if self._size > self.max_bytes:
+            self._evict()
+        return path
+
+    def get_text(self, stage: str, key: str) -> str | None:
+        path = self.get(stage, key, ".txt")
+        return path.read_text() if path else None
+
+    def put_text(self, stage: str, key: str, text: str) -> None:
+        self.put(stage, key, ".txt", lambda path: path.write_text(text))
+
+    def _evict(self) -> None:
+        self._size = evict_least_recently_used(self._artifacts(), self.max_bytes)
+        logger.debug(f"Evicted artifact cache down to {self._size} bytes")
+
+
+def open_artifact_cache(config: ArtifactCacheConfig) -> ArtifactCache | None:
+    """The artifact cache configured by `config`, or None if caching is disabled."""
+    if config.artifact_cache_dir is None or config.no_cache:
+        return None
+    return ArtifactCache(config.artifact_cache_dir, max_bytes=config.artifact_cache_max_bytes, force=config.force)
+
+
+def cached_text(cache: ArtifactCache | None, stage: str, key: str, produce: Callable[[], str]) -> str:
+    """The cached text output of a stage, or the output of `produce`, which is then cached."""
+    if cache is None:
+        return produce()
+    text = cache.get_text(stage, key)
+    if text is None:
+        text = produce()
+        cache.put_text(stage, key, text)
+    return text
+
+
+def cached_file(
+    cache: ArtifactCache | None, stage: str, key: str, output_path: Path, produce: Callable[[Path], object]
+) -> str:
+    """Copy the cached output file of a stage to `output_path`, or produce it there and cache a copy."""
+    output_path = Path(output_path)
+    if cache is None:
+        produce(output_path)
+        return str(output_path)
+    cached = cache.get(stage, key, output_path.suffix)
+    if cached is not None:
+        shutil.copyfile(cached, output_path)
+    else:
+        produce(output_path)
+        cache.put(stage, key, output_path.suffix, lambda path: shutil.copyfile(output_path, path))
+    return str(output_path)
@@ -0,0 +1,126 @@
+import hashlib
+import json
+import shutil
+from collections import deque
+from collections.abc import Iterable, Iterator
+from itertools import islice
+from pathlib import Path
+
+import numpy as np
+from loguru import logger
+from script_parsing import ScriptTurn
+from utils import atomic_path, atomic_write_text
+
+
+class AudioCheckpoint:
+    """Saves each synthesized turn of a script to disk as soon as it is finished, so a killed run can resume.
+
+    The turns are saved in `folder` as `.npy` files, next to a `manifest.json` recording the hash of the script and
+    settings they were synthesized from, and the index, speaker and sample count of every saved turn. When the
+    script or settings change, the saved turns are discarded. Once the podcast is written, `remove` deletes them.
+
+    Examples:
+        >>> checkpoint = AudioCheckpoint(output_folder / "podcast_turns", script, {"model_id": "hexgrad/Kokoro-82M"})
+        >>> turns = voice_turns(checkpoint.remaining(speaker_turns(parse_script(script), speakers)), speakers)
+        >>> with open_turn_audio(turns, model_id, "a") as (segments, sample_rate):
+        ...     write_audio_segments(output_path, checkpoint.segments(segments, sample_rate), sample_rate)
+        >>> checkpoint.remove()
+
+    Args:
+        folder (Path): Directory holding the saved turns and the manifest, created if missing.
+        script (str): The script being synthesized.
+        params (dict): The settings that shape the audio, e.g. the model and speakers.
+    """
+
+    def __init__(self, folder: Path, script: str, params: dict):
+        self.folder = Path(folder)
+        self.folder.mkdir(parents=True, exist_ok=True)
+        # Left behind by a run killed while saving a turn.
+        for tmp_path in self.folder.glob("*.tmp"):
+            tmp_path.unlink(missing_ok=True)
+        payload = json.dumps([hashlib.sha256(script.encode("utf-8")).hexdigest(), params], sort_keys=True, default=str)
+        self.script_hash = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+        self.manifest = self._load_manifest()
+        # Speakers of the turns handed out by `remaining` whose audio has not been saved yet.
+        self._pending: deque[int] = deque()
+
+    @property
+    def _manifest_path(self) -> Path:
+        return self.folder / "manifest.json"
+
+    def _turn_path(self, index: int) -> Path:
+        return self.folder / f"turn_{index:05d}.npy"
+
+    def _load_manifest(self) -> dict:
+        empty = {"script_hash": self.script_hash, "sample_rate": None, "turns": []}
+        try:
+            manifest = json.loads(self._manifest_path.read_text())
+        except (FileNotFoundError, ValueError):
+            return empty
+        if manifest.get("script_hash") != self.script_hash:
+            logger.info(f"The script or settings changed, discarding the turns saved in {self.folder}")
+            for turn in manifest.get("turns", []):
+                self._turn_path(turn["index"]).unlink(missing_ok=True)
+            return empty
+
+        # Only keep the turns saved one after the other from the start, whose files are complete.
+        turns = []
+        for index, turn in enumerate(sorted(manifest["turns"], key=lambda turn: turn["index"])):
+            if turn["index"] != index or not self._is_complete(turn):
+                break
+            turns.append(turn)
+        manifest["turns"] = turns
+        return manifest
+
+    def _is_complete(self, turn: dict) -> bool:
+        try:
+            return len(np.load(self._turn_path(turn["index"]), mmap_mode="r")) == turn["samples"]
+        except (FileNotFoundError, ValueError, OSError):
+            return False
+
+    @property
+    def completed(self) -> int:
+        """The number of turns already saved, resuming starts after them."""
+        return len(self.manifest["turns"])
+
+    def remaining(self, turns: Iterable[ScriptTurn]) -> Iterator[ScriptTurn]:
+        """The turns of the script left to synthesize, skipping the saved ones."""
+        if self.completed:
+            logger.info(f"Resuming from turn {self.completed}, the previous ones are saved in {self.folder}")
+        for turn in islice(turns, self.completed, None):
+            self._pending.append(turn.speaker_id)
+            yield turn
+
+    def segments(self, synthesized: Iterable[np.ndarray], sample_rate: int) -> Iterator[np.ndarray]:
+        """Every turn's audio in order: first the saved turns, read from disk, then the newly synthesized ones.
+
+        Each new turn is saved before it is yielded.
+
+        Args:
+            synthesized: The audio of the turns yielded by `remaining`, in order.
+            sample_rate: The sample rate of the synthesized audio.
+        """
+        if self.manifest["sample_rate"] not in (None, sample_rate):
+            raise ValueError(f"Saved turns are sampled at {self.manifest['sample_rate']}Hz, not {sample_rate}Hz")
+        self.manifest["sample_rate"] = sample_rate
+
+        for turn in self.manifest["turns"]:
+            yield np.load(self._turn_path(turn["index"]))
+        for audio in synthesized:
+            if not isinstance(audio, np.ndarray):
+                # A turn synthesized chunk by chunk.
+                audio = np.concatenate([np.zeros(0, dtype=np.float32), *audio])
+            self._save_turn(self.completed, self._pending.popleft(), audio)
+            yield audio
+
+    def _save_turn(self, index: int, speaker_id: int, audio: np.ndarray) -> None:
+        # A killed run never leaves a partial turn or manifest behind.
+        with atomic_path(self._turn_path(index)) as tmp_path, tmp_path.open("wb") as f:
+            np.save(f, audio)
+        self.manifest["turns"].append({"index": index, "speaker_id": speaker_id, "samples": len(audio)})
+        atomic_write_text(self._manifest_path, json.dumps(self.manifest, indent=2))
+
+    def remove(self) -> None:
+        """Delete the saved turns and the manifest, once the podcast they make up is written."""
+        shutil.rmtree(self.folder, ignore_errors=True)
+        logger.debug(f"Removed the saved turns in {self.folder}")
@@ -0,0 +1,151 @@
+from dataclasses import dataclass
+from pathlib import Path
+from types import MappingProxyType
+from typing import TYPE_CHECKING
+
+import numpy as np
+from loguru import logger
+from utils import atomic_write_text
+
+if TYPE_CHECKING:
+    import soundfile as sf
+
+
+@dataclass(frozen=True)
+class AudioFormat:
+    extension: str
+    format: str
+    subtype: str
+    sample_rates: tuple[int, ...] | None = None
+
+
+AUDIO_FORMATS = MappingProxyType(
+    {
+        # To add an output format, add it here in the format {name} : AudioFormat(...), using libsndfile's
+        # format and subtype names.
+        "wav": AudioFormat(extension=".wav", format="WAV", subtype="PCM_16"),
+        "flac": AudioFormat(extension=".flac", format="FLAC", subtype="PCM_16"),
+        "opus": AudioFormat(
+            extension=".opus", format="OGG", subtype="OPUS", sample_rates=(8000, 12000, 16000, 24000, 48000)
+        ),
+    }
+)
+
+_FORMATS_BY_EXTENSION = MappingProxyType(
+    {audio_format.extension: audio_format for audio_format in AUDIO_FORMATS.values()}
+)
+
+
+def audio_filename(stem: str, audio_format: str) -> str:
+    """The name of an audio file in one of the `AUDIO_FORMATS`, e.g. `podcast.opus`."""
+    return f"{stem}{AUDIO_FORMATS[audio_format].extension}"
+
+
+class AudioWriter:
+    """Encodes audio to disk as it arrives, optionally split into fixed-duration segment files.
+
+    The format is picked from the extension of `output_path`, see `AUDIO_FORMATS`; other extensions are left to
+    soundfile to recognize. Each write is encoded right away, so compressed output never needs the whole waveform.
+
+    With `segment_seconds`, the audio is split into `<stem>_00000<ext>`, `<stem>_00001<ext>`, ... files next to
+    `output_path`, listed in a `<stem>.m3u` playlist that is updated as soon as each segment is complete, so they can
+    be uploaded while the rest is still being synthesized.
+
+    Examples:
+        >>> with AudioWriter(Path("podcast.opus"), 24000, segment_seconds=60) as writer:
+        ...     for segment in segments:
+        ...         writer.write(segment)
+        >>> writer.path
+        'podcast.m3u'
+
+    Args:
+        output_path (Path): The audio file, or the playlist stem and extension of the segments.
+        sample_rate (int): The sample rate of the audio.
+        segment_seconds (float | None): Duration of each segment file, `None` writes a single file.
+    """
+
+    def __init__(self, output_path: Path, sample_rate: int, segment_seconds: float | None = None):
+        self.output_path = Path(output_path)
+        self.sample_rate = sample_rate
+        self.audio_format = _FORMATS_BY_EXTENSION.get(self.output_path.suffix)
+        if self.audio_format and self.audio_format.sample_rates and sample_rate not in self.audio_format.sample_rates:
+            raise ValueError(
+                f"{self.audio_format.format}/{self.audio_format.subtype} doesn't support {sample_rate}Hz audio, "
+                f"only {self.audio_format.sample_rates}"
+            )
+        self.segment_samples = int(segment_seconds * sample_rate) if segment_seconds else None
+        self.segments: list[tuple[str, float]] = []
+        self._file: sf.SoundFile | None = None
+        self._file_samples = 0
+
+    @property
+    def path(self) -> str:
+        """The written audio file, or the playlist when writing segments."""
+        return str(self._playlist_path if self.segment_samples else self.output_path)
+
+    @property
+    def _playlist_path(self) -> Path:
+        return self.output_path.with_suffix(".m3u")
+
+    def _segment_path(self, index: int) -> Path:
+        return self.output_path.with_name(f"{self.output_path.stem}_{index:05d}{self.output_path.suffix}")
+
+    def _open(self) -> None:
+        import soundfile as sf
+
+        path = self._segment_path(len(self.segments)) if self.segment_samples else self.output_path
+        self._file = sf.SoundFile(
+            str(path),
+            mode="w",
+            samplerate=self.sample_rate,
+            channels=1,
+            format=self.audio_format.format if self.audio_format else None,
+            subtype=self.audio_format.subtype if self.audio_format else None,
+        )
+        self._file_samples = 0
+
+    def _close_file(self) -> None:
+        self._file.close()
+        if self.segment_samples:
+            self.segments.append((self._file.name, self._file_samples / self.sample_rate))
+            self._write_playlist()
+            logger.debug(f"Finished segment {self._file.name}")
+        self._file = None
+
+    def _write_playlist(self) -> None:
+        lines = ["#EXTM3U"]
+        for path, seconds in self.segments:
+            lines += [f"#EXTINF:{seconds:.3f},", Path(path).name]
+        atomic_write_text(self._playlist_path, "\n".join(lines) + "\n")
+
+    def write(self, audio: np.ndarray) -> None:
+        while len(audio):
+            if self._file is None:
+                self._open()
+            if self.segment_samples:
+                room = self.segment_samples - self._file_samples
+                chunk, audio = audio[:room], audio[room:]
+            else:
+                chunk, audio = audio, audio[:0]
+            self._file.write(chunk)
+            self._file_samples += len(chunk)
+            if self.segment_samples and self._file_samples == self.segment_samples:
+                self._close_file()
+        if self._file is not None:
+            # Keeps the header up to date, so the output stays playable if the process dies.
+            self._file.flush()
+
+    def close(self) -> None:
+        if self._file is None and not (self.segment_samples and self.segments):
+            # Nothing was written, still leave a valid, empty file.
+            self._open()
+        if self._file is not None:
+            self._close_file()
+
+    def __enter__(self):
+        """Returns the writer, whose last file is closed on exit."""
+        return self
+
+    def __exit__(self, *exc):
+        """Closes the file being written, and adds it to the playlist."""
+        self.close()
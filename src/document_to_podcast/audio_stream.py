@@ -0,0 +1,185 @@
+import asyncio
+import concurrent.futures
+import threading
+import time
+from collections import deque
+from collections.abc import AsyncIterator, Iterator
+from dataclasses import dataclass
+
+import numpy as np
+from generate_audio import open_turn_audio, script_turns
+from metrics import METRICS
+from models import Speaker, SynthesisConfig
+from utils import silence_length, to_audio_dtype
+
+
+@dataclass(frozen=True)
+class AudioChunk:
+    """A piece of the podcast audio, with where it sits in the podcast.
+
+    Args:
+        samples (np.ndarray): Mono PCM samples, float32 in [-1.0, 1.0] or int16 depending on `audio_dtype`.
+        sample_rate (int): The sample rate of the samples.
+        turn_index (int): Index of the script turn this chunk belongs to.
+        start_seconds (float): Position of the first sample in the podcast.
+        text (str): The text of the turn.
+        voice_profile (str): The voice the turn is spoken with.
+        is_silence (bool): Whether this is the pause after the turn rather than speech.
+        elapsed_seconds (float): Time since the generation started when the chunk was ready.
+    """
+
+    samples: np.ndarray
+    sample_rate: int
+    turn_index: int
+    start_seconds: float
+    text: str
+    voice_profile: str
+    is_silence: bool
+    elapsed_seconds: float
+
+    @property
+    def duration_seconds(self) -> float:
+        return len(self.samples) / self.sample_rate
+
+    @property
+    def end_seconds(self) -> float:
+        return self.start_seconds + self.duration_seconds
+
+
+def iter_podcast_audio(
+    script: str,
+    model_id: str,
+    speakers: list[Speaker],
+    synthesis: SynthesisConfig | None = None,
+    silence_pad: float = 1.0,
+) -> Iterator[AudioChunk]:
+    """Synthesize the podcast audio of a script, yielding each chunk in order as soon as it is ready.
+
+    The chunks are the same samples (and silence pads) that
+    [do_audio_generation][document_to_podcast.generate_audio.do_audio_generation] would return, so playback can
+    start after the first chunk instead of the whole podcast. With a single TTS worker, each turn is synthesized
+    sentence by sentence.
+
+    Synthesis only runs a few chunks ahead of the caller, so a slow consumer holds it back instead of letting
+    chunks pile up in memory. Closing the iterator stops the synthesis and releases the TTS workers.
+
+    Examples:
+        >>> for chunk in iter_podcast_audio(script, "hexgrad/Kokoro-82M", speakers):
+        ...     player.play(chunk.samples)
+
+    Args:
+        script (str): The podcast script.
+        model_id (str): The TTS model.
+        speakers (list[Speaker]): The speakers of the script, giving the voice of each turn.
+        synthesis (SynthesisConfig | None, optional): Synthesis settings, `audio_dtype` sets the sample format.
+        silence_pad (float, optional): Maximum length in seconds of the pause after each turn.
+
+    Yields:
+        AudioChunk: The podcast audio, in order.
+    """
+    synthesis = synthesis or SynthesisConfig()
+    if synthesis.tts_workers == 1:
+        synthesis = synthesis.model_copy(update={"pipelined_synthesis": True})
+    start = time.perf_counter()
+    # Turns handed to the synthesizer whose audio has not been yielded yet.
+    pending = deque()
+
+    def turns() -> Iterator[tuple[str, str]]:
+        for turn in script_turns(script, speakers):
+            pending.append(turn)
+            yield turn
+
+    rng = np.random.default_rng(42)
+    position = 0
+    lang_code = speakers[0].voice_profile[0]
+    with open_turn_audio(turns(), model_id, lang_code, synthesis) as (segments, sample_rate):
+        for turn_index, segment in enumerate(segments):
+            text, voice_profile = pending.popleft()
+            turn = {"sample_rate": sample_rate, "turn_index": turn_index, "text": text, "voice_profile": voice_profile}
+            for samples in [segment] if isinstance(segment, np.ndarray) else segment:
+                if position == 0:
+                    METRICS.observe("audio_time_to_first_chunk_seconds", time.perf_counter() - start)
+                samples = to_audio_dtype(samples, synthesis.audio_dtype)
+                yield AudioChunk(
+                    samples=samples,
+                    start_seconds=position / sample_rate,
+                    is_silence=False,
+                    elapsed_seconds=time.perf_counter() - start,
+                    **turn,
+                )
+                position += len(samples)
+            pad_length = silence_length(rng, sample_rate, silence_pad)
+            if pad_length:
+                yield AudioChunk(
+                    samples=np.zeros(pad_length, dtype=synthesis.audio_dtype),
+                    start_seconds=position / sample_rate,
+                    is_silence=True,
+                    elapsed_seconds=time.perf_counter() - start,
+                    **turn,
+                )
+                position += pad_length
+
+
+async def aiter_podcast_audio(
+    script: str,
+    model_id: str,
+    speakers: list[Speaker],
+    synthesis: SynthesisConfig | None = None,
+    silence_pad: float = 1.0,
+    max_buffered_chunks: int = 4,
+) -> AsyncIterator[AudioChunk]:
+    """The asyncio counterpart of [iter_podcast_audio][document_to_podcast.audio_stream.iter_podcast_audio].
+
+    Synthesis runs in a background thread, so the event loop stays free. At most `max_buffered_chunks` chunks wait
+    for the caller, after which synthesis pauses until the caller catches up. Closing the iterator or cancelling
+    the task consuming it stops the synthesis once the chunk in progress is done.
+
+    Examples:
+        >>> async for chunk in aiter_podcast_audio(script, "hexgrad/Kokoro-82M", speakers):
+        ...     await websocket.send_bytes(chunk.samples.tobytes())
+
+    Yields:
+        AudioChunk: The podcast audio, in order.
+    """
+    loop = asyncio.get_running_loop()
+    chunks = asyncio.Queue(maxsize=max_buffered_chunks)
+    stopped = threading.Event()
+    done = object()
+
+    def put(item) -> bool:
+        if stopped.is_set():
+            return False
+        future = asyncio.run_coroutine_threadsafe(chunks.put(item), loop)
+        while not stopped.is_set():
+            try:
+                future.result(timeout=0.1)
+                return True
+            except concurrent.futures.TimeoutError:
+                continue
+        future.cancel()
+        return False
+
+    def produce():
+        audio = iter_podcast_audio(script, model_id, speakers, synthesis, silence_pad)
+        try:
+            for chunk in audio:
+                if not put((chunk, None)):
+                    return
+        except BaseException as e:
+            put((done, e))
+            return
+        finally:
+            audio.close()
+        put((done, None))
+
+    threading.Thread(target=produce, daemon=True).start()
+    try:
+        while True:
+            chunk, error = await chunks.get()
+            if error is not None:
+                raise error
+            if chunk is done:
+                return
+            yield chunk
+    finally:
+        stopped.set()
@@ -0,0 +1,246 @@
+import argparse
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+from loguru import logger
+from models import AutotuneConfig, SpeakerConfig
+from preprocessing.host_profile import host_profile_path, save_host_profile
+
+# A typical script job, to weigh prompt evaluation against generation when comparing llama.cpp settings.
+_WORKLOAD_PROMPT_TOKENS = 8192
+_WORKLOAD_GENERATED_TOKENS = 4096
+# What the models read in every trial: the TTS model reads it once per run, the LLM prompt repeats it.
+_SAMPLE_TEXT = (
+    "Welcome back to the show! Today we're looking at how open source communities build trustworthy software, "
+    "and why it matters for everyone who uses it. Let's start with a simple question: who decides what gets built?"
+)
+
+
+def parse_args() -> AutotuneConfig:
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument(
+        "--config", type=str, help="Path to the config file or a JSON string, this overrides any other parameters"
+    )
+    parser.add_argument("--text_to_text_model", type=str)
+    parser.add_argument("--text_to_speech_model", type=str)
+    parser.add_argument("--threads", type=int, nargs="+", help="Thread counts to try for both models")
+    parser.add_argument("--n_batch", type=int, nargs="+", help="llama.cpp batch sizes to try")
+    parser.add_argument("--prompt_tokens", type=int, help="Tokens of the prompt evaluated in each trial")
+    parser.add_argument("--generated_tokens", type=int, help="Tokens generated in each trial")
+    parser.add_argument("--profile_file", type=Path, help="Where to save the host profile")
+
+    args = parser.parse_args()
+
+    config_data = {}
+
+    if args.config:
+        if Path(args.config).exists():
+            with Path.open(args.config, "r") as f:
+                config_data = json.load(f)
+        else:
+            config_data = json.loads(args.config)
+    else:
+        config_data = {k: v for k, v in vars(args).items() if v is not None}
+
+    return AutotuneConfig.model_validate(config_data)
+
+
+def thread_candidates(cpu_count: int) -> list[int]:
+    """Powers of two below `cpu_count`, and `cpu_count` itself."""
+    candidates = {cpu_count}
+    threads = 1
+    while threads < cpu_count:
+        candidates.add(threads)
+        threads *= 2
+    return sorted(candidates)
+
+
+def load_bench_model(model_id: str, n_threads: int, n_batch: int, prompt_tokens: int, generated_tokens: int):
+    """The LLM with the given settings, and a context fitting one trial."""
+    from preprocessing.model_loaders import load_llama_cpp_model
+
+    # Explicit settings take precedence over any saved profile.
+    return load_llama_cpp_model(
+        model_id,
+        n_ctx=prompt_tokens + generated_tokens + 8,
+        n_threads=n_threads,
+        n_threads_batch=n_threads,
+        n_batch=n_batch,
+    )
+
+
+def measure_llama_cpp(model, n_threads: int, n_batch: int, prompt_tokens: int, generated_tokens: int) -> dict:
+    """Prompt evaluation and generation speed of a loaded model, in tokens/s.
+
+    `seconds` estimates how long a typical script job would take, the lower the better.
+    """
+    prompt = model.tokenize(_SAMPLE_TEXT.encode("utf-8") * (prompt_tokens // 32 + 1), add_bos=True)[:prompt_tokens]
+    start = time.perf_counter()
+    model.eval(prompt)
+    prompt_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(generated_tokens):
+        model.eval([model.sample(temp=0.0)])
+    generation_seconds = time.perf_counter() - start
+
+    prompt_tps = len(prompt) / prompt_seconds
+    generation_tps = generated_tokens / generation_seconds
+    return {
+        "n_threads": n_threads,
+        "n_batch": n_batch,
+        "prompt_tokens_per_second": prompt_tps,
+        "generated_tokens_per_second": generation_tps,
+        "seconds": _WORKLOAD_PROMPT_TOKENS / prompt_tps + _WORKLOAD_GENERATED_TOKENS / generation_tps,
+    }
+
+
+def bench_llama_cpp(model_id: str, n_threads: int, n_batch: int, prompt_tokens: int, generated_tokens: int) -> dict:
+    """Load the model with the given settings and measure it, see `measure_llama_cpp`."""
+    model = load_bench_model(model_id, n_threads, n_batch, prompt_tokens, generated_tokens)
+    try:
+        return measure_llama_cpp(model, n_threads, n_batch, prompt_tokens, generated_tokens)
+    finally:
+        model.close()
+
+
+def bench_tts(model, voice_profile: str, torch_threads: int, stop: threading.Event | None = None) -> dict:
+    """The real-time factor (seconds of audio per second of synthesis) of the TTS model with `torch_threads`.
+
+    Without `stop`, the text is synthesized twice after a warm-up run; with it, repeatedly until it is set.
+    """
+    import torch
+    from inference.text_to_speech import text_to_speech
+
+    torch.set_num_threads(torch_threads)
+    text_to_speech(_SAMPLE_TEXT, model, voice_profile)
+    samples = 0
+    runs = 0
+    start = time.perf_counter()
+    while (runs < 2) if stop is None else not stop.is_set():
+        samples += len(text_to_speech(_SAMPLE_TEXT, model, voice_profile))
+        runs += 1
+    return {
+        "torch_threads": torch_threads,
+        "real_time_factor": samples / model.sample_rate / (time.perf_counter() - start),
+    }
+
+
+def bench_shared(
+    config: AutotuneConfig, tts_model, voice_profile: str, llm_threads: int, tts_threads: int, n_batch: int
+) -> tuple[dict, dict]:
+    """Both models at once: the LLM trial runs while the TTS model synthesizes in a background thread.
+
+    The LLM is loaded first, so the TTS thread only overlaps the prompt evaluation and generation it competes with.
+    """
+    model = load_bench_model(
+        config.text_to_text_model, llm_threads, n_batch, config.prompt_tokens, config.generated_tokens
+    )
+    try:
+        stop = threading.Event()
+        tts_result = {}
+        tts_thread = threading.Thread(
+            target=lambda: tts_result.update(bench_tts(tts_model, voice_profile, tts_threads, stop)), daemon=True
+        )
+        tts_thread.start()
+        try:
+            llm_result = measure_llama_cpp(model, llm_threads, n_batch, config.prompt_tokens, config.generated_tokens)
+        finally:
+            stop.set()
+            tts_thread.join()
+    finally:
+        model.close()
+    return llm_result, tts_result
+
+
+def do_autotune(config: AutotuneConfig) -> str:
+    """Find the best llama.cpp and torch settings on this host, for each model alone and for both side by side.
+
+    Alone, the llama.cpp settings taking the least time for a typical script job win, and the torch threads with
+    the highest real-time factor. Side by side, the CPUs are split between both models, and the split keeping the
+    slower of the two closest to its own best speed wins.
+
+    Returns:
+        str: Path to the saved host profile.
+    """
+    from preprocessing.model_loaders import tts_loader_by_model
+
+    cpu_count = os.cpu_count() or 1
+    threads = sorted(set(config.threads or thread_candidates(cpu_count)))
+    profile_path = config.profile_file or host_profile_path()
+
+    llm_trials = []
+    for n_threads in threads:
+        for n_batch in config.n_batch:
+            trial = bench_llama_cpp(
+                config.text_to_text_model, n_threads, n_batch, config.prompt_tokens, config.generated_tokens
+            )
+            logger.info(
+                f"llama.cpp n_threads={n_threads} n_batch={n_batch}: "
+                f"{trial['prompt_tokens_per_second']:.1f} prompt tokens/s, "
+                f"{trial['generated_tokens_per_second']:.1f} generated tokens/s"
+            )
+            llm_trials.append(trial)
+    llm_solo = min(llm_trials, key=lambda trial: trial["seconds"])
+
+    voice_profile = SpeakerConfig().speakers[0].voice_profile
+    tts_model = tts_loader_by_model(config.text_to_speech_model)(
+        model_id=config.text_to_speech_model, lang_code=voice_profile[0], torch_threads=threads[-1]
+    )
+    tts_trials = []
+    for torch_threads in threads:
+        trial = bench_tts(tts_model, voice_profile, torch_threads)
+        logger.info(f"TTS torch_threads={torch_threads}: real-time factor {trial['real_time_factor']:.2f}")
+        tts_trials.append(trial)
+    tts_solo = max(tts_trials, key=lambda trial: trial["real_time_factor"])
+
+    shared_trials = []
+    for llm_threads in threads:
+        tts_threads = cpu_count - llm_threads
+        if tts_threads < 1:
+            continue
+        llm_trial, tts_trial = bench_shared(
+            config, tts_model, voice_profile, llm_threads, tts_threads, llm_solo["n_batch"]
+        )
+        # How close each model gets to its best speed alone, the pipeline being held back by the slower one.
+        score = min(
+            llm_solo["seconds"] / llm_trial["seconds"], tts_trial["real_time_factor"] / tts_solo["real_time_factor"]
+        )
+        logger.info(f"Shared LLM threads={llm_threads}, TTS threads={tts_threads}: {score:.0%} of their solo speed")
+        shared_trials.append({"llama_cpp": llm_trial, "tts": tts_trial, "score": score})
+    # With a single CPU there is nothing to split, both get it.
+    shared = max(shared_trials, key=lambda trial: trial["score"], default={"llama_cpp": llm_solo, "tts": tts_solo})
+
+    def llama_cpp_settings(trial: dict) -> dict:
+        return {"n_threads": trial["n_threads"], "n_threads_batch": trial["n_threads"], "n_batch": trial["n_batch"]}
+
+    save_host_profile(
+        "llama_cpp",
+        config.text_to_text_model,
+        {
+            "solo": llama_cpp_settings(llm_solo),
+            "shared": llama_cpp_settings(shared["llama_cpp"]),
+            "trials": llm_trials,
+        },
+        profile_path,
+    )
+    return save_host_profile(
+        "tts",
+        config.text_to_speech_model,
+        {
+            "solo": {"torch_threads": tts_solo["torch_threads"]},
+            "shared": {"torch_threads": shared["tts"]["torch_threads"]},
+            "trials": tts_trials,
+            "shared_trials": shared_trials,
+        },
+        profile_path,
+    )
+
+
+if __name__ == "__main__":
+    config = parse_args()
+    print(do_autotune(config))
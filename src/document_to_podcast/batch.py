@@ -0,0 +1,374 @@
+import argparse
+import json
+import multiprocessing
+import threading
+import time
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from artifact_cache import cached_file, open_artifact_cache
+from audio_output import audio_filename
+from generate_audio import (
+    audio_cache_key,
+    load_speech_cache,
+    load_text_to_speech_model,
+    open_audio_checkpoint,
+    speaker_turns,
+    synthesize_turns,
+    voice_turns,
+)
+from generate_script import do_script_generation
+from inference.speech_cache import log_cache_stats
+from inference.text_to_speech_pool import TTSWorkerPool
+from load_data import load_and_clean_data
+from loguru import logger
+from metrics import METRICS
+from models import BatchConfig, PodcastGenerationConfig
+from preprocessing.data_loaders import loader_by_extension
+from script_parsing import parse_script_stream
+from utils import ordered_map, prefetch, save_data, write_audio_segments
+
+
+def parse_args() -> BatchConfig:
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument(
+        "--config", type=str, help="Path to the config file or a JSON string, this overrides any other parameters"
+    )
+    parser.add_argument("--manifest", type=Path, help="Directory of documents, or JSONL file of podcast configs")
+    parser.add_argument("--output_folder", type=Path, help="Path to the output folder")
+    parser.add_argument("--defaults", type=json.loads, help="JSON config values applied to every document")
+    parser.add_argument("--load_workers", type=int, help="Number of processes loading and cleaning documents")
+    parser.add_argument("--audio_format", type=str, choices=["wav", "flac", "opus"], help="Format of the podcast audio")
+    parser.add_argument("--segment_seconds", type=float, help="Split the podcast audio into files of this duration")
+    parser.add_argument("--tts_workers", type=int, help="Number of processes synthesizing speech in parallel")
+    parser.add_argument(
+        "--audio_dtype", type=str, choices=["float32", "int16"], help="Sample format the audio is assembled in"
+    )
+    parser.add_argument(
+        "--host_mode",
+        type=str,
+        choices=["solo", "shared"],
+        help="Which settings of the host profile to load models with",
+    )
+    parser.add_argument("--tts_torch_threads", type=int, help="Torch threads used by each TTS worker process")
+    parser.add_argument("--audio_workers", type=int, help="Number of documents synthesized at the same time")
+    parser.add_argument("--stage_queue_size", type=int, help="Maximum number of documents waiting between stages")
+    parser.add_argument("--speech_cache_dir", type=Path, help="Directory to cache synthesized speech segments in")
+    parser.add_argument("--metrics_file", type=Path, help="JSON file to save performance metrics to")
+    parser.add_argument("--prometheus_textfile", type=Path, help="File to save the metrics to in Prometheus format")
+
+    args = parser.parse_args()
+
+    config_data = {}
+
+    if args.config:
+        if Path(args.config).exists():
+            with Path.open(args.config, "r") as f:
+                config_data = json.load(f)
+        else:
+            config_data = json.loads(args.config)
+    else:
+        config_data = {k: v for k, v in vars(args).items() if v is not None}
+
+    return BatchConfig.model_validate(config_data)
+
+
+@dataclass
+class BatchItem:
+    """A document moving through the pipeline, with whatever each stage produced for it.
+
+    `config` is None when the document's manifest entry is invalid, `error` then says why.
+    """
+
+    input_file: str
+    config: PodcastGenerationConfig | None
+    text: str | None = None
+    script: str | None = None
+    result: dict[str, str] = field(default_factory=dict)
+    error: str | None = None
+    timings: dict[str, float] = field(default_factory=dict)
+
+    def to_dict(self) -> dict:
+        return {
+            "input_file": self.input_file,
+            "status": "failed" if self.error else "done",
+            "error": self.error,
+            "result": self.result,
+            "timings": self.timings,
+        }
+
+
+def read_manifest(manifest: Path, output_folder: Path, defaults: dict | None = None) -> list[BatchItem]:
+    """Build the config of every document of a manifest.
+
+    A directory manifest lists every supported document in it. A JSONL manifest holds one (partial) podcast config
+    per line, which needs at least an `input_file`. Documents without an `output_folder` are given their own
+    subfolder of `output_folder`, named after the input file.
+
+    Each entry is validated on its own: an invalid one is returned as a failed item, without a config, and the
+    rest of the batch still runs.
+    """
+    manifest = Path(manifest)
+    if manifest.is_dir():
+        entries = []
+        for path in sorted(manifest.iterdir()):
+            try:
+                loader_by_extension(path)
+            except ValueError:
+                continue
+            entries.append((str(path), {"input_file": str(path)}))
+    else:
+        entries = [
+            (f"{manifest}:{line_number}", line)
+            for line_number, line in enumerate(manifest.read_text().splitlines(), start=1)
+            if line.strip()
+        ]
+
+    items = []
+    used_folders = set()
+    for location, entry in entries:
+        input_file = location
+        try:
+            if isinstance(entry, str):
+                entry = json.loads(entry)
+            if not isinstance(entry, dict):
+                raise ValueError("A manifest entry must be a JSON object")
+            data = {**(defaults or {}), **entry}
+            if "input_file" not in data:
+                raise ValueError("A manifest entry needs an input_file")
+            input_file = str(data["input_file"])
+            if "output_folder" not in data:
+                name = stem = Path(input_file).stem
+                index = 1
+                while name in used_folders:
+                    index += 1
+                    name = f"{stem}_{index}"
+                used_folders.add(name)
+                data["output_folder"] = str(Path(output_folder) / name)
+            items.append(BatchItem(input_file=input_file, config=PodcastGenerationConfig.model_validate(data)))
+        except ValueError as e:
+            # JSON and pydantic validation errors are ValueErrors too.
+            logger.error(f"Invalid manifest entry {location}: {e}")
+            items.append(BatchItem(input_file=input_file, config=None, error=f"{type(e).__name__}: {e}"))
+    return items
+
+
+def _load_document(item: BatchItem) -> BatchItem:
+    """Runs in a loader process, so the cleaned text is saved there too."""
+    if item.error:
+        return item
+    config = item.config
+    start = time.perf_counter()
+    try:
+        item.text = load_and_clean_data(config.input_file, config.pdf_pages, cache=open_artifact_cache(config))
+        item.result["cleaned"] = save_data(config.output_folder, "cleaned.txt", item.text)
+    except Exception as e:
+        item.error = f"{type(e).__name__}: {e}"
+    item.timings["load"] = time.perf_counter() - start
+    return item
+
+
+def load_stage(items: Iterable[BatchItem], executor: ProcessPoolExecutor, max_in_flight: int) -> Iterator[BatchItem]:
+    """Load and clean the documents across the loader processes, yielding them in manifest order."""
+    for item in ordered_map(executor, _load_document, items, max_in_flight=max_in_flight):
+        if "load" not in item.timings:
+            # Its manifest entry was invalid, which is already logged.
+            yield item
+            continue
+        # Loaded in another process, so only its timing makes it back here.
+        METRICS.observe("stage_seconds", item.timings["load"], stage="load")
+        if item.error:
+            logger.error(f"Failed to load {item.input_file}: {item.error}")
+        yield item
+
+
+def script_stage(items: Iterable[BatchItem]) -> Iterator[BatchItem]:
+    """Write the script of each document, one at a time: the LLM uses all its cores for a single generation."""
+    for item in items:
+        if item.error:
+            yield item
+            continue
+        config = item.config
+        start = time.perf_counter()
+        with METRICS.stage("script"):
+            try:
+                item.script = do_script_generation(
+                    item.text,
+                    config.text_to_text_model,
+                    config.text_to_text_prompt,
+                    config.speakers,
+                    config,
+                    cache=open_artifact_cache(config),
+                )
+                item.result["script"] = save_data(config.output_folder, "podcast.txt", item.script)
+            except Exception as e:
+                logger.exception(e)
+                item.error = f"{type(e).__name__}: {e}"
+        item.text = None  # Only the script is needed from here on
+        item.timings["script"] = time.perf_counter() - start
+        yield item
+
+
+class AudioStage:
+    """Synthesize the scripts, on TTS models loaded once for the whole batch.
+
+    With several TTS workers, one pool of worker processes per model is shared by every document, and up to
+    `audio_workers` documents feed it at the same time. Otherwise the documents are synthesized one at a time
+    in this process.
+    """
+
+    def __init__(self, batch: BatchConfig):
+        self.batch = batch
+        self._pools: dict[tuple[str, str], TTSWorkerPool] = {}
+        self._lock = threading.Lock()
+        # The worker processes open their own handle on the cache.
+        self._cache = load_speech_cache(batch) if batch.tts_workers == 1 else None
+
+    @property
+    def concurrency(self) -> int:
+        return self.batch.audio_workers if self.batch.tts_workers > 1 else 1
+
+    def _pool(self, model_id: str, lang_code: str) -> TTSWorkerPool:
+        with self._lock:
+            if (model_id, lang_code) not in self._pools:
+                self._pools[model_id, lang_code] = TTSWorkerPool(
+                    model_id,
+                    lang_code,
+                    workers=self.batch.tts_workers,
+                    torch_threads=self.batch.tts_torch_threads,
+                    cache_dir=self.batch.speech_cache_dir,
+                    cache_max_bytes=self.batch.speech_cache_max_bytes,
+                    host_mode=self.batch.host_mode,
+                )
+            return self._pools[model_id, lang_code]
+
+    def _write_audio(self, config: PodcastGenerationConfig, script: str, output_path: Path) -> str:
+        lang_code = config.speakers[0].voice_profile[0]
+        turns = speaker_turns(parse_script_stream([script]), config.speakers)
+        checkpoint = None
+        if config.checkpoint_audio:
+            checkpoint = open_audio_checkpoint(output_path, script, config.text_to_speech_model, config.speakers)
+            turns = checkpoint.remaining(turns)
+        turns = voice_turns(turns, config.speakers)
+        if self.batch.tts_workers > 1:
+            pool = self._pool(config.text_to_speech_model, lang_code)
+            segments, sample_rate = pool.synthesize(turns), pool.sample_rate
+        else:
+            model = load_text_to_speech_model(
+                config.text_to_speech_model, lang_code, self.batch.tts_torch_threads, self.batch.host_mode
+            )
+            segments, sample_rate = synthesize_turns(turns, model, self._cache), model.sample_rate
+        if checkpoint is not None:
+            segments = checkpoint.segments(segments, sample_rate)
+        result_path = write_audio_segments(
+            output_path, segments, sample_rate, dtype=config.audio_dtype, segment_seconds=config.segment_seconds
+        )
+        if checkpoint is not None:
+            checkpoint.remove()
+        return result_path
+
+    def __call__(self, item: BatchItem) -> BatchItem:
+        if item.error:
+            return item
+        config = item.config
+        start = time.perf_counter()
+        with METRICS.stage("audio"):
+            try:
+                output_path = config.output_folder / audio_filename("podcast", config.audio_format)
+                cache = open_artifact_cache(config)
+                if config.segment_seconds:
+                    # Many files, which the artifact cache doesn't store.
+                    item.result["audio"] = self._write_audio(config, item.script, output_path)
+                else:
+                    key = (
+                        audio_cache_key(cache, item.script, config.text_to_speech_model, config.speakers)
+                        if cache
+                        else None
+                    )
+                    item.result["audio"] = cached_file(
+                        cache,
+                        "audio",
+                        key,
+                        output_path,
+                        lambda output_path: self._write_audio(config, item.script, output_path),
+                    )
+            except Exception as e:
+                logger.exception(e)
+                item.error = f"{type(e).__name__}: {e}"
+        item.timings["audio"] = time.perf_counter() - start
+        return item
+
+    def __enter__(self):
+        """Returns the stage, whose worker processes are shut down on exit."""
+        return self
+
+    def __exit__(self, *exc):
+        """Shuts down the TTS worker processes and logs the speech cache statistics."""
+        for pool in self._pools.values():
+            pool.close()
+            log_cache_stats(pool.cache_hits, pool.cache_misses)
+        if self._cache:
+            self._cache.log_stats()
+
+
+def run_batch(batch: BatchConfig) -> dict:
+    """Run every document of the manifest through loading, script generation and audio generation.
+
+    The stages run concurrently on different documents, connected by queues of at most `stage_queue_size`
+    documents: while one document is being synthesized, the next one's script is written and the ones after are
+    loaded. A document failing at one stage is reported and skips the following ones, the others carry on.
+
+    Returns:
+        dict: The batch report, also saved as `batch_report.json` in the output folder.
+    """
+    manifest_items = read_manifest(
+        batch.manifest, batch.output_folder, {"host_mode": batch.host_mode, **batch.defaults}
+    )
+    logger.info(f"Running a batch of {len(manifest_items)} documents")
+    start = time.perf_counter()
+    items = []
+    with (
+        METRICS.stage("batch"),
+        ProcessPoolExecutor(
+            max_workers=batch.load_workers,
+            # The LLM and TTS stages run threads in this process, which forked children would inherit.
+            mp_context=multiprocessing.get_context("spawn"),
+        ) as load_executor,
+        AudioStage(batch) as audio_stage,
+        ThreadPoolExecutor(max_workers=audio_stage.concurrency) as audio_executor,
+    ):
+        loaded = prefetch(
+            load_stage(manifest_items, load_executor, max_in_flight=batch.load_workers * 2),
+            maxsize=batch.stage_queue_size,
+        )
+        scripted = prefetch(script_stage(loaded), maxsize=batch.stage_queue_size)
+        for item in ordered_map(audio_executor, audio_stage, scripted, max_in_flight=audio_stage.concurrency):
+            status = f"failed: {item.error}" if item.error else "done"
+            logger.info(f"{item.input_file}: {status}")
+            items.append(item)
+
+    elapsed = time.perf_counter() - start
+    done = sum(item.error is None for item in items)
+    report = {
+        "documents": len(items),
+        "done": done,
+        "failed": len(items) - done,
+        "elapsed_seconds": elapsed,
+        "documents_per_hour": done / elapsed * 3600 if elapsed else 0.0,
+        "items": [item.to_dict() for item in items],
+    }
+    METRICS.set("batch_documents_per_hour", report["documents_per_hour"])
+    METRICS.add("batch_documents_failed", report["failed"])
+    logger.info(f"Finished {done} of {len(items)} documents in {elapsed:.1f}s ({report['documents_per_hour']:.1f}/h)")
+    save_data(batch.output_folder, "batch_report.json", json.dumps(report, indent=2))
+    return report
+
+
+if __name__ == "__main__":
+    config = parse_args()
+    report = run_batch(config)
+    METRICS.save(config.metrics_file, config.prometheus_textfile)
+    print(config.output_folder / "batch_report.json")
@@ -1,16 +1,26 @@
 import argparse
 import json
-import re
+import time
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
 from pathlib import Path
 
 import soundfile as sf
-from inference.text_to_speech import text_to_speech
+from artifact_cache import ArtifactCache, cached_file, open_artifact_cache, speakers_params
+from audio_checkpoint import AudioCheckpoint
+from audio_output import audio_filename
+from inference.speech_cache import SpeechCache, log_cache_stats
+from inference.text_to_speech import record_turn_metrics, text_to_speech, text_to_speech_chunks
+from inference.text_to_speech_pool import TTSWorkerPool
 from loguru import logger
-from models import AudioGenerationConfig, Speaker
+from metrics import METRICS
+from models import AudioGenerationConfig, Speaker, SynthesisConfig
 from numpy import ndarray
 from preprocessing.data_loaders import data_load
-from preprocessing.model_loaders import TTSModel, tts_loader_by_model
-from utils import stack_audio_segments
+from preprocessing.host_profile import HostMode
+from preprocessing.model_loaders import TTSModel, get_tts_model
+from script_parsing import ScriptTurn, parse_script_stream
+from utils import prefetch, stack_audio_segments, write_audio_segments
 
 
 def parse_args() -> AudioGenerationConfig:
@@ -22,6 +32,44 @@ def parse_args() -> AudioGenerationConfig:
     parser.add_argument("--output_folder", type=Path)
     parser.add_argument("--text_to_speech_model", type=str)
     parser.add_argument("--speakers", type=list[Speaker], help="JSON string defining speakers")
+    parser.add_argument(
+        "--stream_output",
+        action="store_true",
+        default=None,
+        help="Write each turn to disk as soon as it is synthesized instead of building the whole podcast in memory",
+    )
+    parser.add_argument(
+        "--checkpoint_audio",
+        action="store_true",
+        default=None,
+        help="Save every synthesized turn, so a re-run resumes from the first missing one",
+    )
+    parser.add_argument("--audio_format", type=str, choices=["wav", "flac", "opus"], help="Format of the podcast audio")
+    parser.add_argument("--segment_seconds", type=float, help="Split the podcast audio into files of this duration")
+    parser.add_argument("--tts_workers", type=int, help="Number of processes synthesizing speech in parallel")
+    parser.add_argument(
+        "--audio_dtype", type=str, choices=["float32", "int16"], help="Sample format the audio is assembled in"
+    )
+    parser.add_argument("--tts_torch_threads", type=int, help="Torch threads used by each TTS worker process")
+    parser.add_argument(
+        "--pipelined_synthesis",
+        action="store_true",
+        default=None,
+        help="Synthesize chunk by chunk in a background thread, overlapping synthesis with writing",
+    )
+    parser.add_argument(
+        "--host_mode",
+        type=str,
+        choices=["solo", "shared"],
+        help="Which settings of the host profile to load models with",
+    )
+    parser.add_argument("--speech_cache_dir", type=Path, help="Directory to cache synthesized speech segments in")
+    parser.add_argument("--speech_cache_max_mb", type=int, help="Size cap of the speech segment cache")
+    parser.add_argument("--artifact_cache_dir", type=Path, help="Directory caching the output of each stage")
+    parser.add_argument("--force", action="store_true", default=None, help="Run even if the output is cached")
+    parser.add_argument("--no_cache", action="store_true", default=None, help="Don't use the artifact cache")
+    parser.add_argument("--metrics_file", type=Path, help="JSON file to save performance metrics to")
+    parser.add_argument("--prometheus_textfile", type=Path, help="File to save the metrics to in Prometheus format")
 
     args = parser.parse_args()
 
@@ -41,56 +89,303 @@ def parse_args() -> AudioGenerationConfig:
     return AudioGenerationConfig.model_validate(config_data)
 
 
-def load_text_to_speech_model(model: str, lang_code: str = "b") -> TTSModel:
+def load_text_to_speech_model(
+    model: str, lang_code: str = "b", torch_threads: int | None = None, host_mode: HostMode = "solo"
+) -> TTSModel:
     logger.info(f"Loading text to speech model: {model}, with lang code: {lang_code}")
-    return tts_loader_by_model(model)(
+    return get_tts_model(
         model_id=model,
-        **{"lang_code": lang_code},
+        **{"lang_code": lang_code, "torch_threads": torch_threads, "host_mode": host_mode},
     )
 
 
-def generate_audio(input_script: str, speech_model: TTSModel, speakers: list[Speaker]) -> ndarray:
-    logger.info("Generating podcast audio...")
+def speaker_turns(turns: Iterable[ScriptTurn], speakers: list[Speaker]) -> Iterator[ScriptTurn]:
+    """Yield the parsed turns spoken by one of `speakers`, skipping the others.
 
-    podcast_audio = []
-
-    for line in input_script.split("\n"):
-        if "Speaker" not in line:
+    Raises:
+        ValueError: Once the turns are exhausted, if none of them was spoken by one of `speakers`, rather than
+            producing an empty podcast.
+    """
+    speaker_ids = {speaker.id for speaker in speakers}
+    spoken = False
+    for turn in turns:
+        if turn.speaker_id not in speaker_ids:
+            logger.warning(f"Skipping turn from unknown speaker {turn.speaker_id}: {turn.text}")
             continue
-        logger.debug(line)
-        speaker_id = re.search(r"Speaker (\d+)", line).group(1)
-        voice_profile = next(speaker.voice_profile for speaker in speakers if speaker.id == int(speaker_id))
-        speech = text_to_speech(
-            line.split(f'"Speaker {speaker_id}":')[-1],
-            speech_model,
-            voice_profile,
-        )
-        podcast_audio.append(speech)
+        logger.debug(f"Speaker {turn.speaker_id}: {turn.text}")
+        spoken = True
+        yield turn
+    if not spoken:
+        raise ValueError("The script has no turn by the configured speakers, see the warnings for what was skipped")
+
+
+def voice_turns(turns: Iterable[ScriptTurn], speakers: list[Speaker]) -> Iterator[tuple[str, str]]:
+    """Yield the `(input_text, voice_profile)` of each turn, see
+    [speaker_turns][document_to_podcast.generate_audio.speaker_turns] for the turns of known speakers only.
+    """
+    voice_profiles = {speaker.id: speaker.voice_profile for speaker in speakers}
+    for speaker_id, turn_text in turns:
+        yield turn_text, voice_profiles[speaker_id]
+
+
+def script_turns(input_script: str, speakers: list[Speaker]) -> Iterator[tuple[str, str]]:
+    """Yield the `(input_text, voice_profile)` of each turn of the script, in order."""
+    return voice_turns(speaker_turns(parse_script_stream([input_script]), speakers), speakers)
+
+
+def synthesize_turns(
+    turns: Iterable[tuple[str, str]], speech_model: TTSModel, cache: SpeechCache | None = None
+) -> Iterator[ndarray]:
+    """Lazily synthesize each `(input_text, voice_profile)` turn, in order."""
+    for input_text, voice_profile in turns:
+        start = time.perf_counter()
+        audio = text_to_speech(input_text, speech_model, voice_profile, cache=cache)
+        record_turn_metrics(time.perf_counter() - start, len(audio), speech_model.sample_rate)
+        yield audio
+
+
+def synthesize_turns_pipelined(
+    turns: Iterable[tuple[str, str]], speech_model: TTSModel, cache: SpeechCache | None = None
+) -> Iterator[Iterator[ndarray]]:
+    """Synthesize the turns chunk by chunk in a background thread, while the caller consumes earlier chunks.
+
+    Yields:
+        Iterator[ndarray]: For each turn in order, an iterator over its audio chunks. Each one must be consumed
+            before advancing to the next turn.
+    """
+
+    def turns_chunks() -> Iterator[ndarray | None]:
+        """The chunks of every turn, each turn followed by `None`, even a turn without audio."""
+        for input_text, voice_profile in turns:
+            chunks = text_to_speech_chunks(input_text, speech_model, voice_profile, cache=cache)
+            seconds, samples = 0.0, 0
+            while True:
+                # Only time the synthesis, not the wait for room in the prefetch queue.
+                start = time.perf_counter()
+                chunk = next(chunks, None)
+                seconds += time.perf_counter() - start
+                if chunk is None:
+                    break
+                samples += len(chunk)
+                yield chunk
+            record_turn_metrics(seconds, samples, speech_model.sample_rate)
+            yield None
+
+    stream = prefetch(turns_chunks(), maxsize=4)
+
+    def turn_chunks(first: ndarray | None) -> Iterator[ndarray]:
+        chunk = first
+        while chunk is not None:
+            yield chunk
+            chunk = next(stream)
+
+    # An empty turn (e.g. punctuation only) still gets its group, keeping the turns after it in step.
+    end = object()
+    current = None
+    while True:
+        if current is not None:
+            # Skip whatever the caller left of the previous turn.
+            for _ in current:
+                pass
+        first = next(stream, end)
+        if first is end:
+            return
+        current = turn_chunks(first)
+        yield current
+
+
+def generate_audio(
+    input_script: str, speech_model: TTSModel, speakers: list[Speaker], cache: SpeechCache | None = None
+) -> ndarray:
+    logger.info("Generating podcast audio...")
+
+    podcast_audio = synthesize_turns(script_turns(input_script, speakers), speech_model, cache)
 
     complete_audio = stack_audio_segments(podcast_audio, sample_rate=speech_model.sample_rate, silence_pad=1.0)
 
     return complete_audio
 
 
-def save_podcast_audio(output_folder: Path, filename: str, complete_audio: ndarray, sample_rate: int):
+@contextmanager
+def open_turn_audio(
+    turns: Iterable[tuple[str, str]],
+    model_id: str,
+    lang_code: str,
+    synthesis: SynthesisConfig | None = None,
+    pool: TTSWorkerPool | None = None,
+) -> Iterator[tuple[Iterator[ndarray], int]]:
+    """Set up synthesis of `(input_text, voice_profile)` turns, serially or on a pool of worker processes.
+
+    A `pool` loaded by the caller for `model_id` is used as is and left running, so that its workers keep the model
+    loaded for the next call. Otherwise, with several `tts_workers`, a pool is started for these turns only.
+
+    Yields:
+        tuple[Iterator[ndarray], int]: The lazily synthesized turns, in order, and their sample rate.
+            With `pipelined_synthesis`, each turn is itself an iterator of audio chunks.
+    """
+    synthesis = synthesis or SynthesisConfig()
+    if pool is not None:
+        yield pool.synthesize(turns), pool.sample_rate
+    elif synthesis.tts_workers > 1:
+        with TTSWorkerPool(
+            model_id,
+            lang_code,
+            workers=synthesis.tts_workers,
+            torch_threads=synthesis.tts_torch_threads,
+            cache_dir=synthesis.speech_cache_dir,
+            cache_max_bytes=synthesis.speech_cache_max_bytes,
+            host_mode=synthesis.host_mode,
+        ) as pool:
+            yield pool.synthesize(turns), pool.sample_rate
+        log_cache_stats(pool.cache_hits, pool.cache_misses)
+    else:
+        cache = load_speech_cache(synthesis)
+        text_to_speech_model = load_text_to_speech_model(
+            model_id, lang_code, synthesis.tts_torch_threads, synthesis.host_mode
+        )
+        synthesize = synthesize_turns_pipelined if synthesis.pipelined_synthesis else synthesize_turns
+        yield synthesize(turns, text_to_speech_model, cache), text_to_speech_model.sample_rate
+        if cache:
+            cache.log_stats()
+
+
+def open_audio_segments(
+    script: str,
+    model_id: str,
+    speakers: list[Speaker],
+    synthesis: SynthesisConfig | None = None,
+    pool: TTSWorkerPool | None = None,
+):
+    """Set up synthesis for the script, see [open_turn_audio][document_to_podcast.generate_audio.open_turn_audio]."""
+    return open_turn_audio(script_turns(script, speakers), model_id, speakers[0].voice_profile[0], synthesis, pool)
+
+
+def open_audio_checkpoint(output_path: Path, script: str, model_id: str, speakers: list[Speaker]) -> AudioCheckpoint:
+    """The checkpoint of the turns of `output_path`, saved in a `<name>_turns` folder next to it."""
+    params = {"model_id": model_id, "speakers": speakers_params(speakers)}
+    return AudioCheckpoint(output_path.parent / f"{output_path.stem}_turns", script, params)
+
+
+def write_checkpointed_audio(
+    output_path: Path,
+    script: str,
+    model_id: str,
+    speakers: list[Speaker],
+    synthesis: SynthesisConfig | None = None,
+    segment_seconds: float | None = None,
+) -> str:
+    """Stream the podcast audio to `output_path`, saving every turn so that a re-run picks up where this one stopped.
+
+    Once every turn is saved, the audio is assembled from them without loading the model. The saved turns are
+    removed once the podcast is written.
+    """
+    synthesis = synthesis or SynthesisConfig()
+    checkpoint = open_audio_checkpoint(output_path, script, model_id, speakers)
+    turns = list(speaker_turns(parse_script_stream([script]), speakers))
+    sample_rate = checkpoint.manifest["sample_rate"]
+    if checkpoint.completed == len(turns) and sample_rate is not None:
+        logger.info(f"Every turn is saved in {checkpoint.folder}, assembling them")
+        segments = checkpoint.segments([], sample_rate)
+        result_path = write_audio_segments(
+            output_path, segments, sample_rate, dtype=synthesis.audio_dtype, segment_seconds=segment_seconds
+        )
+    else:
+        remaining = voice_turns(checkpoint.remaining(turns), speakers)
+        with open_turn_audio(remaining, model_id, speakers[0].voice_profile[0], synthesis) as (segments, sample_rate):
+            segments = checkpoint.segments(segments, sample_rate)
+            result_path = write_audio_segments(
+                output_path, segments, sample_rate, dtype=synthesis.audio_dtype, segment_seconds=segment_seconds
+            )
+    checkpoint.remove()
+    return result_path
+
+
+def save_podcast_audio(
+    output_folder: Path, filename: str, complete_audio: ndarray, sample_rate: int, segment_seconds: float | None = None
+):
     output_path = output_folder / filename
     logger.info(f"Saving Podcast audio to {output_path}")
-    sf.write(str(output_path), complete_audio, samplerate=sample_rate)
-    return str(output_path)
+    return write_audio_segments(
+        output_path, [complete_audio], sample_rate, silence_pad=0.0, segment_seconds=segment_seconds
+    )
+
+
+def load_speech_cache(synthesis: SynthesisConfig) -> SpeechCache | None:
+    if synthesis.speech_cache_dir is None:
+        return None
+    return SpeechCache(synthesis.speech_cache_dir, max_bytes=synthesis.speech_cache_max_bytes)
+
 
+def audio_cache_key(cache: ArtifactCache, script: str, model_id: str, speakers: list[Speaker]) -> str:
+    params = {"model_id": model_id, "speakers": speakers_params(speakers), "silence_pad": 1.0}
+    return cache.key("audio", script, params)
 
-def do_audio_generation(script: str, model_id: str, speakers: list[Speaker]) -> (ndarray, int):
-    lang_code = speakers[0].voice_profile[0]
-    text_to_speech_model = load_text_to_speech_model(model_id, lang_code)
-    audio = generate_audio(script, text_to_speech_model, speakers)
-    return audio, text_to_speech_model.sample_rate
+
+def do_audio_generation(
+    script: str,
+    model_id: str,
+    speakers: list[Speaker],
+    synthesis: SynthesisConfig | None = None,
+    cache: ArtifactCache | None = None,
+    pool: TTSWorkerPool | None = None,
+) -> (ndarray, int):
+    """Synthesize the podcast audio of a script.
+
+    With a cache, the audio is reused as long as the script, the model and the speakers are unchanged. A `pool` of
+    TTS workers already running `model_id` is used instead of starting one.
+    """
+    synthesis = synthesis or SynthesisConfig()
+    if cache is not None:
+        key = audio_cache_key(cache, script, model_id, speakers)
+        cached = cache.get("audio", key, ".wav")
+        if cached is not None:
+            audio, sample_rate = sf.read(cached, dtype=synthesis.audio_dtype)
+            return audio, sample_rate
+    logger.info("Generating podcast audio...")
+    with open_audio_segments(script, model_id, speakers, synthesis, pool) as (segments, sample_rate):
+        audio = stack_audio_segments(segments, sample_rate=sample_rate, silence_pad=1.0, dtype=synthesis.audio_dtype)
+    if cache is not None:
+        cache.put("audio", key, ".wav", lambda path: sf.write(str(path), audio, samplerate=sample_rate))
+    return audio, sample_rate
 
 
 if __name__ == "__main__":
     config = parse_args()
     text = data_load(config.input_file)
-    podcast_audio: ndarray
-    sample_rate: int
-    podcast_audio, sample_rate = do_audio_generation(text, config.text_to_speech_model, config.speakers)
-    result_path = save_podcast_audio(config.output_folder, "podcast.wav", podcast_audio, sample_rate)
+    cache = open_artifact_cache(config)
+    filename = audio_filename("podcast", config.audio_format)
+    with METRICS.stage("audio"):
+        if config.stream_output or config.checkpoint_audio:
+
+            def stream_audio(output_path: Path) -> str:
+                if config.checkpoint_audio:
+                    return write_checkpointed_audio(
+                        output_path, text, config.text_to_speech_model, config.speakers, config, config.segment_seconds
+                    )
+                audio_segments = open_audio_segments(text, config.text_to_speech_model, config.speakers, config)
+                with audio_segments as (segments, sample_rate):
+                    return write_audio_segments(
+                        output_path,
+                        segments,
+                        sample_rate,
+                        dtype=config.audio_dtype,
+                        segment_seconds=config.segment_seconds,
+                    )
+
+            if config.segment_seconds:
+                # Many files, which the artifact cache doesn't store.
+                result_path = stream_audio(config.output_folder / filename)
+            else:
+                key = audio_cache_key(cache, text, config.text_to_speech_model, config.speakers) if cache else None
+                result_path = cached_file(cache, "audio", key, config.output_folder / filename, stream_audio)
+        else:
+            podcast_audio: ndarray
+            sample_rate: int
+            podcast_audio, sample_rate = do_audio_generation(
+                text, config.text_to_speech_model, config.speakers, config, cache=cache
+            )
+            result_path = save_podcast_audio(
+                config.output_folder, filename, podcast_audio, sample_rate, config.segment_seconds
+            )
+    METRICS.save(config.metrics_file, config.prometheus_textfile)
     print(result_path)
@@ -0,0 +1,128 @@
+import argparse
+import json
+from collections.abc import Iterator
+from pathlib import Path
+
+from audio_output import audio_filename
+from generate_audio import open_turn_audio, speaker_turns, voice_turns
+from generate_script import load_model_for_text, stream_script
+from inference.text_to_text import get_prompt_prefix_cache
+from loguru import logger
+from metrics import METRICS
+from models import PodcastGenerationConfig, Speaker
+from preprocessing.data_loaders import data_load
+from script_parsing import parse_script_stream
+from utils import prefetch, save_data, write_audio_segments
+
+
+def parse_args() -> PodcastGenerationConfig:
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument(
+        "--config", type=str, help="Path to the config file or a JSON string, this overrides any other parameters"
+    )
+    parser.add_argument("--input_file", type=Path, help="Path to the cleaned input file")
+    parser.add_argument("--output_folder", type=Path, help="Path to the output folder")
+    parser.add_argument("--text_to_text_prompt", type=str)
+    parser.add_argument("--text_to_text_model", type=str)
+    parser.add_argument("--text_to_speech_model", type=str)
+    parser.add_argument("--speakers", type=list[Speaker], help="JSON string defining speakers")
+    parser.add_argument("--long_document_mode", type=str, choices=["truncate", "condense"])
+    parser.add_argument("--prompt_cache_dir", type=Path, help="Directory to persist the evaluated system prompt in")
+    parser.add_argument("--audio_format", type=str, choices=["wav", "flac", "opus"], help="Format of the podcast audio")
+    parser.add_argument("--segment_seconds", type=float, help="Split the podcast audio into files of this duration")
+    parser.add_argument("--tts_workers", type=int, help="Number of processes synthesizing speech in parallel")
+    parser.add_argument(
+        "--audio_dtype", type=str, choices=["float32", "int16"], help="Sample format the audio is assembled in"
+    )
+    parser.add_argument(
+        "--use_mmap", action=argparse.BooleanOptionalAction, help="Memory-map the model weights (default), or not"
+    )
+    parser.add_argument("--use_mlock", action="store_true", default=None, help="Lock the model weights in RAM")
+    parser.add_argument(
+        "--host_mode",
+        type=str,
+        choices=["solo", "shared"],
+        help="Which settings of the host profile to load models with",
+    )
+    parser.add_argument("--speech_cache_dir", type=Path, help="Directory to cache synthesized speech segments in")
+    parser.add_argument("--turn_queue_size", type=int, help="Maximum number of parsed turns waiting for synthesis")
+    parser.add_argument("--metrics_file", type=Path, help="JSON file to save performance metrics to")
+    parser.add_argument("--prometheus_textfile", type=Path, help="File to save the metrics to in Prometheus format")
+
+    args = parser.parse_args()
+
+    config_data = {}
+
+    if args.config:
+        if Path(args.config).exists():
+            with Path.open(args.config, "r") as f:
+                config_data = json.load(f)
+        else:
+            config_data = json.loads(args.config)
+    else:
+        config_data = vars(args)
+
+    config_data = {k: v for k, v in vars(args).items() if v is not None}
+
+    return PodcastGenerationConfig.model_validate(config_data)
+
+
+def do_podcast_generation(text: str, config: PodcastGenerationConfig) -> tuple[str, str]:
+    """Generate the script and audio at the same time: each turn is synthesized as soon as the LLM finishes it.
+
+    The LLM runs in a background thread and hands finished turns over through a bounded queue, so it keeps
+    writing while the TTS model speaks the previous turns.
+
+    Returns:
+        tuple[str, str]: The paths of the saved script and podcast audio.
+    """
+    text, text_to_text_model = load_model_for_text(
+        text, config.text_to_text_model, config.text_to_text_prompt, config.speakers, config
+    )
+
+    script_chunks = []
+
+    def recorded_script() -> Iterator[str]:
+        for chunk in stream_script(
+            text,
+            text_to_text_model,
+            config.text_to_text_prompt,
+            config.speakers,
+            prefix_cache=get_prompt_prefix_cache(config.prompt_cache_dir),
+            constrained=True,
+        ):
+            script_chunks.append(chunk)
+            yield chunk
+
+    lang_code = config.speakers[0].voice_profile[0]
+    with open_turn_audio(
+        prefetch(
+            voice_turns(speaker_turns(parse_script_stream(recorded_script()), config.speakers), config.speakers),
+            maxsize=config.turn_queue_size,
+        ),
+        config.text_to_speech_model,
+        lang_code,
+        config,
+    ) as (segments, sample_rate):
+        audio_path = write_audio_segments(
+            config.output_folder / audio_filename("podcast", config.audio_format),
+            segments,
+            sample_rate,
+            dtype=config.audio_dtype,
+            segment_seconds=config.segment_seconds,
+        )
+
+    script_path = save_data(config.output_folder, "podcast.txt", "".join(script_chunks))
+    return script_path, audio_path
+
+
+if __name__ == "__main__":
+    config = parse_args()
+    text = data_load(config.input_file)
+    # The script and audio are generated at the same time, so they make up a single stage.
+    with METRICS.stage("podcast"):
+        script_path, audio_path = do_podcast_generation(text, config)
+    logger.info(f"Saved generated script to {script_path}")
+    METRICS.save(config.metrics_file, config.prometheus_textfile)
+    print(audio_path)
@@ -1,14 +1,33 @@
 import argparse
 import json
+import queue
+import re
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import TYPE_CHECKING
 
-from inference.text_to_text import text_to_text_stream
-from llama_cpp import Llama
+from artifact_cache import ArtifactCache, cached_text, open_artifact_cache, speakers_params
+from inference.text_to_text import PromptPrefixCache, get_prompt_prefix_cache, text_to_text, text_to_text_stream
 from loguru import logger
-from models import ScriptGenerationConfig, Speaker
+from metrics import METRICS
+from models import ContextConfig, ScriptGenerationConfig, Speaker
 from preprocessing.data_loaders import data_load
-from preprocessing.model_loaders import load_llama_cpp_model
-from utils import save_data
+from preprocessing.host_profile import HostMode
+from preprocessing.model_loaders import get_llama_cpp_model, get_llama_cpp_tokenizer, load_llama_cpp_model
+from script_parsing import script_grammar
+from utils import ordered_map, save_data
+
+if TYPE_CHECKING:
+    from llama_cpp import Llama
+    from llama_cpp._internals import LlamaModel
+
+_CONDENSE_PROMPT = """
+You are preparing research notes for a podcast about a long document.
+Condense the following excerpt into concise notes.
+Keep every key fact, figure, name, argument and conclusion, and drop filler and repetition.
+Write plain prose, without any preamble.
+"""
 
 
 def parse_args() -> ScriptGenerationConfig:
@@ -22,6 +41,28 @@ def parse_args() -> ScriptGenerationConfig:
     parser.add_argument("--text_to_text_prompt", type=str)
     parser.add_argument("--text_to_text_model", type=str)
     parser.add_argument("--speakers", type=list[Speaker], help="Path to JSON file defining speakers")
+    parser.add_argument(
+        "--long_document_mode",
+        type=str,
+        choices=["truncate", "condense"],
+        help="How to handle documents larger than the model context",
+    )
+    parser.add_argument("--condense_workers", type=int, help="Number of model instances condensing chunks concurrently")
+    parser.add_argument(
+        "--use_mmap", action=argparse.BooleanOptionalAction, help="Memory-map the model weights (default), or not"
+    )
+    parser.add_argument("--use_mlock", action="store_true", default=None, help="Lock the model weights in RAM")
+    parser.add_argument(
+        "--host_mode",
+        type=str,
+        choices=["solo", "shared"],
+        help="Which settings of the host profile to load models with",
+    )
+    parser.add_argument("--artifact_cache_dir", type=Path, help="Directory caching the output of each stage")
+    parser.add_argument("--force", action="store_true", default=None, help="Run even if the output is cached")
+    parser.add_argument("--no_cache", action="store_true", default=None, help="Don't use the artifact cache")
+    parser.add_argument("--metrics_file", type=Path, help="JSON file to save performance metrics to")
+    parser.add_argument("--prometheus_textfile", type=Path, help="File to save the metrics to in Prometheus format")
 
     args = parser.parse_args()
 
@@ -41,43 +82,266 @@ def parse_args() -> ScriptGenerationConfig:
     return ScriptGenerationConfig.model_validate(config_data)
 
 
-def load_text_to_text_model(model: str) -> Llama:
-    logger.info(f"Loading text to text model: {model}")
-    return load_llama_cpp_model(model_id=model)
+# Context sizes to allocate, so that similarly sized documents share one loaded model.
+_CONTEXT_SIZES = (2048, 4096, 8192, 16384, 32768, 65536, 131072)
+# Tokens added by the chat template around the system prompt and the input (role markers, special tokens).
+_CHAT_TEMPLATE_TOKENS = 64
+# The most tokens of notes generated for each chunk of a condensed document.
+_CONDENSE_SUMMARY_TOKENS = 2048
+
+
+def load_text_to_text_model(model: str, n_ctx: int = 0, host_mode: HostMode = "solo", **kwargs) -> "Llama":
+    logger.info(f"Loading text to text model: {model}, with context size: {n_ctx or 'model limit'}")
+    return get_llama_cpp_model(model_id=model, n_ctx=n_ctx, host_mode=host_mode, **kwargs)
+
+
+def count_tokens(text: str, tokenizer: "Llama | LlamaModel") -> int:
+    return len(tokenizer.tokenize(text.encode("utf-8"), add_bos=False, special=False))
+
+
+def truncate_to_tokens(text: str, tokenizer: "Llama | LlamaModel", max_tokens: int) -> str:
+    """Keep at most `max_tokens` of the text, cutting at the last sentence boundary when there is one nearby."""
+    tokens = tokenizer.tokenize(text.encode("utf-8"), add_bos=False, special=False)
+    if len(tokens) <= max_tokens:
+        return text
+
+    truncated = tokenizer.detokenize(tokens[:max_tokens]).decode("utf-8", errors="ignore")
+    sentence_end = max(truncated.rfind(end) for end in (". ", "! ", "? ", "\n"))
+    if sentence_end > len(truncated) * 0.9:
+        truncated = truncated[: sentence_end + 1]
+    logger.warning(f"Input text is too big ({len(tokens)} tokens). Using a subset of ({max_tokens}) tokens.")
+    return truncated
+
+
+def limit_text_size(cleaned_text: str, text_model: "Llama", max_tokens: int | None = None) -> str:
+    return truncate_to_tokens(cleaned_text, text_model, max_tokens or text_model.n_ctx())
+
+
+def budget_context(
+    text: str, model_id: str, system_prompt: str, context: ContextConfig | None = None
+) -> tuple[str, int]:
+    """Size the model context from real token counts: system prompt + input + expected output.
+
+    Text that can't fit in the model's training context is truncated, unless it will be condensed.
+
+    Returns:
+        tuple[str, int]: The text, possibly truncated, and the context size to load the model with.
+    """
+    context = context or ContextConfig()
+    tokenizer = get_llama_cpp_tokenizer(model_id)
+    max_context = tokenizer.n_ctx_train()
+    reserved_tokens = count_tokens(system_prompt, tokenizer) + _CHAT_TEMPLATE_TOKENS + context.max_script_tokens
+    input_tokens = count_tokens(text, tokenizer)
+
+    if reserved_tokens + input_tokens > max_context:
+        if context.long_document_mode == "condense":
+            return text, max_context
+        text = truncate_to_tokens(text, tokenizer, max_context - reserved_tokens)
+        input_tokens = max_context - reserved_tokens
 
+    needed_tokens = reserved_tokens + input_tokens
+    n_ctx = min(next((size for size in _CONTEXT_SIZES if size >= needed_tokens), max_context), max_context)
+    logger.debug(f"Context budget: {input_tokens} input + {reserved_tokens} reserved tokens, allocating {n_ctx}")
+    return text, n_ctx
 
-def limit_text_size(cleaned_text: str, text_model: Llama) -> str:
-    # ~4 characters per token is considered a reasonable default.
-    max_characters = text_model.n_ctx() * 4
-    if len(cleaned_text) <= max_characters:
-        return cleaned_text
 
-    logger.warning(f"Input text is too big ({len(cleaned_text)}). Using a subset of ({max_characters}) characters.")
-    return cleaned_text[:max_characters]
+def split_text(text: str, max_characters: int) -> list[str]:
+    """Split text into chunks of at most `max_characters`, breaking on sentence boundaries where possible."""
+    chunks = []
+    current = ""
+    for sentence in re.split(r"(?<=[.!?])\s+", text):
+        while len(sentence) > max_characters:
+            # A single sentence larger than a chunk, there's no better place to cut it.
+            chunks.append(sentence[:max_characters])
+            sentence = sentence[max_characters:]
+        if current and len(current) + len(sentence) + 1 > max_characters:
+            chunks.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def condense_text(
+    cleaned_text: str, text_models: list["Llama"], max_tokens: int | None = None, summary_tokens: int | None = None
+) -> str:
+    """Condense text that doesn't fit in the context, by summarizing chunks of at most `max_tokens` into notes
+    (map) and merging them (reduce), repeating until the notes fit.
+
+    Chunks are independent, so each model instance condenses one at a time, concurrently with the others.
+
+    Args:
+        cleaned_text (str): The text to condense.
+        text_models (list[Llama]): One or more instances of the same model, one per concurrent chunk. Their context
+        must hold the condense prompt, a chunk and its notes.
+        max_tokens (int | None): The size the notes need to fit in, defaults to half the context.
+        summary_tokens (int | None): The most tokens of notes generated for each chunk, by default until the
+        context is full.
+
+    Returns:
+        str: The merged notes, short enough for the script generation step.
+    """
+    max_tokens = max_tokens or text_models[0].n_ctx() // 2
+
+    available_models = queue.Queue()
+    for text_model in text_models:
+        available_models.put(text_model)
+
+    def condense_chunk(chunk: str) -> str:
+        text_model = available_models.get()
+        try:
+            return text_to_text(
+                chunk,
+                text_model,
+                system_prompt=_CONDENSE_PROMPT.strip(),
+                return_json=False,
+                prefix_cache=get_prompt_prefix_cache(),
+                max_tokens=summary_tokens,
+            )
+        finally:
+            available_models.put(text_model)
+
+    with ThreadPoolExecutor(max_workers=len(text_models)) as executor:
+        while (tokens := count_tokens(cleaned_text, text_models[0])) > max_tokens:
+            # Chunks of `max_tokens` at the text's own characters per token, with a margin as it varies.
+            chunks = split_text(cleaned_text, int(max_tokens * len(cleaned_text) / tokens * 0.9))
+            logger.info(f"Condensing {len(cleaned_text)} characters in {len(chunks)} chunks...")
+            condensed = "\n".join(ordered_map(executor, condense_chunk, chunks, max_in_flight=len(text_models) * 2))
+            if len(condensed) >= len(cleaned_text):
+                logger.warning("Condensing did not reduce the text size, falling back to truncation.")
+                break
+            cleaned_text = condensed
+
+    return limit_text_size(cleaned_text, text_models[0], max_tokens)
+
 
+def format_system_prompt(system_prompt: str, speakers: list[Speaker]) -> str:
+    return system_prompt.strip().replace("{SPEAKERS}", "\n".join(str(speaker) for speaker in speakers))
 
-def generate_script(input_text: str, text_model: Llama, system_prompt: str, speakers: list[Speaker]) -> str:
+
+def stream_script(
+    input_text: str,
+    text_model: "Llama",
+    system_prompt: str,
+    speakers: list[Speaker],
+    prefix_cache: PromptPrefixCache | None = None,
+    constrained: bool = False,
+) -> Iterator[str]:
+    """Yield the podcast script in chunks, as the model generates it.
+
+    With `constrained`, decoding follows a grammar only allowing well-formed turns by the given speakers, see
+    [script_grammar][document_to_podcast.script_parsing.script_grammar], instead of any JSON object.
+    """
     logger.info("Generating podcast script...")
+    yield from text_to_text_stream(
+        input_text,
+        text_model,
+        system_prompt=format_system_prompt(system_prompt, speakers),
+        prefix_cache=prefix_cache,
+        grammar=script_grammar(speaker.id for speaker in speakers) if constrained else None,
+    )
 
-    system_prompt = system_prompt.strip().replace("{SPEAKERS}", "\n".join(str(speaker) for speaker in speakers))
+
+def generate_script(
+    input_text: str,
+    text_model: "Llama",
+    system_prompt: str,
+    speakers: list[Speaker],
+    prefix_cache: PromptPrefixCache | None = None,
+    constrained: bool = False,
+) -> str:
     podcast_script = ""
 
-    for chunk in text_to_text_stream(input_text, text_model, system_prompt=system_prompt):
+    for chunk in stream_script(input_text, text_model, system_prompt, speakers, prefix_cache, constrained):
         podcast_script += chunk
 
     return podcast_script
 
 
-def do_script_generation(text: str, model_id: str, system_prompt: str, speakers: list[Speaker]) -> str:
-    text_to_text_model = load_text_to_text_model(model_id)
-    text = limit_text_size(text, text_to_text_model)
-    return generate_script(text, text_to_text_model, system_prompt, speakers)
+def load_model_for_text(
+    text: str, model_id: str, system_prompt: str, speakers: list[Speaker], context: ContextConfig | None = None
+) -> tuple[str, "Llama"]:
+    """Load the model with a context sized for the text, truncating or condensing text that doesn't fit.
+
+    Returns:
+        tuple[str, Llama]: The text to generate the script from and the loaded model.
+    """
+    context = context or ContextConfig()
+    system_prompt = format_system_prompt(system_prompt, speakers)
+    text, n_ctx = budget_context(text, model_id, system_prompt, context)
+    weights = {"use_mmap": context.use_mmap, "use_mlock": context.use_mlock}
+    text_to_text_model = load_text_to_text_model(model_id, n_ctx=n_ctx, host_mode=context.host_mode, **weights)
+
+    input_budget = n_ctx - count_tokens(system_prompt, text_to_text_model) - _CHAT_TEMPLATE_TOKENS
+    input_budget -= context.max_script_tokens
+    if context.long_document_mode == "condense" and count_tokens(text, text_to_text_model) > input_budget:
+        # Extra instances (not shared through the registry, as each needs its own context) map the same weights
+        # file, so they only add their own context memory, sized for the condense prompt, a chunk and its notes.
+        summary_tokens = min(_CONDENSE_SUMMARY_TOKENS, input_budget // 2)
+        condense_n_ctx = count_tokens(_CONDENSE_PROMPT.strip(), text_to_text_model) + _CHAT_TEMPLATE_TOKENS
+        condense_n_ctx += input_budget + summary_tokens
+        extra_models = [
+            load_llama_cpp_model(model_id, host_mode=context.host_mode, n_ctx=min(condense_n_ctx, n_ctx), **weights)
+            for _ in range(context.condense_workers - 1)
+        ]
+        text = condense_text(text, [text_to_text_model, *extra_models], input_budget, summary_tokens)
+    return text, text_to_text_model
+
+
+def do_script_generation(
+    text: str,
+    model_id: str,
+    system_prompt: str,
+    speakers: list[Speaker],
+    context: ContextConfig | None = None,
+    cache: ArtifactCache | None = None,
+) -> str:
+    """Generate the script of a cleaned text.
+
+    With a cache, the script is reused as long as the text and every setting shaping it (model, prompt, speakers,
+    long document handling) are unchanged, without even loading the model.
+    """
+    context = context or ContextConfig()
+
+    def produce() -> str:
+        input_text, text_to_text_model = load_model_for_text(text, model_id, system_prompt, speakers, context)
+        return generate_script(
+            input_text,
+            text_to_text_model,
+            system_prompt,
+            speakers,
+            prefix_cache=get_prompt_prefix_cache(context.prompt_cache_dir),
+            constrained=True,
+        )
+
+    if cache is None:
+        return produce()
+    params = {
+        "model_id": model_id,
+        "system_prompt": system_prompt,
+        "speakers": speakers_params(speakers),
+        "long_document_mode": context.long_document_mode,
+        "max_script_tokens": context.max_script_tokens,
+        "constrained": True,
+    }
+    return cached_text(cache, "script", cache.key("script", text, params), produce)
 
 
 if __name__ == "__main__":
     config = parse_args()
     text = data_load(config.input_file)
-    script = do_script_generation(text, config.text_to_text_model, config.text_to_text_prompt, config.speakers)
+    with METRICS.stage("script"):
+        script = do_script_generation(
+            text,
+            config.text_to_text_model,
+            config.text_to_text_prompt,
+            config.speakers,
+            config,
+            cache=open_artifact_cache(config),
+        )
     result_path = save_data(config.output_folder, "podcast.txt", script)
     logger.info(f"Saved generated script to {result_path}")
+    METRICS.save(config.metrics_file, config.prometheus_textfile)
     print(result_path)
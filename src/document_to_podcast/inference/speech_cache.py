@@ -0,0 +1,83 @@
+import hashlib
+import json
+from pathlib import Path
+
+import numpy as np
+from loguru import logger
+from utils import atomic_path, evict_least_recently_used, to_audio_dtype
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace so that formatting-only edits to the script still hit the cache."""
+    return " ".join(text.split())
+
+
+class SpeechCache:
+    """A persistent, content-addressed cache of synthesized speech segments.
+
+    Segments are keyed on (model_id, voice_profile, normalized text, sample_rate) and stored as 16-bit PCM `.npy`
+    files. Once the cache grows past `max_bytes`, the least recently used segments are evicted. Hits refresh the
+    file's modification time, which is what recency is tracked by, so several processes can share one directory.
+
+    Examples:
+        >>> cache = SpeechCache(Path("~/.cache/document_to_podcast/speech").expanduser())
+        >>> audio = cache.get("hexgrad/Kokoro-82M", "af_sarah", "Hmm, right!", 24000)
+
+    Args:
+        cache_dir (Path): Directory holding the cached segments, created if missing.
+        max_bytes (int): Size cap of the cache directory.
+    """
+
+    def __init__(self, cache_dir: Path, max_bytes: int = 1024 * 1024 * 1024):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._size = sum(path.stat().st_size for path in self.cache_dir.glob("*.npy"))
+
+    @staticmethod
+    def key(model_id: str, voice_profile: str, text: str, sample_rate: int) -> str:
+        payload = json.dumps([model_id, voice_profile, normalize_text(text), sample_rate])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.npy"
+
+    def get(self, model_id: str, voice_profile: str, text: str, sample_rate: int) -> np.ndarray | None:
+        path = self._path(self.key(model_id, voice_profile, text, sample_rate))
+        try:
+            pcm = np.load(path)
+            path.touch()
+        except (FileNotFoundError, ValueError, OSError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return to_audio_dtype(pcm, np.float32)
+
+    def put(self, model_id: str, voice_profile: str, text: str, sample_rate: int, audio: np.ndarray) -> None:
+        path = self._path(self.key(model_id, voice_profile, text, sample_rate))
+        # Rounded like the audio written to the podcast file, so a cached segment is the same as a fresh one.
+        pcm = to_audio_dtype(audio, np.int16)
+        try:
+            replaced_size = path.stat().st_size
+        except FileNotFoundError:
+            replaced_size = 0
+        with atomic_path(path) as tmp_path, tmp_path.open("wb") as f:
+            np.save(f, pcm)
+        self._size += path.stat().st_size - replaced_size
+        if self._size > self.max_bytes:
+            self._evict()
+
+    def _evict(self) -> None:
+        self._size = evict_least_recently_used(self.cache_dir.glob("*.npy"), self.max_bytes)
+        logger.debug(f"Evicted speech cache down to {self._size} bytes")
+
+    def log_stats(self) -> None:
+        log_cache_stats(self.hits, self.misses)
+
+
+def log_cache_stats(hits: int, misses: int) -> None:
+    total = hits + misses
+    if total:
+        logger.info(f"Speech cache: {hits} hits, {misses} misses ({hits / total:.0%} hit rate)")
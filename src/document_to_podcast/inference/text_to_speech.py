@@ -1,26 +1,57 @@
+from collections.abc import Iterator
+from pathlib import Path
 from types import MappingProxyType
+from typing import TYPE_CHECKING
 
 import numpy as np
-from kokoro import KPipeline
+from inference.speech_cache import SpeechCache
+from metrics import METRICS
 from preprocessing.model_loaders import TTSModel
 
+if TYPE_CHECKING:
+    from kokoro import KPipeline
 
-def _text_to_speech_kokoro(input_text: str, model: KPipeline, voice_profile: str) -> np.ndarray:
+
+def _text_to_speech_kokoro_chunks(
+    input_text: str, model: "KPipeline", voice_profile: str, voice_dir: Path | None = None
+) -> Iterator[np.ndarray]:
+    """Chunked TTS generation function for the Kokoro model.
+
+    KPipeline splits long inputs into sentence-sized chunks, each one is yielded as soon as it is synthesized.
+
+    Args:
+        input_text (str): The text to convert to speech.
+        model (KPipeline): The kokoro pipeline as defined in https://github.com/hexgrad/kokoro
+        voice_profile (str) : a pre-defined ID for the Kokoro models (e.g. "af_bella")
+            more info here https://huggingface.co/hexgrad/Kokoro-82M/blob/main/VOICES.md
+        voice_dir (Path | None, optional): Local directory of the `{voice_profile}.pt` voices, instead of the hub.
+
+    Yields:
+        numpy array: The waveform of each chunk of speech.
+    """
+    voice = str(Path(voice_dir) / f"{voice_profile}.pt") if voice_dir else voice_profile
+    for _, _, audio in model(input_text, voice=voice):  # yields graphemes/text, phonemes, audio
+        if audio is not None:
+            # A view of the float32 tensor's memory, not a copy.
+            yield np.asarray(audio)
+
+
+def _text_to_speech_kokoro(
+    input_text: str, model: "KPipeline", voice_profile: str, voice_dir: Path | None = None
+) -> np.ndarray:
     """TTS generation function for the Kokoro model
     Args:
         input_text (str): The text to convert to speech.
         model (KPipeline): The kokoro pipeline as defined in https://github.com/hexgrad/kokoro
         voice_profile (str) : a pre-defined ID for the Kokoro models (e.g. "af_bella")
             more info here https://huggingface.co/hexgrad/Kokoro-82M/blob/main/VOICES.md
+        voice_dir (Path | None, optional): Local directory of the `{voice_profile}.pt` voices, instead of the hub.
 
     Returns:
         numpy array: The waveform of the speech as a 2D numpy array
     """
-    generator = model(input_text, voice=voice_profile)
-
-    _, _, audio = next(generator)  # returns graphemes/text, phonemes, audio
-
-    return np.array(audio)
+    chunks = list(_text_to_speech_kokoro_chunks(input_text, model, voice_profile, voice_dir))
+    return np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.float32)
 
 
 _TTS_INFERENCE = MappingProxyType(
@@ -30,19 +61,79 @@ _TTS_INFERENCE = MappingProxyType(
     }
 )
 
+_TTS_CHUNKED_INFERENCE = MappingProxyType(
+    {
+        # Optional, models missing here are synthesized in a single chunk with their _TTS_INFERENCE function
+        "hexgrad/Kokoro-82M": _text_to_speech_kokoro_chunks,
+    }
+)
 
-def text_to_speech(input_text: str, model: TTSModel, voice_profile: str) -> np.ndarray:
+
+def text_to_speech(
+    input_text: str, model: TTSModel, voice_profile: str, cache: SpeechCache | None = None
+) -> np.ndarray:
     """Generate speech from text using a TTS model.
 
     Args:
         input_text (str): The text to convert to speech.
         model (TTSModel): The TTS model to use.
         voice_profile (str): The voice profile to use for the speech. The format depends on the TTSModel used.
+        cache (SpeechCache | None, optional): Segment cache checked before running the model.
 
     Returns:
         np.ndarray: The waveform of the speech as a 2D numpy array
     """
-    return _TTS_INFERENCE[model.model_id](input_text, model.model, voice_profile, **model.custom_args)
+    if cache is not None:
+        audio = cache.get(model.model_id, voice_profile, input_text, model.sample_rate)
+        if audio is not None:
+            return audio
+
+    audio = _TTS_INFERENCE[model.model_id](input_text, model.model, voice_profile, **model.custom_args)
+
+    if cache is not None:
+        cache.put(model.model_id, voice_profile, input_text, model.sample_rate, audio)
+    return audio
+
+
+def text_to_speech_chunks(
+    input_text: str, model: TTSModel, voice_profile: str, cache: SpeechCache | None = None
+) -> Iterator[np.ndarray]:
+    """Generate speech from text using a TTS model, yielding each chunk of audio as soon as it is available.
+
+    Args:
+        input_text (str): The text to convert to speech.
+        model (TTSModel): The TTS model to use.
+        voice_profile (str): The voice profile to use for the speech. The format depends on the TTSModel used.
+        cache (SpeechCache | None, optional): Segment cache checked before running the model.
+
+    Yields:
+        np.ndarray: The waveform of each chunk of speech, in order.
+    """
+    chunked_inference = _TTS_CHUNKED_INFERENCE.get(model.model_id)
+    if chunked_inference is None:
+        yield text_to_speech(input_text, model, voice_profile, cache=cache)
+        return
+
+    if cache is not None:
+        audio = cache.get(model.model_id, voice_profile, input_text, model.sample_rate)
+        if audio is not None:
+            yield audio
+            return
+
+    chunks = []
+    for chunk in chunked_inference(input_text, model.model, voice_profile, **model.custom_args):
+        chunks.append(chunk)
+        yield chunk
+
+    if cache is not None and chunks:
+        cache.put(model.model_id, voice_profile, input_text, model.sample_rate, np.concatenate(chunks))
+
+
+def record_turn_metrics(seconds: float, samples: int, sample_rate: int) -> None:
+    """Record the synthesis time of a turn, and the length of its audio for the real-time factor."""
+    METRICS.observe("tts_turn_latency_seconds", seconds)
+    METRICS.add("tts_compute_seconds", seconds)
+    METRICS.add("tts_audio_seconds", samples / sample_rate)
 
 
 def get_text_to_speech_generator(model_id: str):
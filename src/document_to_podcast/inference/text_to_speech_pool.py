@@ -0,0 +1,117 @@
+import multiprocessing
+import time
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from inference.speech_cache import SpeechCache
+from inference.text_to_speech import record_turn_metrics, text_to_speech
+from loguru import logger
+from preprocessing.host_profile import HostMode, tuned_torch_threads
+from preprocessing.model_loaders import TTSModel, tts_loader_by_model
+from utils import ordered_map
+
+# One model (and optionally one cache handle) per worker process, set by `_init_worker`.
+_WORKER_MODEL: TTSModel | None = None
+_WORKER_CACHE: SpeechCache | None = None
+
+
+def _init_worker(
+    model_id: str,
+    lang_code: str,
+    torch_threads: int | None,
+    host_mode: HostMode,
+    cache_dir: Path | None,
+    cache_max_bytes: int,
+) -> None:
+    global _WORKER_MODEL, _WORKER_CACHE
+    _WORKER_MODEL = tts_loader_by_model(model_id)(
+        model_id=model_id, lang_code=lang_code, torch_threads=torch_threads, host_mode=host_mode
+    )
+    if cache_dir is not None:
+        _WORKER_CACHE = SpeechCache(cache_dir, max_bytes=cache_max_bytes)
+
+
+def _worker_sample_rate() -> int:
+    return _WORKER_MODEL.sample_rate
+
+
+def _synthesize_turn(turn: tuple[str, str]) -> tuple[np.ndarray, bool, float]:
+    input_text, voice_profile = turn
+    hits = _WORKER_CACHE.hits if _WORKER_CACHE else 0
+    start = time.perf_counter()
+    audio = text_to_speech(input_text, _WORKER_MODEL, voice_profile, cache=_WORKER_CACHE)
+    return audio, bool(_WORKER_CACHE) and _WORKER_CACHE.hits > hits, time.perf_counter() - start
+
+
+class TTSWorkerPool:
+    """A pool of worker processes, each holding its own TTS model, that synthesize turns in parallel.
+
+    Examples:
+        >>> with TTSWorkerPool("hexgrad/Kokoro-82M", "a", workers=4, torch_threads=2) as pool:
+        ...     segments = list(pool.synthesize([("Hello!", "af_sarah"), ("Hi!", "am_michael")]))
+
+    Args:
+        model_id (str): The TTS model to load in every worker.
+        lang_code (str): The language code passed to the model loader.
+        workers (int): Number of worker processes.
+        torch_threads (int | None): Torch intra-op threads per worker. `None` splits the host profile's threads
+            for `host_mode` between the workers, or leaves torch's default without a profile.
+        cache_dir (Path | None): Speech cache directory shared by the workers, `None` disables caching.
+        cache_max_bytes (int): Size cap of the speech cache.
+        host_mode (HostMode): Whether the workers have the host to themselves or run next to the LLM.
+    """
+
+    def __init__(
+        self,
+        model_id: str,
+        lang_code: str,
+        workers: int,
+        torch_threads: int | None = None,
+        cache_dir: Path | None = None,
+        cache_max_bytes: int = 1024 * 1024 * 1024,
+        host_mode: HostMode = "solo",
+    ):
+        self.workers = workers
+        torch_threads = torch_threads or tuned_torch_threads(model_id, host_mode, processes=workers)
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers,
+            # Torch does not survive being forked once its thread pools are initialized.
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(model_id, lang_code, torch_threads, host_mode, cache_dir, cache_max_bytes),
+        )
+        self._caching = cache_dir is not None
+        self._sample_rate = None
+
+    @property
+    def sample_rate(self) -> int:
+        if self._sample_rate is None:
+            self._sample_rate = self._executor.submit(_worker_sample_rate).result()
+        return self._sample_rate
+
+    def synthesize(self, turns: Iterable[tuple[str, str]]) -> Iterator[np.ndarray]:
+        """Synthesize `(input_text, voice_profile)` turns across the workers, yielding the audio in script order."""
+        logger.info(f"Synthesizing with {self.workers} TTS workers")
+        results = ordered_map(self._executor, _synthesize_turn, turns, max_in_flight=self.workers * 2)
+        for audio, cache_hit, seconds in results:
+            if self._caching:
+                self.cache_hits += cache_hit
+                self.cache_misses += not cache_hit
+            # Summed over the workers, so the real-time factor is per worker.
+            record_turn_metrics(seconds, len(audio), self.sample_rate)
+            yield audio
+
+    def close(self) -> None:
+        self._executor.shutdown(cancel_futures=True)
+
+    def __enter__(self):
+        """Returns the pool, which is shut down on exit."""
+        return self
+
+    def __exit__(self, *exc):
+        """Shuts down the worker processes."""
+        self.close()
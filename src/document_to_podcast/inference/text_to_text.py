@@ -1,18 +1,188 @@
+import hashlib
+import time
+from collections import OrderedDict
 from collections.abc import Iterator
+from functools import lru_cache
+from pathlib import Path
+from typing import TYPE_CHECKING
 
-from llama_cpp import Llama
+import numpy as np
+from loguru import logger
+from metrics import METRICS
+from utils import atomic_path
+
+if TYPE_CHECKING:
+    from llama_cpp import Llama, LlamaGrammar, LlamaState
+
+
+def _system_prompt_tokens(model: "Llama", system_prompt: str) -> list[int]:
+    """The tokens every chat prompt with this system prompt starts with, according to the model's chat template.
+
+    They are found by formatting the system prompt with two different user messages and keeping the common prefix,
+    which avoids depending on how the template separates messages.
+    """
+    from llama_cpp.llama_chat_format import Jinja2ChatFormatter
+
+    template = model.metadata.get("tokenizer.chat_template")
+    if template is None:
+        return []
+    formatter = Jinja2ChatFormatter(
+        template=template,
+        eos_token=model._model.token_get_text(model.token_eos()),
+        bos_token=model._model.token_get_text(model.token_bos()),
+    )
+    prompts = []
+    for user_content in ("A", "B"):
+        response = formatter(
+            messages=[{"role": "system", "content": system_prompt}, {"role": "user", "content": user_content}]
+        )
+        prompts.append(
+            model.tokenize(response.prompt.encode("utf-8"), add_bos=not response.added_special, special=True)
+        )
+    prefix_length = 0
+    for token_a, token_b in zip(*prompts):
+        if token_a != token_b:
+            break
+        prefix_length += 1
+    return prompts[0][:prefix_length]
+
+
+class PromptPrefixCache:
+    """Snapshots the llama.cpp state right after the system prompt, so it is only evaluated once.
+
+    Before a completion, the state for its system prompt is restored (from memory, or from `cache_dir` when set)
+    and llama.cpp only evaluates the tokens that come after it. States are keyed on the model file and the prompt
+    prefix tokens. Only the `max_states` most recently used states are kept in memory.
+
+    States are saved as `.npz` files of plain arrays, loaded without unpickling anything, so a file planted in
+    `cache_dir` can at worst restore a wrong state, never run code.
+
+    Args:
+        cache_dir (Path | None): Optional directory to persist states in, so they survive between runs.
+        max_states (int): Number of states kept in memory.
+    """
+
+    def __init__(self, cache_dir: Path | None = None, max_states: int = 8):
+        self.cache_dir = cache_dir
+        self.max_states = max_states
+        self._states: OrderedDict[str, LlamaState] = OrderedDict()
+        if cache_dir is not None:
+            cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def prime(self, model: "Llama", system_prompt: str) -> int:
+        """Leave the model with its system prompt evaluated, returning how many tokens had to be evaluated."""
+        tokens = _system_prompt_tokens(model, system_prompt)
+        if not tokens:
+            logger.debug("Model has no chat template, not caching the system prompt")
+            return 0
+        if model.n_tokens >= len(tokens) and list(model.input_ids[: len(tokens)]) == tokens:
+            # Still evaluated from the previous completion.
+            return 0
+
+        key = hashlib.sha256(f"{model.model_path}:{tokens}".encode()).hexdigest()
+        state = self._get(key) or self._load(key)
+        if state is not None:
+            logger.debug(f"Restoring {len(tokens)} cached system prompt tokens")
+            model.load_state(state)
+            return 0
+
+        logger.debug(f"Evaluating and caching {len(tokens)} system prompt tokens")
+        model.reset()
+        model.eval(tokens)
+        state = model.save_state()
+        self._remember(key, state)
+        self._save(key, state)
+        return len(tokens)
+
+    def _get(self, key: str) -> "LlamaState | None":
+        state = self._states.get(key)
+        if state is not None:
+            self._states.move_to_end(key)
+        return state
+
+    def _remember(self, key: str, state: "LlamaState") -> None:
+        self._states[key] = state
+        while len(self._states) > self.max_states:
+            self._states.popitem(last=False)
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.npz"
+
+    def _load(self, key: str) -> "LlamaState | None":
+        if self.cache_dir is None or not self._path(key).exists():
+            return None
+        from llama_cpp import LlamaState
+
+        try:
+            with np.load(self._path(key), allow_pickle=False) as arrays:
+                state = LlamaState(
+                    input_ids=arrays["input_ids"],
+                    scores=arrays["scores"],
+                    n_tokens=int(arrays["n_tokens"]),
+                    llama_state=arrays["llama_state"].tobytes(),
+                    llama_state_size=int(arrays["llama_state_size"]),
+                    seed=int(arrays["seed"]),
+                )
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable system prompt state {self._path(key)}: {e}")
+            return None
+        self._remember(key, state)
+        return state
+
+    def _save(self, key: str, state: "LlamaState") -> None:
+        if self.cache_dir is None:
+            return
+        with atomic_path(self._path(key)) as tmp_path, tmp_path.open("wb") as f:
+            np.savez(
+                f,
+                input_ids=state.input_ids,
+                scores=state.scores,
+                n_tokens=state.n_tokens,
+                llama_state=np.frombuffer(state.llama_state, dtype=np.uint8),
+                llama_state_size=state.llama_state_size,
+                seed=state.seed,
+            )
+
+
+_PREFIX_CACHES: dict[Path | None, PromptPrefixCache] = {}
+
+
+def get_prompt_prefix_cache(cache_dir: Path | None = None) -> PromptPrefixCache:
+    """Returns the process-wide prefix cache for `cache_dir`, so in-memory states are shared between calls."""
+    if cache_dir not in _PREFIX_CACHES:
+        _PREFIX_CACHES[cache_dir] = PromptPrefixCache(cache_dir)
+    return _PREFIX_CACHES[cache_dir]
+
+
+@lru_cache(maxsize=16)
+def _compile_grammar(grammar: str) -> "LlamaGrammar":
+    from llama_cpp import LlamaGrammar
+
+    return LlamaGrammar.from_string(grammar, verbose=False)
 
 
 def chat_completion(
     input_text: str,
-    model: Llama,
+    model: "Llama",
     system_prompt: str,
     return_json: bool,
     stream: bool,
     stop: str | list[str] | None = None,
+    prefix_cache: PromptPrefixCache | None = None,
+    grammar: str | None = None,
+    max_tokens: int | None = None,
 ) -> str | Iterator[str]:
     # create_chat_completion uses an empty list as default
     stop = stop or []
+    if prefix_cache is not None:
+        # create_chat_completion reuses the longest matching prefix of the model's evaluated tokens
+        prefix_cache.prime(model, system_prompt)
+    kwargs = {}
+    if grammar is not None:
+        # Takes the place of the generic JSON grammar that `response_format` would apply.
+        kwargs["grammar"] = _compile_grammar(grammar)
+    if max_tokens is not None:
+        kwargs["max_tokens"] = max_tokens
     return model.create_chat_completion(
         messages=[
             {"role": "system", "content": system_prompt},
@@ -21,19 +191,29 @@ def chat_completion(
         response_format={
             "type": "json_object",
         }
-        if return_json
+        if return_json and grammar is None
         else None,
         stream=stream,
         stop=stop,
+        **kwargs,
     )
 
 
+def _common_prefix_length(tokens_a, tokens_b) -> int:
+    length = min(len(tokens_a), len(tokens_b))
+    mismatches = (tokens_a[:length] != tokens_b[:length]).nonzero()[0]
+    return int(mismatches[0]) if len(mismatches) else length
+
+
 def text_to_text(
     input_text: str,
-    model: Llama,
+    model: "Llama",
     system_prompt: str,
     return_json: bool = True,
     stop: str | list[str] | None = None,
+    prefix_cache: PromptPrefixCache | None = None,
+    grammar: str | None = None,
+    max_tokens: int | None = None,
 ) -> str:
     """Transforms input_text using the given model and system prompt.
 
@@ -44,20 +224,37 @@ def text_to_text(
         return_json (bool, optional): Whether to return the response as JSON.
             Defaults to True.
         stop (str | list[str] | None, optional): The stop token(s).
+        prefix_cache (PromptPrefixCache | None, optional): Cache of evaluated system prompts to reuse.
+        grammar (str | None, optional): A GBNF grammar the output must follow, instead of generic JSON.
+        max_tokens (int | None, optional): The most tokens to generate, by default until the context is full.
 
     Returns:
         str: The full transformed text.
     """
-    response = chat_completion(input_text, model, system_prompt, return_json, stop=stop, stream=False)
-    return response["choices"][0]["message"]["content"]
+    # Streamed, so the prompt evaluation and generation are measured apart, see text_to_text_stream.
+    return "".join(
+        text_to_text_stream(
+            input_text,
+            model,
+            system_prompt,
+            return_json,
+            stop=stop,
+            prefix_cache=prefix_cache,
+            grammar=grammar,
+            max_tokens=max_tokens,
+        )
+    )
 
 
 def text_to_text_stream(
     input_text: str,
-    model: Llama,
+    model: "Llama",
     system_prompt: str,
     return_json: bool = True,
     stop: str | list[str] | None = None,
+    prefix_cache: PromptPrefixCache | None = None,
+    grammar: str | None = None,
+    max_tokens: int | None = None,
 ) -> Iterator[str]:
     """Transforms input_text using the given model and system prompt.
 
@@ -68,11 +265,50 @@ def text_to_text_stream(
         return_json (bool, optional): Whether to return the response as JSON.
             Defaults to True.
         stop (str | list[str] | None, optional): The stop token(s).
+        prefix_cache (PromptPrefixCache | None, optional): Cache of evaluated system prompts to reuse.
+        grammar (str | None, optional): A GBNF grammar the output must follow, instead of generic JSON.
+        max_tokens (int | None, optional): The most tokens to generate, by default until the context is full.
 
     Yields:
         str: Chunks of the transformed text as they are available.
     """
-    response = chat_completion(input_text, model, system_prompt, return_json, stop=stop, stream=True)
-    for item in response:
-        if item["choices"][0].get("delta", {}).get("content", None):
-            yield item["choices"][0].get("delta", {}).get("content", None)
+    start = time.perf_counter()
+    first_token_at = None
+    tokens = 0
+    # Only the prompt tokens evaluated by this call are counted, not those restored or reused.
+    prompt_tokens = prefix_cache.prime(model, system_prompt) if prefix_cache is not None else 0
+    response = chat_completion(
+        input_text,
+        model,
+        system_prompt,
+        return_json,
+        stop=stop,
+        stream=True,
+        grammar=grammar,
+        max_tokens=max_tokens,
+    )
+    # The stream evaluates the prompt once iterated, reusing the longest prefix of these tokens: the system prompt
+    # restored by the prefix cache, or the start of the previous completion.
+    context = model.input_ids[: model.n_tokens].copy()
+    try:
+        for item in response:
+            if item["choices"][0].get("delta", {}).get("content", None):
+                if tokens == 0:
+                    # Until then the model evaluates the prompt, which is now in its context.
+                    first_token_at = time.perf_counter()
+                    METRICS.observe("llm_time_to_first_token_seconds", first_token_at - start)
+                    METRICS.add("llm_prompt_seconds", first_token_at - start)
+                    prompt = model.input_ids[: model.n_tokens]
+                    prompt_tokens += len(prompt) - _common_prefix_length(context, prompt)
+                    METRICS.add("llm_prompt_tokens", prompt_tokens)
+                # llama.cpp streams one chunk per generated token.
+                tokens += 1
+                yield item["choices"][0].get("delta", {}).get("content", None)
+    finally:
+        end = time.perf_counter()
+        METRICS.add("llm_seconds", end - start)
+        METRICS.add("llm_generated_tokens", tokens)
+        if first_token_at is not None:
+            # The generation speed, over the tokens decoded after the first one.
+            METRICS.add("llm_generation_seconds", end - first_token_at)
+            METRICS.add("llm_decoded_tokens", tokens - 1)
@@ -1,12 +1,21 @@
 import argparse
 import json
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import TYPE_CHECKING
 
+from artifact_cache import ArtifactCache, cached_text, file_digest, open_artifact_cache
 from loguru import logger
+from metrics import METRICS
 from models import LoadConfig
-from preprocessing.data_cleaners import cleaner_by_extension
-from preprocessing.data_loaders import data_load
-from utils import save_data
+from preprocessing.data_cleaners import clean_chunks, clean_html, cleaner_by_extension
+from preprocessing.data_loaders import create_http_session, data_load, iter_pdf_pages, open_url
+from preprocessing.http_cache import HttpCache
+from utils import ordered_map, save_data, save_data_chunks
+
+if TYPE_CHECKING:
+    import requests
 
 
 def parse_args() -> LoadConfig:
@@ -17,6 +26,13 @@ def parse_args() -> LoadConfig:
     )
     parser.add_argument("--input_file", type=Path, help="Path to the input file")
     parser.add_argument("--output_folder", type=Path, help="Path to the output folder")
+    parser.add_argument("--pdf_pages", type=str, help='Range of PDF pages to load, e.g. "1-50"')
+    parser.add_argument("--pdf_workers", type=int, help="Number of processes extracting PDF pages in parallel")
+    parser.add_argument("--artifact_cache_dir", type=Path, help="Directory caching the output of each stage")
+    parser.add_argument("--force", action="store_true", default=None, help="Run even if the output is cached")
+    parser.add_argument("--no_cache", action="store_true", default=None, help="Don't use the artifact cache")
+    parser.add_argument("--metrics_file", type=Path, help="JSON file to save performance metrics to")
+    parser.add_argument("--prometheus_textfile", type=Path, help="File to save the metrics to in Prometheus format")
 
     args = parser.parse_args()
 
@@ -29,7 +45,7 @@ def parse_args() -> LoadConfig:
         else:
             config_data = json.loads(args.config)
     else:
-        config_data = vars(args)
+        config_data = {k: v for k, v in vars(args).items() if v is not None}
 
     return LoadConfig.model_validate(config_data)
 
@@ -43,15 +59,95 @@ def data_clean(input_file: Path, text: str) -> str:
     return clean_data
 
 
-def load_and_clean_data(input_file: Path) -> str:
+def iter_load_and_clean_data(input_file: Path, pdf_pages: str | None = None, pdf_workers: int = 1) -> Iterator[str]:
+    """Yield the cleaned text in chunks that concatenate to the whole cleaned text.
+
+    PDFs are loaded and cleaned page by page, other formats in one chunk.
+    """
+    if Path(input_file).suffix.lower() != ".pdf":
+        yield load_and_clean_data(input_file)
+        return
+
+    logger.info(f"Loading and cleaning {input_file} page by page")
+    pages = iter_pdf_pages(input_file, pages=pdf_pages, workers=pdf_workers)
+    loaded = False
+    for clean_text in clean_chunks(page_text + "\n" for page_text in pages):
+        loaded = True
+        yield clean_text
+    if not loaded:
+        raise ValueError("No data loaded")
+
+
+def load_and_clean_data(
+    input_file: Path, pdf_pages: str | None = None, pdf_workers: int = 1, cache: ArtifactCache | None = None
+) -> str:
+    """Load and clean a document.
+
+    With a cache, the cleaned text is reused as long as the file's content and the pages to load are unchanged.
+    """
+    if cache is not None:
+        params = {"extension": Path(input_file).suffix.lower(), "pdf_pages": pdf_pages}
+        key = cache.key("cleaned", file_digest(input_file), params)
+        return cached_text(cache, "cleaned", key, lambda: load_and_clean_data(input_file, pdf_pages, pdf_workers))
+    if Path(input_file).suffix.lower() == ".pdf" and (pdf_pages or pdf_workers > 1):
+        return "".join(iter_load_and_clean_data(input_file, pdf_pages, pdf_workers))
     data = data_load(input_file)
     data = data_clean(input_file, data)
     return data
 
 
+def load_and_clean_url(
+    url: str, session: "requests.Session | None" = None, cache: HttpCache | None = None, timeout: float = 60.0
+) -> str:
+    """Fetch a web page and clean it, parsing the body from disk as it was streamed there."""
+    with open_url(url, session=session, cache=cache, timeout=timeout) as body:
+        return clean_html(body)
+
+
+def iter_load_and_clean_urls(
+    urls: Iterable[str], workers: int = 8, cache_dir: Path | None = None, timeout: float = 60.0
+) -> Iterator[tuple[str, str | None]]:
+    """Fetch and clean many web pages concurrently, over one pooled session.
+
+    At most `workers` pages are fetched at once, and the results are yielded in the order of `urls`. A page that
+    fails to load is logged and yielded as None, so one broken link doesn't stop a whole feed.
+
+    Args:
+        urls (Iterable[str]): The URLs to load.
+        workers (int): Number of pages fetched concurrently, and connections kept open per host.
+        cache_dir (Path | None): Directory of an [HttpCache][document_to_podcast.preprocessing.http_cache.HttpCache]
+            to revalidate pages against, instead of downloading them again.
+        timeout (float): Seconds to wait for a server to connect or respond.
+
+    Yields:
+        tuple[str, str | None]: Each URL, with its cleaned text.
+    """
+    session = create_http_session(pool_size=workers)
+    cache = HttpCache(cache_dir) if cache_dir else None
+
+    def load(url: str) -> tuple[str, str | None]:
+        try:
+            return url, load_and_clean_url(url, session=session, cache=cache, timeout=timeout)
+        except Exception as e:
+            logger.warning(f"Failed to load {url}: {e}")
+            return url, None
+
+    with session, ThreadPoolExecutor(max_workers=workers) as executor:
+        yield from ordered_map(executor, load, urls, max_in_flight=workers * 2)
+    if cache:
+        cache.log_stats()
+
+
 if __name__ == "__main__":
     config = parse_args()
-    cleaned_text = load_and_clean_data(config.input_file)
-    result_path = save_data(config.output_folder, "cleaned.txt", cleaned_text)
+    cache = open_artifact_cache(config)
+    with METRICS.stage("load"):
+        if cache is not None:
+            text = load_and_clean_data(config.input_file, config.pdf_pages, config.pdf_workers, cache)
+            result_path = save_data(config.output_folder, "cleaned.txt", text)
+        else:
+            cleaned_chunks = iter_load_and_clean_data(config.input_file, config.pdf_pages, config.pdf_workers)
+            result_path = save_data_chunks(config.output_folder, "cleaned.txt", cleaned_chunks)
     logger.info(f"Saving cleaned data to {result_path}")
+    METRICS.save(config.metrics_file, config.prometheus_textfile)
     print(result_path)
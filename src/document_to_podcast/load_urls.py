@@ -0,0 +1,72 @@
+import argparse
+import json
+from pathlib import Path
+
+from load_data import iter_load_and_clean_urls
+from loguru import logger
+from metrics import METRICS
+from models import UrlLoadConfig
+from preprocessing.http_cache import HttpCache
+from utils import save_data
+
+
+def parse_args() -> UrlLoadConfig:
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument(
+        "--config", type=str, help="Path to the config file or a JSON string, this overrides any other parameters"
+    )
+    parser.add_argument("--urls_file", type=Path, help="Text file listing the URLs to load, one per line")
+    parser.add_argument("--output_folder", type=Path, help="Path to the output folder")
+    parser.add_argument("--url_workers", type=int, help="Number of URLs fetched concurrently")
+    parser.add_argument("--http_cache_dir", type=Path, help="Directory caching fetched pages between runs")
+    parser.add_argument("--http_timeout", type=float, help="Seconds to wait for a server to connect or respond")
+    parser.add_argument("--metrics_file", type=Path, help="JSON file to save performance metrics to")
+    parser.add_argument("--prometheus_textfile", type=Path, help="File to save the metrics to in Prometheus format")
+
+    args = parser.parse_args()
+
+    config_data = {}
+
+    if args.config:
+        if Path(args.config).exists():
+            with Path.open(args.config, "r") as f:
+                config_data = json.load(f)
+        else:
+            config_data = json.loads(args.config)
+    else:
+        config_data = {k: v for k, v in vars(args).items() if v is not None}
+
+    return UrlLoadConfig.model_validate(config_data)
+
+
+def read_urls(urls_file: Path) -> list[str]:
+    """The URLs listed in `urls_file`, skipping blank lines and `#` comments."""
+    lines = (line.strip() for line in Path(urls_file).read_text().splitlines())
+    return [line for line in lines if line and not line.startswith("#")]
+
+
+def do_url_loading(config: UrlLoadConfig) -> str:
+    """Load and clean every URL of `config.urls_file`, one text file per page.
+
+    Returns:
+        str: Path to `urls.json`, which maps each URL to its cleaned text file, or to null if it failed to load.
+    """
+    urls = read_urls(config.urls_file)
+    logger.info(f"Loading {len(urls)} URLs with {config.url_workers} workers")
+    index = {}
+    for url, text in iter_load_and_clean_urls(
+        urls, workers=config.url_workers, cache_dir=config.http_cache_dir, timeout=config.http_timeout
+    ):
+        index[url] = save_data(config.output_folder, f"{HttpCache.key(url)[:16]}.txt", text) if text else None
+    loaded = sum(path is not None for path in index.values())
+    logger.info(f"Loaded {loaded} of {len(urls)} URLs")
+    return save_data(config.output_folder, "urls.json", json.dumps(index, indent=2))
+
+
+if __name__ == "__main__":
+    config = parse_args()
+    with METRICS.stage("load"):
+        index_path = do_url_loading(config)
+    METRICS.save(config.metrics_file, config.prometheus_textfile)
+    print(index_path)
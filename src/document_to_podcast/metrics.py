@@ -0,0 +1,164 @@
+import json
+import resource
+import sys
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+
+from loguru import logger
+from utils import atomic_write_text
+
+_STATUS_FILE = Path("/proc/self/status")
+_CLEAR_REFS_FILE = Path("/proc/self/clear_refs")
+# Metrics derived from two counters: name -> (numerator, denominator).
+_RATIOS = {
+    # Prompt evaluation runs until the first token, generation after it.
+    "llm_prompt_tokens_per_second": ("llm_prompt_tokens", "llm_prompt_seconds"),
+    "llm_generation_tokens_per_second": ("llm_decoded_tokens", "llm_generation_seconds"),
+    "tts_real_time_factor": ("tts_audio_seconds", "tts_compute_seconds"),
+}
+
+
+def peak_rss_bytes() -> int:
+    """The peak resident set size of this process, since it started or since the last reset_peak_rss."""
+    try:
+        for line in _STATUS_FILE.read_text().splitlines():
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS.
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+def reset_peak_rss() -> bool:
+    """Reset the peak RSS to the current RSS, where the OS allows it (Linux). Returns whether it was reset."""
+    try:
+        _CLEAR_REFS_FILE.write_text("5")
+    except OSError:
+        return False
+    return True
+
+
+class Metrics:
+    """Collects performance metrics of the pipeline, to be saved as JSON or as a Prometheus textfile.
+
+    Metrics are identified by a name and optional labels. Gauges keep the last value set, counters add up, and
+    summaries keep the count, sum and maximum of observed values, e.g. one observation per synthesized turn.
+
+    Examples:
+        >>> with METRICS.stage("script"):
+        ...     script = generate_script(text, model, system_prompt, speakers)
+        >>> METRICS.write_json(Path("metrics.json"))
+
+    Every stage records its wall time and the peak RSS reached while it ran. On Linux the peak is reset when a
+    stage starts, unless another stage is already running, so each stage reports its own peak; elsewhere it is the
+    process peak so far.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._gauges: dict[tuple, float] = {}
+        self._counters: dict[tuple, float] = {}
+        self._summaries: dict[tuple, list[float]] = {}
+        self._active_stages = 0
+
+    @staticmethod
+    def _key(name: str, labels: dict[str, str]) -> tuple:
+        return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+    def set(self, name: str, value: float, **labels) -> None:
+        with self._lock:
+            self._gauges[self._key(name, labels)] = value
+
+    def set_max(self, name: str, value: float, **labels) -> None:
+        with self._lock:
+            key = self._key(name, labels)
+            self._gauges[key] = max(self._gauges.get(key, value), value)
+
+    def add(self, name: str, value: float, **labels) -> None:
+        with self._lock:
+            key = self._key(name, labels)
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        with self._lock:
+            count, total, maximum = self._summaries.get(self._key(name, labels), (0, 0.0, value))
+            self._summaries[self._key(name, labels)] = [count + 1, total + value, max(maximum, value)]
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Record the wall time and peak RSS of the code run inside."""
+        with self._lock:
+            if self._active_stages == 0:
+                reset_peak_rss()
+            self._active_stages += 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            with self._lock:
+                self._active_stages -= 1
+            self.observe("stage_seconds", seconds, stage=name)
+            self.set_max("stage_peak_rss_bytes", peak_rss_bytes(), stage=name)
+            logger.debug(f"Stage {name} took {seconds:.2f}s")
+
+    def to_dict(self) -> dict:
+        """The metrics as `{name: [{"labels": {...}, ...values}]}`, plus the LLM and TTS speeds."""
+        metrics: dict[str, list[dict]] = {}
+        with self._lock:
+            for (name, labels), value in self._gauges.items():
+                metrics.setdefault(name, []).append({"labels": dict(labels), "value": value})
+            for (name, labels), value in self._counters.items():
+                metrics.setdefault(name, []).append({"labels": dict(labels), "total": value})
+            for (name, labels), (count, total, maximum) in self._summaries.items():
+                metrics.setdefault(name, []).append(
+                    {"labels": dict(labels), "count": count, "sum": total, "max": maximum, "mean": total / count}
+                )
+            for name, (numerator, denominator) in _RATIOS.items():
+                denominator = self._counters.get(self._key(denominator, {}), 0.0)
+                if denominator:
+                    value = self._counters.get(self._key(numerator, {}), 0.0) / denominator
+                    metrics[name] = [{"labels": {}, "value": value}]
+        return metrics
+
+    def write_json(self, path: Path) -> str:
+        Path(path).write_text(json.dumps(self.to_dict(), indent=2))
+        return str(path)
+
+    def to_prometheus(self) -> str:
+        """The metrics in the Prometheus text format, names prefixed with `document_to_podcast_`."""
+        lines = []
+        for name, samples in self.to_dict().items():
+            metric = f"document_to_podcast_{name}"
+            kind = "summary" if "count" in samples[0] else "counter" if "total" in samples[0] else "gauge"
+            lines.append(f"# TYPE {metric} {kind}")
+            for sample in samples:
+                labels = ",".join(f'{key}="{value}"' for key, value in sample["labels"].items())
+                labels = f"{{{labels}}}" if labels else ""
+                if kind == "summary":
+                    lines.append(f"{metric}_count{labels} {sample['count']}")
+                    lines.append(f"{metric}_sum{labels} {sample['sum']}")
+                elif kind == "counter":
+                    lines.append(f"{metric}_total{labels} {sample['total']}")
+                else:
+                    lines.append(f"{metric}{labels} {sample['value']}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: Path) -> str:
+        """Write the metrics in the Prometheus text format, e.g. for the node exporter's textfile collector."""
+        atomic_write_text(path, self.to_prometheus())
+        return str(path)
+
+    def save(self, json_path: Path | None, prometheus_path: Path | None) -> None:
+        if json_path is not None:
+            logger.info(f"Saving metrics to {self.write_json(json_path)}")
+        if prometheus_path is not None:
+            logger.info(f"Saving Prometheus metrics to {self.write_prometheus(prometheus_path)}")
+
+
+METRICS = Metrics()
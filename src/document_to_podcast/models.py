@@ -1,11 +1,12 @@
 from pathlib import Path
-from typing import Annotated
+from typing import Annotated, Literal
 
 from pydantic import BaseModel, Field
 from pydantic.functional_validators import AfterValidator
 from validators import (
     validate_input_file,
     validate_output_folder,
+    validate_pdf_pages,
     validate_speakers,
     validate_text_to_speech_model,
     validate_text_to_text_model,
@@ -79,17 +80,104 @@ class OutputConfig(BaseModel):
     )
 
 
-class LoadConfig(InputConfig, OutputConfig):
+class PdfConfig(BaseModel):
+    pdf_pages: Annotated[str | None, AfterValidator(validate_pdf_pages)] = Field(
+        default=None,
+        description='1-based, inclusive range of PDF pages to load, e.g. "1-50" or "10-". All pages when not set.',
+    )
+    pdf_workers: int = Field(default=1, ge=1, description="Number of processes extracting PDF pages in parallel.")
+
+
+class ArtifactCacheConfig(BaseModel):
+    artifact_cache_dir: Path | None = Field(
+        default=None,
+        description="Directory caching the output of each stage, so stages whose input and config didn't change are "
+        "skipped. Caching is disabled when not set.",
+    )
+    artifact_cache_max_mb: int = Field(
+        default=4096, ge=1, description="Size cap of the artifact cache, least recently used artifacts go first."
+    )
+    force: bool = Field(default=False, description="Run every stage even if its output is cached, refreshing it.")
+    no_cache: bool = Field(default=False, description="Neither read nor write the artifact cache.")
+
+    @property
+    def artifact_cache_max_bytes(self) -> int:
+        return self.artifact_cache_max_mb * 1024 * 1024
+
+
+class MetricsConfig(BaseModel):
+    metrics_file: Path | None = Field(
+        default=None,
+        description="JSON file to save performance metrics to: stage timings, tokens/s, TTS real-time factor and peak "
+        "RSS.",
+    )
+    prometheus_textfile: Path | None = Field(
+        default=None,
+        description="File to save the same metrics to in the Prometheus text format, e.g. for the node exporter's "
+        "textfile collector.",
+    )
+
+
+class LoadConfig(InputConfig, OutputConfig, PdfConfig, ArtifactCacheConfig, MetricsConfig):
     pass
 
 
+class UrlConfig(BaseModel):
+    url_workers: int = Field(default=8, ge=1, description="Number of URLs fetched concurrently.")
+    http_cache_dir: Path | None = Field(
+        default=None,
+        description="Directory caching fetched pages. They are revalidated with the server instead of re-downloaded.",
+    )
+    http_timeout: float = Field(default=60.0, gt=0, description="Seconds to wait for a server to connect or respond.")
+
+
+class UrlLoadConfig(OutputConfig, UrlConfig, MetricsConfig):
+    urls_file: Path = Field(description="Text file listing the URLs to load, one per line.")
+
+
 class SpeakerConfig(BaseModel):
     speakers: Annotated[list[Speaker], AfterValidator(validate_speakers)] = Field(
         default_factory=lambda: list(_DEFAULT_SPEAKERS), description="List of two speakers to use for the podcast."
     )
 
 
-class ScriptGenerationConfig(LoadConfig, SpeakerConfig):
+class HostModeConfig(BaseModel):
+    host_mode: Literal["solo", "shared"] = Field(
+        default="solo",
+        description="""Which settings of the host profile saved by `autotune.py` the models are loaded with.
+                - `solo` when the LLM and TTS models run one after the other, each using the whole host.
+                - `shared` when they run side by side and split the cores.""",
+    )
+
+
+class ContextConfig(HostModeConfig):
+    long_document_mode: Literal["truncate", "condense"] = Field(
+        default="truncate",
+        description="""How to handle documents larger than the model context.
+                - `truncate` keeps only the beginning of the document.
+                - `condense` summarizes context-sized chunks into notes first, and writes the script from those.""",
+    )
+    condense_workers: int = Field(
+        default=1, ge=1, description="Number of model instances condensing chunks concurrently in `condense` mode."
+    )
+    prompt_cache_dir: Path | None = Field(
+        default=None,
+        description="Directory to persist the evaluated system prompt state in, so later runs skip evaluating it. "
+        "The state is always reused in memory within a run. States are stored as plain arrays, never unpickled.",
+    )
+    max_script_tokens: int = Field(
+        default=4096,
+        ge=256,
+        description="Tokens reserved in the context for the generated script, used to size the model context.",
+    )
+    use_mmap: bool = Field(
+        default=True,
+        description="Memory-map the model weights, so processes loading the same file share one page-cached copy.",
+    )
+    use_mlock: bool = Field(default=False, description="Lock the model weights in RAM, so they are never paged out.")
+
+
+class ScriptGenerationConfig(LoadConfig, SpeakerConfig, ContextConfig):
     text_to_text_prompt: Annotated[str, AfterValidator(validate_text_to_text_prompt)] = Field(
         default=_DEFAULT_PROMPT, description="System prompt for the script generator."
     )
@@ -101,7 +189,137 @@ class ScriptGenerationConfig(LoadConfig, SpeakerConfig):
     )
 
 
-class AudioGenerationConfig(LoadConfig, SpeakerConfig):
+class SynthesisConfig(HostModeConfig):
+    tts_workers: int = Field(
+        default=1,
+        ge=1,
+        description="Number of worker processes synthesizing speech in parallel, each holding its own TTS model.",
+    )
+    tts_torch_threads: int | None = Field(
+        default=None,
+        ge=1,
+        description="Torch intra-op threads per TTS worker. Defaults to the host profile's, split between the "
+        "workers, or torch's own choice without a profile.",
+    )
+    pipelined_synthesis: bool = Field(
+        default=False,
+        description="Synthesize each turn chunk by chunk in a background thread, so chunks reach the output while the "
+        "next one is generated. Only used with a single TTS worker.",
+    )
+    audio_dtype: Literal["float32", "int16"] = Field(
+        default="float32",
+        description="Sample format the podcast audio is assembled in. `int16` takes half the memory of `float32`, "
+        "and matches the 16-bit PCM of the saved WAV files.",
+    )
+    speech_cache_dir: Path | None = Field(
+        default=None,
+        description="Directory of the synthesized speech segment cache. Caching is disabled when not set.",
+    )
+    speech_cache_max_mb: int = Field(
+        default=1024, ge=1, description="Size cap of the speech segment cache, least recently used segments go first."
+    )
+
+    @property
+    def speech_cache_max_bytes(self) -> int:
+        return self.speech_cache_max_mb * 1024 * 1024
+
+
+class AudioOutputConfig(BaseModel):
+    audio_format: Literal["wav", "flac", "opus"] = Field(
+        default="wav",
+        description="""Format of the podcast audio, encoded as the turns are synthesized.
+                - `wav` is uncompressed 16-bit PCM.
+                - `flac` is lossless, about half the size of `wav`.
+                - `opus` is lossy, in an Ogg container, over 10 times smaller than `wav` for speech.""",
+    )
+    segment_seconds: float | None = Field(
+        default=None,
+        gt=0,
+        description="Split the podcast audio into files of this many seconds, listed in a `podcast.m3u` playlist "
+        "that is updated as each file is finished. A single file when not set. Segmented output is not cached.",
+    )
+
+
+class AudioGenerationConfig(LoadConfig, SpeakerConfig, SynthesisConfig, AudioOutputConfig):
     text_to_speech_model: Annotated[str, AfterValidator(validate_text_to_speech_model)] = Field(
         default="hexgrad/Kokoro-82M", description="Model ID for the text-to-speech engine."
     )
+    stream_output: bool = Field(
+        default=False,
+        description="Write each turn to the output file as soon as it is synthesized, keeping memory at ~1 segment.",
+    )
+    checkpoint_audio: bool = Field(
+        default=False,
+        description="Save each synthesized turn next to the output file, so a killed run resumes from the first "
+        "missing turn. Implies `stream_output`.",
+    )
+
+
+class PodcastGenerationConfig(ScriptGenerationConfig, AudioGenerationConfig):
+    host_mode: Literal["solo", "shared"] = Field(
+        default="shared", description="The LLM and TTS models run side by side, see `HostModeConfig`."
+    )
+    turn_queue_size: int = Field(
+        default=8, ge=1, description="Maximum number of generated turns waiting for speech synthesis."
+    )
+
+
+class BatchConfig(OutputConfig, SynthesisConfig, MetricsConfig):
+    host_mode: Literal["solo", "shared"] = Field(
+        default="shared", description="The LLM and TTS models run side by side, see `HostModeConfig`."
+    )
+    manifest: Path = Field(
+        description="Directory of documents, or JSONL file with one podcast config per line. Each document gets "
+        "its own subfolder of `output_folder` unless its config sets one."
+    )
+    defaults: dict = Field(
+        default_factory=dict, description="Config values applied to every document, overridden by the manifest's."
+    )
+    load_workers: int = Field(default=2, ge=1, description="Number of processes loading and cleaning documents.")
+    audio_workers: int = Field(
+        default=1,
+        ge=1,
+        description="Number of documents synthesized at the same time, sharing the TTS worker processes. "
+        "Only used with more than one TTS worker.",
+    )
+    stage_queue_size: int = Field(
+        default=2, ge=1, description="Maximum number of documents waiting between two stages of the pipeline."
+    )
+
+
+class AutotuneConfig(BaseModel):
+    text_to_text_model: Annotated[str, AfterValidator(validate_text_to_text_model)] = Field(
+        default="bartowski/Qwen2.5-7B-Instruct-GGUF/Qwen2.5-7B-Instruct-Q8_0.gguf",
+        description="The GGUF model to tune llama.cpp's settings for, formatted as `owner/repo/file`.",
+    )
+    text_to_speech_model: Annotated[str, AfterValidator(validate_text_to_speech_model)] = Field(
+        default="hexgrad/Kokoro-82M", description="The TTS model to tune torch's settings for."
+    )
+    threads: list[int] | None = Field(
+        default=None,
+        description="Thread counts to try for both models. Defaults to powers of two up to the number of CPUs.",
+    )
+    n_batch: list[int] = Field(
+        default=[128, 256, 512, 1024], description="llama.cpp batch sizes to try for prompt evaluation."
+    )
+    prompt_tokens: int = Field(default=1024, ge=32, description="Tokens of the prompt evaluated in each trial.")
+    generated_tokens: int = Field(default=64, ge=8, description="Tokens generated in each trial.")
+    profile_file: Path | None = Field(
+        default=None,
+        description="Where to save the profile. Defaults to `DOCUMENT_TO_PODCAST_HOST_PROFILE`, or "
+        "`~/.cache/document_to_podcast/host_profile.json`, where the loaders look for it.",
+    )
+
+
+class ModelStoreConfig(BaseModel):
+    model_store_dir: Path | None = Field(
+        default=None, description="The local model store to populate. Defaults to `DOCUMENT_TO_PODCAST_MODEL_STORE`."
+    )
+    text_to_text_models: list[Annotated[str, AfterValidator(validate_text_to_text_model)]] = Field(
+        default=["bartowski/Qwen2.5-7B-Instruct-GGUF/Qwen2.5-7B-Instruct-Q8_0.gguf"],
+        description="GGUF models to add to the store, formatted as `owner/repo/file`.",
+    )
+    text_to_speech_models: list[Annotated[str, AfterValidator(validate_text_to_speech_model)]] = Field(
+        default=["hexgrad/Kokoro-82M"], description="TTS models to add to the store, with all their voices."
+    )
+    verify: bool = Field(default=False, description="Check the checksum of every stored file.")
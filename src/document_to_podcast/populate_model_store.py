@@ -0,0 +1,64 @@
+import argparse
+import json
+from pathlib import Path
+
+from loguru import logger
+from models import ModelStoreConfig
+from preprocessing.model_loaders import tts_files_by_model
+from preprocessing.model_store import ModelStore, model_store
+
+
+def parse_args() -> ModelStoreConfig:
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument(
+        "--config", type=str, help="Path to the config file or a JSON string, this overrides any other parameters"
+    )
+    parser.add_argument("--model_store_dir", type=Path, help="The local model store to populate")
+    parser.add_argument("--text_to_text_models", type=str, nargs="+", help="GGUF models to add, as owner/repo/file")
+    parser.add_argument("--text_to_speech_models", type=str, nargs="+", help="TTS models to add")
+    parser.add_argument("--verify", action="store_true", default=None, help="Check the checksum of every stored file")
+
+    args = parser.parse_args()
+
+    config_data = {}
+
+    if args.config:
+        if Path(args.config).exists():
+            with Path.open(args.config, "r") as f:
+                config_data = json.load(f)
+        else:
+            config_data = json.loads(args.config)
+    else:
+        config_data = {k: v for k, v in vars(args).items() if v is not None}
+
+    return ModelStoreConfig.model_validate(config_data)
+
+
+def populate_model_store(config: ModelStoreConfig) -> ModelStore:
+    """Download the configured models into the local model store, skipping the files already there.
+
+    Point `DOCUMENT_TO_PODCAST_MODEL_STORE` at the store for the loaders to use it, with no network access.
+    """
+    store = ModelStore(config.model_store_dir) if config.model_store_dir else model_store()
+    if store is None:
+        raise ValueError("Set the model store with --model_store_dir or DOCUMENT_TO_PODCAST_MODEL_STORE")
+
+    for model_id in config.text_to_text_models:
+        owner, repo, filename = model_id.split("/")
+        store.add(f"{owner}/{repo}", filename)
+    for model_id in config.text_to_speech_models:
+        store.add_matching(model_id, tts_files_by_model(model_id))
+
+    if config.verify:
+        failed = store.verify()
+        if failed:
+            raise ValueError(f"{len(failed)} stored files are missing or don't match their checksum: {failed}")
+    logger.info(f"The model store {store.root} holds {len(store.index())} files")
+    return store
+
+
+if __name__ == "__main__":
+    config = parse_args()
+    store = populate_model_store(config)
+    print(store.root)
@@ -1,13 +1,100 @@
 import re
-from collections.abc import Callable
+from collections.abc import Callable, Iterable, Iterator
 from pathlib import Path
-from typing import TypeAlias
-
-from bs4 import BeautifulSoup
+from typing import IO, TypeAlias
 
 CleanerFn: TypeAlias = Callable[[str], str]
 
 
+_URL = r"http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\(\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+"
+# An email can only start where a run of its characters starts; without the lookbehind, every word would be
+# re-scanned from each of its characters looking for an "@". Emails written back to back are matched together,
+# since the lookbehind would otherwise see the end of the previous one.
+_EMAIL = r"(?<![\w\.-])(?:[\w\.-]+@[\w\.-]+\.[\w]+)+"
+_ALLOWED = r"a-zA-Z0-9\s.,!?;:\"\'"
+# Runs of characters that can't be part of an email are removed at once, the others one at a time, so that the
+# email pattern still gets a chance to match starting from any word character.
+_SPECIAL_CHARACTERS = rf"[^{_ALLOWED}\w-]+|[^{_ALLOWED}]"
+
+# Removals applied in order. Emails and special characters are fused into a single scan; URLs go first because
+# removing one can join an email split around it, and a URL is only looked for at "http", which keeps its pass cheap.
+_REGEX_REMOVALS = (re.compile(_URL), re.compile(f"{_EMAIL}|{_SPECIAL_CHARACTERS}"))
+# Images go first: removing one can join a URL or an email split around it, as in "http://![a](b.png)x.com".
+_MARKDOWN_REMOVALS = (re.compile(r'!\[.*?\]\(.*?(".*?")?\)'), *_REGEX_REMOVALS)
+
+
+class StreamingCleaner:
+    """Cleans text fed in arbitrary chunks, producing the same output as cleaning the whole text at once.
+
+    Each chunk is cut after its last boundary that no removed pattern can span (whitespace, or newlines for
+    markdown images), and the rest is carried over to the next chunk. Whitespace collapsing keeps its state across
+    chunks, so runs split between chunks still become a single space.
+
+    Args:
+        removals (tuple[re.Pattern, ...]): The patterns of everything to remove, applied in order.
+        boundary (str): Characters after which it is safe to cut the text.
+    """
+
+    def __init__(self, removals: tuple[re.Pattern, ...], boundary: str):
+        self._removals = removals
+        self._boundary = boundary
+        self._carry = ""
+        self._started = False
+        self._pending_space = False
+
+    def feed(self, chunk: str) -> str:
+        text = self._carry + chunk
+        cut = max(text.rfind(char) for char in self._boundary) + 1
+        self._carry = text[cut:]
+        return self._clean(text[:cut])
+
+    def finish(self) -> str:
+        text, self._carry = self._carry, ""
+        return self._clean(text)
+
+    def _clean(self, text: str) -> str:
+        for pattern in self._removals:
+            text = pattern.sub("", text)
+        words = text.split()
+        if not words:
+            self._pending_space |= bool(text)
+            return ""
+        separator = " " if self._started and (self._pending_space or text[0].isspace()) else ""
+        self._started = True
+        self._pending_space = text[-1].isspace()
+        return separator + " ".join(words)
+
+
+def clean_chunks(chunks: Iterable[str], markdown: bool = False) -> Iterator[str]:
+    """Clean text chunk by chunk.
+
+    See [clean_with_regex][document_to_podcast.preprocessing.data_cleaners.clean_with_regex] and
+    [clean_markdown][document_to_podcast.preprocessing.data_cleaners.clean_markdown] for what is removed.
+
+    Examples:
+        >>> "".join(clean_chunks(["Hello,  wor", "ld! http://example.com"]))
+        "Hello, world!"
+
+    Args:
+        chunks (Iterable[str]): The text to clean, in order.
+        markdown (bool): Whether to also remove markdown images.
+
+    Yields:
+        str: The cleaned text, in chunks that concatenate to the fully cleaned text.
+    """
+    if markdown:
+        cleaner = StreamingCleaner(_MARKDOWN_REMOVALS, boundary="\n")
+    else:
+        cleaner = StreamingCleaner(_REGEX_REMOVALS, boundary=" \t\n\r\f\v")
+    for chunk in chunks:
+        cleaned = cleaner.feed(chunk)
+        if cleaned:
+            yield cleaned
+    cleaned = cleaner.finish()
+    if cleaned:
+        yield cleaned
+
+
 def clean_with_regex(text: str) -> str:
     r"""Clean text using regular expressions.
 
@@ -27,18 +114,10 @@ def clean_with_regex(text: str) -> str:
     Returns:
         str: The cleaned text.
     """
-    text = re.sub(
-        r"http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\(\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+",
-        "",
-        text,
-    )
-    text = re.sub(r"[\w\.-]+@[\w\.-]+\.[\w]+", "", text)
-    text = re.sub(r'[^a-zA-Z0-9\s.,!?;:"\']', "", text)
-    text = re.sub(r"\s+", " ", text).strip()
-    return text
-
-
-def clean_html(text: str) -> str:
+    return "".join(clean_chunks([text]))
+
+
+def clean_html(text: str | bytes | IO) -> str:
     """Clean HTML text.
 
     This function removes:
@@ -54,11 +133,14 @@ def clean_html(text: str) -> str:
         "Hello, world!"
 
     Args:
-        text (str): The HTML text to clean.
+        text (str | bytes | IO): The HTML text to clean, or a file it can be read from. The encoding of bytes is
+            detected from the document.
 
     Returns:
         str: The cleaned text.
     """
+    from bs4 import BeautifulSoup
+
     soup = BeautifulSoup(text, "html.parser")
     for tag in soup(["script", "style", "link", "meta"]):
         tag.decompose()
@@ -72,7 +154,8 @@ def clean_markdown(text: str) -> str:
     This function removes:
         - markdown images
 
-    In addition, it calls [clean_with_regex][document_to_podcast.preprocessing.data_cleaners.clean_with_regex].
+    In addition, it removes everything that
+    [clean_with_regex][document_to_podcast.preprocessing.data_cleaners.clean_with_regex] does.
 
     Examples:
         >>> clean_markdown('# Title   with image ![alt text](image.jpg "Image Title")')
@@ -84,9 +167,7 @@ def clean_markdown(text: str) -> str:
     Returns:
         str: The cleaned text.
     """
-    text = re.sub(r'!\[.*?\]\(.*?(".*?")?\)', "", text)
-
-    return clean_with_regex(text)
+    return "".join(clean_chunks([text], markdown=True))
 
 
 def cleaner_by_extension(path: Path) -> CleanerFn:
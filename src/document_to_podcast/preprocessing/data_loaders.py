@@ -1,17 +1,26 @@
-from collections.abc import Callable
+import multiprocessing
+import tempfile
+from collections.abc import Callable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
-from typing import TypeAlias
+from typing import IO, TYPE_CHECKING, TypeAlias
 
-import PyPDF2
-import requests
-from docx import Document
 from loguru import logger
-from streamlit.runtime.uploaded_file_manager import UploadedFile
+from preprocessing.http_cache import HttpCache
+from utils import ordered_map
 
-TextLoaderFn: TypeAlias = Callable[[Path | UploadedFile | str], str | None]
+# The document parsers (and streamlit) are slow to import, so each loader imports what it needs.
+if TYPE_CHECKING:
+    import requests
+    from streamlit.runtime.uploaded_file_manager import UploadedFile
 
+TextLoaderFn: TypeAlias = Callable[["Path | UploadedFile | str"], str | None]
+
+
+def load_pdf(pdf_file: "str | UploadedFile") -> str | None:
+    import PyPDF2
 
-def load_pdf(pdf_file: str | UploadedFile) -> str | None:
     try:
         pdf_reader = PyPDF2.PdfReader(pdf_file)
         return "\n".join(page.extract_text() for page in pdf_reader.pages)
@@ -20,9 +29,71 @@ def load_pdf(pdf_file: str | UploadedFile) -> str | None:
         return None
 
 
-def load_txt(txt_file: Path | UploadedFile) -> str | None:
+def parse_page_range(pages: str, page_count: int) -> range:
+    """Parse a 1-based, inclusive page range such as "5", "1-20" or "10-" into 0-based page indexes."""
+    start, _, end = pages.partition("-")
+    first = int(start) if start else 1
+    last = (int(end) if end else page_count) if "-" in pages else first
+    selected = range(max(first, 1) - 1, min(last, page_count))
+    if not selected:
+        raise ValueError(f"pdf_pages {pages!r} selects no page of a PDF with {page_count} pages")
+    return selected
+
+
+# One reader per worker process, set by `_init_pdf_worker`.
+_WORKER_PDF_READER = None
+
+
+def _init_pdf_worker(pdf_file: str) -> None:
+    import PyPDF2
+
+    global _WORKER_PDF_READER
+    _WORKER_PDF_READER = PyPDF2.PdfReader(pdf_file)
+
+
+def _extract_pdf_page(page_index: int) -> str:
+    return _WORKER_PDF_READER.pages[page_index].extract_text()
+
+
+def iter_pdf_pages(pdf_file: "str | Path | UploadedFile", pages: str | None = None, workers: int = 1) -> Iterator[str]:
+    """Yield the text of each page of a PDF in order, without holding the whole document's text at once.
+
+    Examples:
+        >>> for page_text in iter_pdf_pages("report.pdf", pages="1-50", workers=8):
+        ...     print(len(page_text))
+
+    Args:
+        pdf_file: Path to the PDF, or an uploaded file.
+        pages (str | None): 1-based, inclusive range of pages to extract (e.g. "1-50"), all pages when None.
+            Pages outside the range are never parsed.
+        workers (int): Number of processes extracting pages in parallel, each with its own reader.
+            Uploaded files are always extracted in-process.
+
+    Yields:
+        str: The text of each page.
+    """
+    import PyPDF2
+
+    pdf_reader = PyPDF2.PdfReader(pdf_file)
+    page_indexes = parse_page_range(pages, len(pdf_reader.pages)) if pages else range(len(pdf_reader.pages))
+
+    if workers == 1 or not isinstance(pdf_file, str | Path):
+        for page_index in page_indexes:
+            yield pdf_reader.pages[page_index].extract_text()
+        return
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_pdf_worker,
+        initargs=(str(pdf_file),),
+    ) as executor:
+        yield from ordered_map(executor, _extract_pdf_page, page_indexes, max_in_flight=workers * 2)
+
+
+def load_txt(txt_file: "Path | UploadedFile") -> str | None:
     try:
-        if isinstance(txt_file, UploadedFile):
+        if hasattr(txt_file, "getvalue"):  # streamlit UploadedFile
             return txt_file.getvalue().decode("utf-8")
         else:
             with Path.open(txt_file) as file:
@@ -32,7 +103,9 @@ def load_txt(txt_file: Path | UploadedFile) -> str | None:
         return None
 
 
-def load_docx(docx_file: str | UploadedFile) -> str | None:
+def load_docx(docx_file: "str | UploadedFile") -> str | None:
+    from docx import Document
+
     try:
         docx_reader = Document(docx_file)
         return "\n".join(paragraph.text for paragraph in docx_reader.paragraphs)
@@ -41,9 +114,78 @@ def load_docx(docx_file: str | UploadedFile) -> str | None:
         return None
 
 
+# (connect, read) timeouts in seconds.
+DEFAULT_HTTP_TIMEOUT = (10.0, 60.0)
+
+
+def create_http_session(pool_size: int = 10, retries: int = 2) -> "requests.Session":
+    """A session reusing up to `pool_size` connections per host, safe to share between fetching threads."""
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retries)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+_DEFAULT_SESSION = None
+
+
+def _default_session() -> "requests.Session":
+    global _DEFAULT_SESSION
+    if _DEFAULT_SESSION is None:
+        _DEFAULT_SESSION = create_http_session()
+    return _DEFAULT_SESSION
+
+
+@contextmanager
+def open_url(
+    url: str,
+    session: "requests.Session | None" = None,
+    cache: HttpCache | None = None,
+    timeout: float | tuple[float, float] = DEFAULT_HTTP_TIMEOUT,
+) -> Iterator[IO[bytes]]:
+    """Fetch `url` and open its body as a binary file, without holding the whole body in memory.
+
+    With a cache, the stored body is revalidated and reused if the server answers `304 Not Modified`, and a new
+    body is streamed into the cache. Without one, the body is streamed into a temporary file.
+
+    Args:
+        url (str): The URL to fetch.
+        session (requests.Session | None): The session to fetch with. A shared, pooled one when not given.
+        cache (HttpCache | None): The cache to revalidate against and store into.
+        timeout (float | tuple[float, float]): The connect and read timeouts, in seconds.
+
+    Yields:
+        IO[bytes]: The body of the response.
+    """
+    session = session or _default_session()
+    headers = cache.conditional_headers(url) if cache else {}
+    path = None
+    with session.get(url, headers=headers, timeout=timeout, stream=True) as response:
+        if cache and headers and response.status_code == 304:
+            path = cache.hit(url)
+        else:
+            response.raise_for_status()
+            if cache:
+                path = cache.store(url, response)
+            else:
+                body = tempfile.TemporaryFile()
+                for chunk in response.iter_content(chunk_size=64 * 1024):
+                    body.write(chunk)
+                body.seek(0)
+    # The connection is back in the pool before the body is read.
+    if path:
+        body = Path.open(path, "rb")
+    with body:
+        yield body
+
+
 def load_url(url: str) -> str | None:
     try:
-        response = requests.get(url)
+        response = _default_session().get(url, timeout=DEFAULT_HTTP_TIMEOUT)
         response.raise_for_status()
         return response.text
     except Exception as e:
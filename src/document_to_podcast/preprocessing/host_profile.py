@@ -0,0 +1,80 @@
+import json
+import os
+import platform
+from pathlib import Path
+from typing import Literal
+
+from loguru import logger
+from utils import atomic_write_text
+
+HostMode = Literal["solo", "shared"]
+
+_DEFAULT_PROFILE_PATH = Path.home() / ".cache" / "document_to_podcast" / "host_profile.json"
+# The profiles already warned about, as they are read on every model load.
+_IGNORED_PROFILES: set[tuple[str, str]] = set()
+
+
+def host_profile_path() -> Path:
+    """Where autotune.py saves the profile and the loaders read it: `DOCUMENT_TO_PODCAST_HOST_PROFILE`, or
+    `~/.cache/document_to_podcast/host_profile.json`.
+    """
+    path = os.environ.get("DOCUMENT_TO_PODCAST_HOST_PROFILE")
+    return Path(path) if path else _DEFAULT_PROFILE_PATH
+
+
+def host_fingerprint() -> dict:
+    """What a profile is tuned for, so a profile copied to (or shared with) a different host is not applied."""
+    return {"system": platform.system(), "machine": platform.machine(), "cpu_count": os.cpu_count()}
+
+
+def load_host_profile(path: Path | None = None) -> dict:
+    """The saved profile, or an empty one if there is none for this host.
+
+    The profile is `{"host": ..., "llama_cpp": {model_id: {mode: settings}}, "tts": {model_id: {mode: settings}}}`,
+    where the modes are `solo` (the model has the host to itself) and `shared` (the LLM and TTS run side by side).
+    """
+    path = path or host_profile_path()
+    empty = {"host": host_fingerprint(), "llama_cpp": {}, "tts": {}}
+    try:
+        profile = json.loads(Path(path).read_text())
+    except FileNotFoundError:
+        return empty
+    except ValueError:
+        _warn_once(path, "unreadable", f"Ignoring unreadable host profile {path}")
+        return empty
+    if profile.get("host") != host_fingerprint():
+        _warn_once(path, "host", f"Ignoring host profile {path}, it was tuned on another host: {profile.get('host')}")
+        return empty
+    return profile
+
+
+def _warn_once(path: Path, reason: str, message: str) -> None:
+    if (str(path), reason) not in _IGNORED_PROFILES:
+        _IGNORED_PROFILES.add((str(path), reason))
+        logger.warning(message)
+
+
+def save_host_profile(
+    kind: Literal["llama_cpp", "tts"], model_id: str, settings: dict, path: Path | None = None
+) -> str:
+    """Save the `{mode: settings}` of a model, keeping the other models of the profile."""
+    path = Path(path or host_profile_path())
+    profile = load_host_profile(path)
+    profile[kind][model_id] = settings
+    path.parent.mkdir(parents=True, exist_ok=True)
+    atomic_write_text(path, json.dumps(profile, indent=2))
+    return str(path)
+
+
+def tuned_settings(kind: Literal["llama_cpp", "tts"], model_id: str, host_mode: HostMode = "solo") -> dict:
+    """The settings autotune.py found best for the model in the given mode, empty if it wasn't tuned."""
+    settings = load_host_profile()[kind].get(model_id, {}).get(host_mode, {})
+    if settings:
+        logger.debug(f"Using the {host_mode} host profile of {model_id}: {settings}")
+    return settings
+
+
+def tuned_torch_threads(model_id: str, host_mode: HostMode = "solo", processes: int = 1) -> int | None:
+    """Torch threads for each of `processes` TTS processes, splitting the tuned thread count between them."""
+    torch_threads = tuned_settings("tts", model_id, host_mode).get("torch_threads")
+    return max(1, torch_threads // processes) if torch_threads else None
@@ -0,0 +1,84 @@
+import hashlib
+import json
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from loguru import logger
+from utils import atomic_path, atomic_write_text
+
+if TYPE_CHECKING:
+    from requests import Response
+
+_CHUNK_SIZE = 64 * 1024
+
+
+class HttpCache:
+    """A persistent cache of fetched web pages, revalidated with conditional requests.
+
+    Bodies are streamed to disk as they are downloaded, next to a small JSON file holding the URL and the
+    `ETag` / `Last-Modified` validators the server sent. The next fetch of the same URL sends them back as
+    `If-None-Match` / `If-Modified-Since`, and a `304 Not Modified` answer reuses the stored body.
+
+    Examples:
+        >>> cache = HttpCache(Path("~/.cache/document_to_podcast/http").expanduser())
+        >>> headers = cache.conditional_headers("https://example.com")
+
+    Args:
+        cache_dir (Path): Directory holding the cached responses, created if missing.
+    """
+
+    def __init__(self, cache_dir: Path):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(url: str) -> str:
+        return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+    def body_path(self, url: str) -> Path:
+        return self.cache_dir / f"{self.key(url)}.body"
+
+    def _meta_path(self, url: str) -> Path:
+        return self.cache_dir / f"{self.key(url)}.json"
+
+    def conditional_headers(self, url: str) -> dict[str, str]:
+        """The headers revalidating the stored response of `url`, empty if nothing usable is stored."""
+        try:
+            meta = json.loads(self._meta_path(url).read_text())
+        except (FileNotFoundError, ValueError):
+            return {}
+        if not self.body_path(url).exists():
+            return {}
+        headers = {}
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+        return headers
+
+    def hit(self, url: str) -> Path:
+        """Records that the stored response of `url` was revalidated, and returns its body."""
+        self.hits += 1
+        return self.body_path(url)
+
+    def store(self, url: str, response: "Response") -> Path:
+        """Streams the body of `response` into the cache, and returns where it was stored."""
+        self.misses += 1
+        path = self.body_path(url)
+        with atomic_path(path) as tmp_path, tmp_path.open("wb") as f:
+            for chunk in response.iter_content(chunk_size=_CHUNK_SIZE):
+                f.write(chunk)
+        meta = {
+            "url": url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+        }
+        atomic_write_text(self._meta_path(url), json.dumps(meta))
+        return path
+
+    def log_stats(self) -> None:
+        total = self.hits + self.misses
+        if total:
+            logger.info(f"HTTP cache: {self.hits} not modified, {self.misses} fetched ({self.hits / total:.0%} reused)")
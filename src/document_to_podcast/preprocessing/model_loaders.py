@@ -1,14 +1,33 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
 from dataclasses import dataclass, field
+from pathlib import Path
 from types import MappingProxyType
-from typing import Protocol
+from typing import TYPE_CHECKING, Any, Protocol
 
-import torch
-from kokoro import KPipeline
-from llama_cpp import Llama
+from loguru import logger
+from metrics import METRICS
+from preprocessing.host_profile import HostMode, tuned_settings, tuned_torch_threads
+from preprocessing.model_store import model_store
 
+# The model backends are slow to import, so they are only imported by the loaders that need them.
+if TYPE_CHECKING:
+    from kokoro import KPipeline
+    from llama_cpp import Llama
+    from llama_cpp._internals import LlamaModel
+
+
+def load_llama_cpp_model(model_id: str, host_mode: HostMode = "solo", **kwargs) -> "Llama":
+    """Loads the given model_id using Llama.from_pretrained, or from the local model store when one is set.
 
-def load_llama_cpp_model(model_id: str) -> Llama:
-    """Loads the given model_id using Llama.from_pretrained.
+    The threads and batch size found best by autotune.py for this model and `host_mode` are applied, unless
+    given in `kwargs`.
+
+    The weights are memory-mapped by default (`use_mmap`), so processes loading the same file share one copy in
+    the page cache. `use_mlock=True` keeps them in RAM instead of letting the OS page them out.
 
     Examples:
         >>> model = load_llama_cpp_model("bartowski/Qwen2.5-7B-Instruct-GGUF/Qwen2.5-7B-Instruct-Q8_0.gguf")
@@ -16,19 +35,55 @@ def load_llama_cpp_model(model_id: str) -> Llama:
     Args:
         model_id (str): The model id to load.
             Format is expected to be `{org}/{repo}/{filename}`.
+        host_mode (HostMode): Whether the model has the host to itself (`solo`) or runs next to the TTS (`shared`).
+        kwargs: Extra arguments for `Llama`, overriding the defaults below.
 
     Returns:
         Llama: The loaded model.
     """
+    import torch
+    from llama_cpp import Llama
+
     org, repo, filename = model_id.split("/")
-    model = Llama.from_pretrained(
-        repo_id=f"{org}/{repo}",
-        filename=filename,
-        n_ctx=0,  # 0 means that the model limit will be used, instead of the default (512) or other hardcoded value
-        verbose=False,
-        n_gpu_layers=-1 if torch.cuda.is_available() else 0,
-    )
-    return model
+    settings = {
+        "n_ctx": 0,  # 0 means that the model limit will be used, instead of the default (512) or other value
+        "verbose": False,
+        "n_gpu_layers": -1 if torch.cuda.is_available() else 0,
+        **tuned_settings("llama_cpp", model_id, host_mode),
+        **kwargs,
+    }
+    store = model_store()
+    if store is not None:
+        return Llama(model_path=str(store.resolve(f"{org}/{repo}", filename)), **settings)
+    return Llama.from_pretrained(repo_id=f"{org}/{repo}", filename=filename, **settings)
+
+
+def load_llama_cpp_tokenizer(model_id: str) -> "LlamaModel":
+    """Loads only the vocabulary of the given model_id, to count tokens before deciding how big a context to load.
+
+    The returned model has `tokenize`, `detokenize` and `n_ctx_train`, but no weights and no context.
+
+    Args:
+        model_id (str): The model id to load.
+            Format is expected to be `{org}/{repo}/{filename}`.
+
+    Returns:
+        LlamaModel: The vocabulary-only model.
+    """
+    import llama_cpp
+    from llama_cpp._internals import LlamaModel
+
+    org, repo, filename = model_id.split("/")
+    store = model_store()
+    if store is not None:
+        path = store.resolve(f"{org}/{repo}", filename)
+    else:
+        from huggingface_hub import hf_hub_download
+
+        path = hf_hub_download(repo_id=f"{org}/{repo}", filename=filename)
+    params = llama_cpp.llama_model_default_params()
+    params.vocab_only = True
+    return LlamaModel(path_model=str(path), params=params, verbose=False)
 
 
 @dataclass
@@ -46,7 +101,7 @@ class TTSModel:
         custom_args (dict): Any model-specific arguments that a TTS model might require, e.g. tokenizer.
     """
 
-    model: KPipeline
+    model: "KPipeline"
     model_id: str
     sample_rate: int
     custom_args: field(default_factory=dict)
@@ -71,19 +126,45 @@ def _load_kokoro_tts(model_id: str, **kwargs) -> TTSModel:
             🇬🇧 'b' => British English
             🇯🇵 'j' => Japanese: you will need to also pip install misaki[ja]
             🇨🇳 'z' => Mandarin Chinese: you will need to also pip install misaki[zh]
+            Can also include 'torch_threads', defaulting to the host profile's for 'host_mode' (`solo` by default).
+
+    With a local model store, the weights and voices are read from it instead of the Hugging Face hub.
 
     Returns:
         TTSModel: The loaded model using the TTSModel wrapper.
     """
     from kokoro import KPipeline
 
+    host_mode = kwargs.pop("host_mode", "solo")
+    torch_threads = kwargs.pop("torch_threads", None) or tuned_torch_threads(model_id, host_mode)
+    if torch_threads:
+        import torch
+
+        # Process-wide, the last loaded model's setting wins.
+        torch.set_num_threads(torch_threads)
     # If language code not supplied, assume British English
-    pipeline = KPipeline(repo_id=model_id, lang_code=kwargs.pop("lang_code", "b"))
+    lang_code = kwargs.pop("lang_code", "b")
+    store = model_store()
+    if store is None:
+        pipeline = KPipeline(repo_id=model_id, lang_code=lang_code)
+        custom_args = {}
+    else:
+        import torch
+        from kokoro import KModel
+
+        model = KModel(
+            repo_id=model_id,
+            config=str(store.resolve(model_id, "config.json")),
+            model=str(store.resolve(model_id, "kokoro-v1_0.pth")),
+        )
+        model = model.to("cuda" if torch.cuda.is_available() else "cpu").eval()
+        pipeline = KPipeline(repo_id=model_id, lang_code=lang_code, model=model)
+        custom_args = {"voice_dir": store.path(model_id, "voices")}
     return TTSModel(
         model=pipeline,
         model_id=model_id,
         sample_rate=24000,  # Kokoro's default sample rate
-        custom_args={},
+        custom_args=custom_args,
     )
 
 
@@ -95,8 +176,195 @@ _TTS_LOADERS = MappingProxyType(
 )
 
 
+_TTS_FILES = MappingProxyType(
+    {
+        # The files populate_model_store.py adds to the local model store for each model, as glob patterns.
+        "hexgrad/Kokoro-82M": ("config.json", "kokoro-v1_0.pth", "voices/*.pt"),
+    }
+)
+
+
+def tts_files_by_model(model_id: str) -> tuple[str, ...]:
+    files = _TTS_FILES.get(model_id)
+    if files is None:
+        raise ValueError(f"Don't know which files of {model_id} to store.")
+    return files
+
+
 def tts_loader_by_model(model_id: str) -> TTSLoaderFn:
     loader = _TTS_LOADERS.get(model_id)
     if loader is None:
         raise ValueError(f"Could not load {model_id}.")
     return loader
+
+
+class ModelRegistry:
+    """Caches loaded models by key, evicting the least recently used ones when over a memory budget.
+
+    The size of each model is an approximation provided at load time. Room is made for a model's estimated size
+    before loading it, so the evicted models can be freed first instead of both being resident at the peak. A model
+    bigger than the whole budget is still loaded, but everything else is evicted first.
+
+    Evicting a model only drops the registry's reference to it: callers (e.g. other threads) still holding one keep
+    using it, and it is freed once the last of them is done.
+
+    A request can also be served by another cached model that fits it (e.g. the same LLM with a larger context),
+    rather than loading one more copy.
+
+    Args:
+        max_bytes (int | None): Memory budget for all cached models together, `None` means unbounded.
+    """
+
+    def __init__(self, max_bytes: int | None = None):
+        self.max_bytes = max_bytes
+        self._models: OrderedDict[Hashable, tuple[Any, int]] = OrderedDict()
+        self._lock = threading.RLock()
+
+    @property
+    def resident_bytes(self) -> int:
+        return sum(size for _, size in self._models.values())
+
+    def get(
+        self,
+        key: Hashable,
+        load: Callable[[], Any],
+        size_of: Callable[[Any], int],
+        estimate: Callable[[], int] = lambda: 0,
+        fits: Callable[[Hashable], bool] | None = None,
+    ) -> Any:
+        """The model cached under `key`, loaded with `load` if it isn't.
+
+        Args:
+            key (Hashable): What identifies the model and its settings.
+            load (Callable[[], Any]): Loads the model.
+            size_of (Callable[[Any], int]): The approximate resident size of the loaded model.
+            estimate (Callable[[], int]): The approximate size of the model before it is loaded, 0 if unknown.
+            fits (Callable[[Hashable], bool] | None): Whether the model cached under another key can be used
+                instead, the most recently used one being picked.
+        """
+        with self._lock:
+            if key not in self._models and fits is not None:
+                key = next((cached for cached in reversed(self._models) if fits(cached)), key)
+            if key in self._models:
+                self._models.move_to_end(key)
+                return self._models[key][0]
+
+            self._evict(estimate())
+            start = time.perf_counter()
+            model = load()
+            labels = {"kind": key[0], "model": key[1]} if isinstance(key, tuple) else {"model": key}
+            METRICS.observe("model_load_seconds", time.perf_counter() - start, **labels)
+            size = size_of(model)
+            self._evict(size)
+            self._models[key] = (model, size)
+            logger.debug(f"Cached {key} (~{size / 1024**2:.0f}MB), {self.resident_bytes / 1024**2:.0f}MB resident")
+            return model
+
+    def _evict(self, incoming_bytes: int) -> None:
+        if self.max_bytes is None:
+            return
+        while self._models and self.resident_bytes + incoming_bytes > self.max_bytes:
+            key, (_, size) = self._models.popitem(last=False)
+            logger.info(f"Evicting {key} (~{size / 1024**2:.0f}MB) to stay within the model memory budget")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._models.clear()
+
+
+def _default_budget() -> int | None:
+    """`DOCUMENT_TO_PODCAST_MODEL_MEMORY_MB`, or three quarters of the host's RAM when the OS reports it."""
+    budget_mb = os.environ.get("DOCUMENT_TO_PODCAST_MODEL_MEMORY_MB")
+    if budget_mb:
+        return int(budget_mb) * 1024 * 1024
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") * 3 // 4
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+MODEL_REGISTRY = ModelRegistry(max_bytes=_default_budget())
+
+
+def _llama_cpp_model_size(model: "Llama") -> int:
+    """Approximates the resident size of a llama.cpp model: its weights file plus an f16 KV cache."""
+    metadata = model.metadata
+    arch = metadata.get("general.architecture", "")
+    n_layers = int(metadata.get(f"{arch}.block_count", 0))
+    n_heads = int(metadata.get(f"{arch}.attention.head_count", 1))
+    n_kv_heads = int(metadata.get(f"{arch}.attention.head_count_kv", n_heads))
+    kv_cache_bytes = 2 * n_layers * model.n_ctx() * model.n_embd() * n_kv_heads // n_heads * 2
+    return Path(model.model_path).stat().st_size + kv_cache_bytes
+
+
+def _stored_file_size(repo_id: str, filename: str) -> int:
+    """The size of a model file in the local model store or the Hugging Face cache, 0 if it isn't there yet."""
+    store = model_store()
+    if store is not None:
+        try:
+            return store.resolve(repo_id, filename).stat().st_size
+        except FileNotFoundError:
+            return 0
+    from huggingface_hub import try_to_load_from_cache
+
+    path = try_to_load_from_cache(repo_id, filename)
+    return Path(path).stat().st_size if isinstance(path, str) else 0
+
+
+def _tts_model_size(model: TTSModel) -> int:
+    import torch
+
+    module = getattr(model.model, "model", model.model)
+    if not isinstance(module, torch.nn.Module):
+        return 0
+    return sum(param.numel() * param.element_size() for param in module.parameters())
+
+
+def get_llama_cpp_model(model_id: str, **kwargs) -> "Llama":
+    """Like [load_llama_cpp_model][document_to_podcast.preprocessing.model_loaders.load_llama_cpp_model], but
+    shares loaded models through [MODEL_REGISTRY][document_to_podcast.preprocessing.model_loaders.MODEL_REGISTRY].
+    """
+    n_ctx = kwargs.get("n_ctx")
+    settings = tuple(sorted((name, value) for name, value in kwargs.items() if name != "n_ctx"))
+    key = ("llama_cpp", model_id, settings, n_ctx)
+    org, repo, filename = model_id.split("/")
+
+    def fits(cached: Hashable) -> bool:
+        # A loaded copy with a larger context serves smaller requests, instead of one copy (and KV cache) per size.
+        if cached[:3] != key[:3] or None in (n_ctx, cached[3]):
+            return False
+        # 0 is the model's training context, the largest there is.
+        return cached[3] == 0 or 0 < n_ctx <= cached[3]
+
+    return MODEL_REGISTRY.get(
+        key,
+        lambda: load_llama_cpp_model(model_id, **kwargs),
+        _llama_cpp_model_size,
+        # The weights, the context is only known once loaded.
+        lambda: _stored_file_size(f"{org}/{repo}", filename),
+        fits,
+    )
+
+
+def get_llama_cpp_tokenizer(model_id: str) -> "LlamaModel":
+    """Like [load_llama_cpp_tokenizer][document_to_podcast.preprocessing.model_loaders.load_llama_cpp_tokenizer],
+    but shares loaded vocabularies through
+    [MODEL_REGISTRY][document_to_podcast.preprocessing.model_loaders.MODEL_REGISTRY].
+    """
+    # The vocabulary is negligible next to the weights, don't count it against the budget.
+    return MODEL_REGISTRY.get(
+        ("llama_cpp_tokenizer", model_id), lambda: load_llama_cpp_tokenizer(model_id), lambda _: 0
+    )
+
+
+def get_tts_model(model_id: str, **kwargs) -> TTSModel:
+    """Like `tts_loader_by_model(model_id)(model_id, **kwargs)`, but shares loaded models through
+    [MODEL_REGISTRY][document_to_podcast.preprocessing.model_loaders.MODEL_REGISTRY].
+    """
+    key = ("tts", model_id, tuple(sorted(kwargs.items())))
+    return MODEL_REGISTRY.get(
+        key,
+        lambda: tts_loader_by_model(model_id)(model_id, **kwargs),
+        _tts_model_size,
+        lambda: sum(_stored_file_size(model_id, file) for file in _TTS_FILES.get(model_id, ()) if "*" not in file),
+    )
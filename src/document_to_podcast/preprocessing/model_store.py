@@ -0,0 +1,123 @@
+import hashlib
+import json
+import os
+import threading
+from fnmatch import fnmatch
+from pathlib import Path
+
+from loguru import logger
+from utils import atomic_write_text
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with Path(path).open("rb") as f:
+        while chunk := f.read(16 * 1024 * 1024):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ModelStore:
+    """A local directory of model files, so the loaders never go through the Hugging Face hub.
+
+    Files are stored as `{root}/{owner}/{repo}/{file}` and listed in `{root}/index.json` by their
+    `owner/repo/file` key, with their size and SHA-256. Resolving a file only reads the index and stats the file:
+    the checksums are computed when a file is added, and checked again by `verify`.
+
+    Examples:
+        >>> store = ModelStore(Path("/srv/models"))
+        >>> store.add("bartowski/Qwen2.5-7B-Instruct-GGUF", "Qwen2.5-7B-Instruct-Q8_0.gguf")
+        >>> store.resolve("bartowski/Qwen2.5-7B-Instruct-GGUF", "Qwen2.5-7B-Instruct-Q8_0.gguf")
+        PosixPath('/srv/models/bartowski/Qwen2.5-7B-Instruct-GGUF/Qwen2.5-7B-Instruct-Q8_0.gguf')
+
+    Args:
+        root (Path): The directory of the store, created when the first file is added.
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self._lock = threading.Lock()
+
+    @property
+    def _index_path(self) -> Path:
+        return self.root / "index.json"
+
+    def index(self) -> dict[str, dict]:
+        """The `{owner/repo/file: {"size": ..., "sha256": ...}}` of every stored file."""
+        try:
+            return json.loads(self._index_path.read_text())
+        except FileNotFoundError:
+            return {}
+
+    def _save_index(self, index: dict[str, dict]) -> None:
+        atomic_write_text(self._index_path, json.dumps(index, indent=2, sort_keys=True))
+
+    def path(self, repo_id: str, filename: str) -> Path:
+        return self.root / repo_id / filename
+
+    def resolve(self, repo_id: str, filename: str) -> Path:
+        """The local path of a stored file.
+
+        Raises:
+            FileNotFoundError: If the file is not in the store, or was changed since it was added.
+        """
+        key = f"{repo_id}/{filename}"
+        entry = self.index().get(key)
+        path = self.path(repo_id, filename)
+        if entry is None or not path.is_file():
+            raise FileNotFoundError(f"{key} is not in the model store {self.root}, add it with populate_model_store.py")
+        if path.stat().st_size != entry["size"]:
+            raise FileNotFoundError(f"{path} doesn't match the model store index, add it again")
+        return path
+
+    def add(self, repo_id: str, filename: str, revision: str | None = None) -> Path:
+        """Download a file from the Hugging Face hub into the store, unless it is already there."""
+        from huggingface_hub import hf_hub_download
+
+        key = f"{repo_id}/{filename}"
+        try:
+            return self.resolve(repo_id, filename)
+        except FileNotFoundError:
+            pass
+        logger.info(f"Adding {key} to the model store")
+        path = Path(
+            hf_hub_download(repo_id=repo_id, filename=filename, revision=revision, local_dir=self.root / repo_id)
+        )
+        entry = {"size": path.stat().st_size, "sha256": file_sha256(path)}
+        with self._lock:
+            index = self.index()
+            index[key] = entry
+            self._save_index(index)
+        return path
+
+    def add_matching(self, repo_id: str, patterns: tuple[str, ...], revision: str | None = None) -> list[Path]:
+        """Add every file of a hub repo matching one of `patterns`."""
+        from huggingface_hub import list_repo_files
+
+        filenames = [
+            filename
+            for filename in list_repo_files(repo_id, revision=revision)
+            if any(fnmatch(filename, pattern) for pattern in patterns)
+        ]
+        if not filenames:
+            raise FileNotFoundError(f"No file of {repo_id} matches {patterns}")
+        return [self.add(repo_id, filename, revision) for filename in filenames]
+
+    def verify(self) -> list[str]:
+        """Recompute the checksum of every stored file, returning the keys of those missing or changed."""
+        failed = []
+        for key, entry in self.index().items():
+            path = self.root / key
+            if not path.is_file() or file_sha256(path) != entry["sha256"]:
+                logger.error(f"{key} is missing or doesn't match its checksum")
+                failed.append(key)
+        return failed
+
+
+def model_store() -> ModelStore | None:
+    """The store set by `DOCUMENT_TO_PODCAST_MODEL_STORE`, which the loaders resolve models against.
+
+    When it is set, models are only ever loaded from the store, never downloaded.
+    """
+    root = os.environ.get("DOCUMENT_TO_PODCAST_MODEL_STORE")
+    return ModelStore(Path(root)) if root else None
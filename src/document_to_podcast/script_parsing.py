@@ -0,0 +1,173 @@
+import json
+import re
+from collections.abc import Iterable, Iterator
+from typing import NamedTuple
+
+from loguru import logger
+
+_SPEAKER_KEY = re.compile(r"Speaker (\d+)")
+# Raw control characters are not allowed in JSON strings, but unconstrained models emit them (mostly newlines).
+_CONTROL_CHARACTERS = re.compile(r"[\x00-\x1f\x7f]+")
+
+# The script format the LLM is prompted for: a JSON object of `"Speaker N": "text"` turns, one per line. The
+# string and whitespace rules follow llama.cpp's JSON grammar, whitespace being bounded so the model can't stall.
+_SCRIPT_GRAMMAR = r"""
+root ::= "{" ws turn ("," ws turn)* ws "}"
+turn ::= speaker ws ":" ws text
+speaker ::= {SPEAKERS}
+text ::= "\"" char+ "\""
+char ::= [^"\\\x7F\x00-\x1F] | "\\" (["\\/bfnrt] | "u" [0-9a-fA-F]{4})
+ws ::= | " " | "\n" [ \t]{0,20}
+"""
+
+
+class ScriptTurn(NamedTuple):
+    speaker_id: int
+    text: str
+
+
+def _decode_string(raw: str) -> str:
+    """The value of a JSON string, from its content between the quotes.
+
+    Malformed strings are repaired rather than losing the turn: raw control characters are replaced with a space,
+    and if the string still isn't valid JSON (e.g. it has an unknown escape), its content is kept as is.
+    """
+    try:
+        return json.loads(f'"{raw}"')
+    except json.JSONDecodeError as error:
+        logger.warning(f"Repairing a malformed string of the script ({error.msg}): {raw!r}")
+    normalized = _CONTROL_CHARACTERS.sub(" ", raw)
+    try:
+        return json.loads(f'"{normalized}"')
+    except json.JSONDecodeError:
+        return normalized
+
+
+def script_grammar(speaker_ids: Iterable[int]) -> str:
+    """A GBNF grammar only allowing scripts made of well-formed turns by the given speakers.
+
+    Examples:
+        >>> grammar = script_grammar(speaker.id for speaker in speakers)
+        >>> script = text_to_text(text, model, system_prompt, grammar=grammar)
+    """
+    speakers = " | ".join(f'"\\"Speaker {speaker_id}\\""' for speaker_id in sorted(set(speaker_ids)))
+    return _SCRIPT_GRAMMAR.replace("{SPEAKERS}", speakers).strip()
+
+
+class ScriptTurnParser:
+    """Incrementally parses `"Speaker N": "..."` turns out of a JSON script as it is streamed.
+
+    Text can be fed in arbitrary chunks (e.g. tokens from the LLM). Every turn is returned as soon as its closing
+    quote arrives, in a single pass over the input. Escapes inside strings are honoured. Everything else is logged
+    as it is discarded: the values of keys that don't name a speaker, text outside strings (e.g. unquoted
+    `Speaker 1: ...` lines) and, once `close` is called, a turn cut off by the end of the script.
+
+    Examples:
+        >>> parser = ScriptTurnParser()
+        >>> parser.feed('{"Speaker 1": "Hel')
+        []
+        >>> parser.feed('lo!", "Speaker 2"')
+        [ScriptTurn(speaker_id=1, text='Hello!')]
+        >>> parser.close()
+    """
+
+    def __init__(self):
+        self._in_string = False
+        self._escaped = False
+        self._string = []
+        # The last string outside a value, waiting for a colon to make it a key.
+        self._key = None
+        self._expecting_value = False
+        # Text outside strings that is not JSON syntax, e.g. an unquoted `Speaker 1: ...` line.
+        self._stray = []
+
+    def feed(self, text: str) -> list[ScriptTurn]:
+        """Consume the next chunk of text, returning the turns it completed."""
+        turns = []
+        for char in text:
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    turn = self._close_string(_decode_string("".join(self._string)))
+                    if turn is not None:
+                        turns.append(turn)
+                    continue
+                self._string.append(char)
+            elif char.isspace():
+                if self._stray:
+                    self._stray.append(char)
+                continue
+            elif char not in '":,{}[]' or (self._stray and char in ":,"):
+                # Punctuation inside stray text (e.g. `Speaker 1: Hi, there`) is logged along with it.
+                self._stray.append(char)
+                continue
+            else:
+                if self._stray:
+                    self._discard_stray()
+                if char == '"':
+                    self._in_string = True
+                    self._string = []
+                elif char == ":":
+                    self._expecting_value = self._key is not None
+                else:
+                    self._discard_key()
+                    self._expecting_value = False
+        return turns
+
+    def close(self) -> None:
+        """Log whatever the script ended in the middle of, once it is over."""
+        if self._in_string:
+            text = "".join(self._string)
+            if self._expecting_value:
+                logger.warning(f"Discarding the truncated last turn of {self._key!r}: {text!r}")
+                self._key = None
+                self._expecting_value = False
+            else:
+                logger.warning(f"Discarding the script's unterminated last string: {text!r}")
+            self._in_string = False
+        if self._stray:
+            self._discard_stray()
+        self._discard_key()
+
+    def _close_string(self, value: str) -> ScriptTurn | None:
+        if self._expecting_value:
+            key = self._key
+            self._key = None
+            self._expecting_value = False
+            match = _SPEAKER_KEY.fullmatch(key.strip())
+            if match:
+                return ScriptTurn(int(match.group(1)), value)
+            logger.warning(f"Discarding {key!r}, which doesn't name a speaker: {value!r}")
+            return None
+        self._discard_key()
+        self._key = value
+        return None
+
+    def _discard_key(self) -> None:
+        if self._key is not None:
+            logger.warning(f"Discarding a string of the script without a value: {self._key!r}")
+            self._key = None
+
+    def _discard_stray(self) -> None:
+        logger.warning(f"Discarding text outside the script's strings: {''.join(self._stray).strip()!r}")
+        self._stray = []
+
+
+def parse_script_stream(chunks: Iterable[str]) -> Iterator[ScriptTurn]:
+    """Yield the turns of a stream of script chunks as soon as each one is complete."""
+    parser = ScriptTurnParser()
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+    parser.close()
+
+
+def parse_script(script: str) -> list[ScriptTurn]:
+    """The turns of a whole script, in order."""
+    parser = ScriptTurnParser()
+    turns = parser.feed(script)
+    parser.close()
+    return turns
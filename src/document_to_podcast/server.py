@@ -0,0 +1,265 @@
+import argparse
+import json
+import queue
+import socketserver
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from artifact_cache import open_artifact_cache
+from audio_output import audio_filename
+from generate_audio import do_audio_generation, save_podcast_audio
+from generate_script import do_script_generation
+from inference.text_to_speech_pool import TTSWorkerPool
+from load_data import load_and_clean_data
+from loguru import logger
+from metrics import METRICS
+from models import PodcastGenerationConfig
+from preprocessing.model_loaders import MODEL_REGISTRY
+from pydantic import ValidationError
+from utils import save_data
+
+
+@dataclass
+class Job:
+    config: PodcastGenerationConfig
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    status: str = "queued"
+    result: dict[str, str] = field(default_factory=dict)
+    error: str | None = None
+    submitted_at: float = field(default_factory=time.time)
+    started_at: float | None = None
+    finished_at: float | None = None
+
+    def to_dict(self) -> dict:
+        job = asdict(self)
+        job["config"] = self.config.model_dump(mode="json", exclude={"text_to_text_prompt"})
+        return job
+
+
+class JobRunner:
+    """Runs submitted jobs one at a time (load → script → audio) in a background thread.
+
+    Models stay loaded in the model registry between jobs, so only the first job using a model pays for loading it.
+    Likewise, jobs with several `tts_workers` share one pool of worker processes per TTS model and settings.
+    Only the last `max_finished_jobs` finished jobs are kept, the oldest being forgotten (their outputs stay on disk).
+
+    A job's stages run one after the other, so unless its config sets `host_mode`, each model gets the `solo`
+    settings of the host profile.
+    """
+
+    def __init__(self, max_finished_jobs: int = 1000):
+        self.jobs: dict[str, Job] = {}
+        self.max_finished_jobs = max_finished_jobs
+        self._pools: dict[tuple, TTSWorkerPool] = {}
+        self._lock = threading.Lock()
+        self._queue: queue.Queue[Job] = queue.Queue()
+        self._thread = threading.Thread(target=self._run_forever, daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def submit(self, config: PodcastGenerationConfig) -> Job:
+        if "host_mode" not in config.model_fields_set:
+            config = config.model_copy(update={"host_mode": "solo"})
+        job = Job(config=config)
+        with self._lock:
+            self.jobs[job.id] = job
+        self._queue.put(job)
+        logger.info(f"Queued job {job.id} for {config.input_file}")
+        return job
+
+    def _run_forever(self) -> None:
+        while True:
+            job = self._queue.get()
+            job.status = "running"
+            job.started_at = time.time()
+            try:
+                job.result = self._run(job.config)
+                job.status = "done"
+            except Exception as e:
+                logger.exception(e)
+                job.error = str(e)
+                job.status = "failed"
+            job.finished_at = time.time()
+            logger.info(f"Job {job.id} {job.status} in {job.finished_at - job.started_at:.1f}s")
+            self._forget_finished_jobs()
+
+    def _forget_finished_jobs(self) -> None:
+        with self._lock:
+            # Jobs run in submission order, which is the order of the dict.
+            finished = [job_id for job_id, job in self.jobs.items() if job.finished_at is not None]
+            for job_id in finished[: max(0, len(finished) - self.max_finished_jobs)]:
+                del self.jobs[job_id]
+
+    def get(self, job_id: str) -> Job | None:
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def all_jobs(self) -> list[Job]:
+        with self._lock:
+            return list(self.jobs.values())
+
+    def close(self) -> None:
+        """Shut down the TTS worker pools."""
+        for pool in self._pools.values():
+            pool.close()
+        self._pools.clear()
+
+    def _pool(self, config: PodcastGenerationConfig) -> TTSWorkerPool | None:
+        if config.tts_workers == 1:
+            return None
+        lang_code = config.speakers[0].voice_profile[0]
+        key = (
+            config.text_to_speech_model,
+            lang_code,
+            config.tts_workers,
+            config.tts_torch_threads,
+            config.speech_cache_dir,
+            config.speech_cache_max_bytes,
+            config.host_mode,
+        )
+        if key not in self._pools:
+            self._pools[key] = TTSWorkerPool(
+                config.text_to_speech_model,
+                lang_code,
+                workers=config.tts_workers,
+                torch_threads=config.tts_torch_threads,
+                cache_dir=config.speech_cache_dir,
+                cache_max_bytes=config.speech_cache_max_bytes,
+                host_mode=config.host_mode,
+            )
+        return self._pools[key]
+
+    def _run(self, config: PodcastGenerationConfig) -> dict[str, str]:
+        cache = open_artifact_cache(config)
+        with METRICS.stage("load"):
+            text = load_and_clean_data(config.input_file, config.pdf_pages, config.pdf_workers, cache)
+            cleaned_path = save_data(config.output_folder, "cleaned.txt", text)
+
+        with METRICS.stage("script"):
+            script = do_script_generation(
+                text, config.text_to_text_model, config.text_to_text_prompt, config.speakers, config, cache
+            )
+            script_path = save_data(config.output_folder, "podcast.txt", script)
+
+        with METRICS.stage("audio"):
+            audio, sample_rate = do_audio_generation(
+                script, config.text_to_speech_model, config.speakers, config, cache, self._pool(config)
+            )
+            filename = audio_filename("podcast", config.audio_format)
+            audio_path = save_podcast_audio(config.output_folder, filename, audio, sample_rate, config.segment_seconds)
+
+        # The metrics add up over every job the server ran so far.
+        METRICS.save(config.metrics_file, config.prometheus_textfile)
+        return {"cleaned": cleaned_path, "script": script_path, "audio": audio_path}
+
+
+class JobRequestHandler(BaseHTTPRequestHandler):
+    """HTTP API of the server.
+
+    - `POST /jobs` with a `PodcastGenerationConfig` JSON body queues a job and returns it.
+    - `GET /jobs` lists every job, `GET /jobs/{id}` returns one job with its status and result paths.
+    - `GET /metrics` returns the performance metrics of every job so far, in the Prometheus text format.
+    """
+
+    runner: JobRunner
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/metrics":
+            return self._send_text(HTTPStatus.OK, METRICS.to_prometheus())
+        if self.path.rstrip("/") == "/jobs":
+            return self._send(HTTPStatus.OK, [job.to_dict() for job in self.runner.all_jobs()])
+        if self.path.startswith("/jobs/"):
+            job = self.runner.get(self.path.removeprefix("/jobs/"))
+            if job is not None:
+                return self._send(HTTPStatus.OK, job.to_dict())
+        return self._send(HTTPStatus.NOT_FOUND, {"error": f"Not found: {self.path}"})
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/jobs":
+            return self._send(HTTPStatus.NOT_FOUND, {"error": f"Not found: {self.path}"})
+        try:
+            content_length = int(self.headers.get("Content-Length", ""))
+        except ValueError:
+            return self._send(HTTPStatus.BAD_REQUEST, {"error": "A numeric Content-Length header is required"})
+        if content_length < 0:
+            return self._send(HTTPStatus.BAD_REQUEST, {"error": "Content-Length can't be negative"})
+        try:
+            config = PodcastGenerationConfig.model_validate_json(self.rfile.read(content_length))
+        except ValidationError as e:
+            return self._send(HTTPStatus.BAD_REQUEST, {"error": str(e)})
+        job = self.runner.submit(config)
+        return self._send(HTTPStatus.ACCEPTED, job.to_dict())
+
+    def _send(self, status: HTTPStatus, payload) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_text(self, status: HTTPStatus, text: str) -> None:
+        body = text.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self) -> str:
+        # Unix socket clients have no address.
+        return str(self.client_address[0]) if self.client_address else "unix"
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} {format % args}")
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def get_request(self):
+        request, _ = super().get_request()
+        return request, ("unix", 0)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Serve podcast generation jobs, keeping the models loaded.")
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--socket", type=Path, help="Listen on this Unix socket instead of host:port")
+    parser.add_argument(
+        "--model_memory_mb",
+        type=int,
+        help="Memory budget for resident models, least recently used ones are evicted. Defaults to "
+        "DOCUMENT_TO_PODCAST_MODEL_MEMORY_MB, or three quarters of the RAM",
+    )
+    parser.add_argument(
+        "--max_finished_jobs", type=int, default=1000, help="Finished jobs to keep listing, the oldest are forgotten"
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.model_memory_mb:
+        MODEL_REGISTRY.max_bytes = args.model_memory_mb * 1024 * 1024
+    runner = JobRunner(args.max_finished_jobs)
+    runner.start()
+    handler = type("Handler", (JobRequestHandler,), {"runner": runner})
+    if args.socket:
+        args.socket.unlink(missing_ok=True)
+        server = ThreadingUnixHTTPServer(str(args.socket), handler)
+        logger.info(f"Listening on {args.socket}")
+    else:
+        server = ThreadingHTTPServer((args.host, args.port), handler)
+        logger.info(f"Listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    finally:
+        runner.close()
@@ -1,29 +1,279 @@
+import os
+import queue
+import tempfile
+import threading
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import Executor
+from contextlib import contextmanager
 from pathlib import Path
+from typing import Any
 
 import numpy as np
 from loguru import logger
 
 
-def stack_audio_segments(audio_segments: list[np.ndarray], sample_rate: int, silence_pad: float = 1.0) -> np.ndarray:
+def to_audio_dtype(audio: np.ndarray, dtype: np.dtype | str | None) -> np.ndarray:
+    """Convert audio samples to `dtype`, floats being in [-1.0, 1.0] and int16 full scale.
+
+    Returns `audio` itself, without copying, when it already has that dtype or `dtype` is None.
+    """
+    audio = np.asarray(audio)
+    if dtype is None or audio.dtype == np.dtype(dtype):
+        return audio
+    if np.dtype(dtype) == np.int16:
+        return np.rint(np.clip(audio, -1.0, 1.0) * np.iinfo(np.int16).max).astype(np.int16)
+    if audio.dtype == np.int16:
+        return audio.astype(dtype) / np.iinfo(np.int16).max
+    return audio.astype(dtype)
+
+
+def silence_length(rng: np.random.Generator, sample_rate: int, silence_pad: float) -> int:
+    """The number of samples of the next silence pad, drawn from `rng` (seeded with 42 for reproducible output)."""
+    return int(rng.uniform(low=0.0, high=silence_pad) * sample_rate) if silence_pad > 0.0 else 0
+
+
+def pad_audio_segments(
+    audio_segments: Iterable[np.ndarray], sample_rate: int, silence_pad: float = 1.0, dtype: str | None = None
+) -> Iterator[np.ndarray]:
+    """Yield each audio segment followed by its silence pad, without holding more than one segment at a time.
+
+    The pads are sampled with the same seeded generator as
+    [stack_audio_segments][document_to_podcast.utils.stack_audio_segments], so streaming and in-memory output match.
+
+    Args:
+        audio_segments: Each speaker's audio in order, can be a lazy iterable.
+        sample_rate: The sample rate of the waveform generated by the model.
+        silence_pad: The maximum length of silence to pad at the end of each audio,
+        sampling between 0.0 and this number.
+        dtype: The dtype to convert the audio to, e.g. "float32" or "int16". By default the segments keep their
+        own dtype, and the pads take the dtype of the segment before them.
+
+    Each segment may also be an iterable of chunks that together make up one speaker's audio, in which case the
+    chunks are passed through as they arrive and the pad is added after the last one.
+
+    Yields:
+        np.ndarray: Alternating speaker audio and silence segments.
+    """
+    rng = np.random.default_rng(42)
+    for segment in audio_segments:
+        chunks = [segment] if isinstance(segment, np.ndarray) else segment
+        chunk_dtype = np.dtype(dtype or np.float32)
+        for chunk in chunks:
+            chunk = to_audio_dtype(chunk, dtype)
+            chunk_dtype = chunk.dtype
+            yield chunk
+        pad_length = silence_length(rng, sample_rate, silence_pad)
+        if pad_length:
+            yield np.zeros(pad_length, dtype=chunk_dtype)
+
+
+def stack_audio_segments(
+    audio_segments: Iterable[np.ndarray], sample_rate: int, silence_pad: float = 1.0, dtype: str | None = None
+) -> np.ndarray:
     """Stack / concatenate all the individual audio segments (speaker audios) sequentially to form the complete podcast.
     Additionally, at the end of each speaker's audio, add a small silence audio as buffer between speakers for a more
     natural sounding podcast. You can turn off this feature by setting silence_pad = 0.0
+
+    The podcast is allocated once, from the lengths of the segments and pads, and each segment is copied into it
+    and released, so the peak memory is about one podcast's worth of samples. It keeps the dtype of the segments
+    (float32 for Kokoro) unless `dtype` is given.
+
     Args:
         audio_segments: A list of each speaker's audio in order.
         sample_rate: The sample rate of the waveform generated by the model.
         silence_pad: The maximum length of silence to pad at the end of each audio,
         sampling between 0.0 and this number.
+        dtype: The dtype of the podcast, e.g. "float32" or "int16". Defaults to the dtype of the first segment.
 
     Returns: The complete podcast as a single, concatenated waveform.
 
     """
-    stacked = []
+    # Turns synthesized chunk by chunk are joined first, the lengths are needed upfront.
+    segments = [
+        np.asarray(segment) if isinstance(segment, np.ndarray) else np.concatenate(list(segment))
+        for segment in audio_segments
+    ]
     rng = np.random.default_rng(42)
-    for segment in audio_segments:
-        stacked.append(segment)
-        if silence_pad > 0.0:
-            stacked.append(np.zeros(int(rng.uniform(low=0.0, high=silence_pad) * sample_rate)))
-    return np.concatenate(stacked)
+    pad_lengths = [silence_length(rng, sample_rate, silence_pad) for _ in segments]
+    dtype = np.dtype(dtype or (segments[0].dtype if segments else np.float32))
+
+    # np.empty leaves the pages unallocated until they are written, and each segment is dropped once copied, so the
+    # buffer grows as the segments go.
+    podcast = np.empty(sum(len(segment) for segment in segments) + sum(pad_lengths), dtype=dtype)
+    position = 0
+    for index, pad_length in enumerate(pad_lengths):
+        segment = to_audio_dtype(segments[index], dtype)
+        segments[index] = None
+        podcast[position : position + len(segment)] = segment
+        position += len(segment)
+        podcast[position : position + pad_length] = 0
+        position += pad_length
+    return podcast
+
+
+def write_audio_segments(
+    output_path: Path,
+    audio_segments: Iterable[np.ndarray],
+    sample_rate: int,
+    silence_pad: float = 1.0,
+    dtype: str | None = None,
+    segment_seconds: float | None = None,
+) -> str:
+    """Write audio segments (and their silence pads) to disk as they arrive, encoded on the fly.
+
+    The file is flushed after every segment, so the header is kept up to date and a partially written
+    podcast stays playable if the process dies halfway through.
+
+    Args:
+        output_path: Where to write the audio file, the format is inferred from the extension, see
+        [AudioWriter][document_to_podcast.audio_output.AudioWriter].
+        audio_segments: Each speaker's audio in order, can be a lazy iterable.
+        sample_rate: The sample rate of the waveform generated by the model.
+        silence_pad: The maximum length of silence to pad at the end of each audio,
+        sampling between 0.0 and this number.
+        dtype: The dtype to convert the audio to before writing, the segments keep their own by default.
+        segment_seconds: Split the output into files of this duration, listed in a playlist.
+
+    Returns:
+        str: The path of the written file, or of the playlist when split into segments.
+    """
+    logger.info(f"Streaming audio to {output_path}")
+    # Imported here, as audio_output itself writes its playlists with `atomic_write_text`.
+    from audio_output import AudioWriter
+
+    with AudioWriter(output_path, sample_rate, segment_seconds) as writer:
+        for segment in pad_audio_segments(audio_segments, sample_rate, silence_pad, dtype):
+            writer.write(segment)
+    return writer.path
+
+
+def ordered_map(executor: Executor, fn: Callable, iterable: Iterable, max_in_flight: int) -> Iterator[Any]:
+    """Like `executor.map`, but keeps at most `max_in_flight` tasks queued and consumes `iterable` lazily.
+
+    Results are yielded in input order, so memory stays bounded by the window instead of the input size.
+    """
+    pending = deque()
+    for item in iterable:
+        pending.append(executor.submit(fn, item))
+        if len(pending) >= max_in_flight:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def prefetch(iterable: Iterable, maxsize: int = 2) -> Iterator[Any]:
+    """Consume `iterable` in a background thread, keeping up to `maxsize` items ready ahead of the caller.
+
+    This lets a producer (e.g. speech synthesis) run while the consumer (e.g. the audio writer) handles the
+    previous item. Exceptions raised by the producer are re-raised in the caller, and closing the returned
+    iterator stops the producer at its next item.
+    """
+    items = queue.Queue(maxsize=maxsize)
+    stopped = threading.Event()
+    done = object()
+
+    def put(item) -> bool:
+        while not stopped.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put((item, None)):
+                    return
+        except BaseException as e:
+            put((done, e))
+            return
+        put((done, None))
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    try:
+        while True:
+            item, error = items.get()
+            if error is not None:
+                raise error
+            if item is done:
+                return
+            yield item
+    finally:
+        stopped.set()
+        producer.join()
+
+
+@contextmanager
+def atomic_path(path: Path) -> Iterator[Path]:
+    """A temporary path next to `path` to write to, renamed over `path` once the block succeeds.
+
+    Readers of `path` (other threads, processes or a later run after a crash) never see a partial file. The
+    temporary file ends with `{suffix of path}.tmp`, and is removed if the block fails.
+
+    Examples:
+        >>> with atomic_path(Path("turn.npy")) as tmp_path, tmp_path.open("wb") as f:
+        ...     np.save(f, audio)
+    """
+    path = Path(path)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.stem}.", suffix=f"{path.suffix}.tmp")
+    os.close(fd)
+    tmp_path = Path(tmp_name)
+    try:
+        yield tmp_path
+        tmp_path.replace(path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+
+def atomic_write_bytes(path: Path, data: bytes) -> None:
+    """Write `data` to `path` through [atomic_path][document_to_podcast.utils.atomic_path]."""
+    with atomic_path(path) as tmp_path:
+        tmp_path.write_bytes(data)
+
+
+def atomic_write_text(path: Path, text: str) -> None:
+    """Write `text` to `path` through [atomic_path][document_to_podcast.utils.atomic_path]."""
+    with atomic_path(path) as tmp_path:
+        tmp_path.write_text(text)
+
+
+def evict_least_recently_used(paths: Iterable[Path], max_bytes: int) -> int:
+    """Delete the least recently modified of `paths` until the rest fit in `max_bytes`.
+
+    Caches touch their files on every hit, so the modification time tracks recency, even across processes.
+
+    Returns:
+        int: The total size of the remaining files.
+    """
+    entries = []
+    for path in paths:
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+    entries.sort()
+    size = sum(size for _, size, _ in entries)
+    for _, file_size, path in entries:
+        if size <= max_bytes:
+            break
+        path.unlink(missing_ok=True)
+        size -= file_size
+    return size
+
+
+def save_data_chunks(output_folder: Path, filename: str, chunks: Iterable[str]) -> str:
+    """Like [save_data][document_to_podcast.utils.save_data], but writes the data chunk by chunk as it arrives."""
+    output_path = output_folder / filename
+    logger.info(f"Saving data to {output_path}")
+    with output_path.open("w") as f:
+        for chunk in chunks:
+            f.write(chunk)
+    return str(output_path)
 
 
 def save_data(output_folder: Path, filename: str, data: str) -> str:
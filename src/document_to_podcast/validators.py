@@ -1,3 +1,5 @@
+import re
+
 from inference.text_to_speech import get_text_to_speech_generator
 from preprocessing.data_loaders import loader_by_extension
 from preprocessing.model_loaders import tts_loader_by_model
@@ -13,6 +15,19 @@ def validate_output_folder(value):
     return value
 
 
+def validate_pdf_pages(value):
+    if value is None:
+        return value
+    if value in ("", "-") or not re.fullmatch(r"\d*-?\d*", value):
+        raise ValueError('pdf_pages must be a page range such as "5", "1-50" or "10-"')
+    start, _, end = value.partition("-")
+    if any(page and int(page) == 0 for page in (start, end)):
+        raise ValueError("pdf_pages are numbered from 1")
+    if start and end and int(start) > int(end):
+        raise ValueError(f"pdf_pages must not end before it starts, as {value!r} does")
+    return value
+
+
 def validate_text_to_text_model(value):
     parts = value.split("/", maxsplit=3)
     if len(parts) != 3:
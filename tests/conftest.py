@@ -0,0 +1,19 @@
+import sys
+from pathlib import Path
+
+import pytest
+from loguru import logger
+
+# The entry points import their sibling modules by name, as when run as scripts, and the fakes live with the
+# benchmarks.
+sys.path.insert(0, str(Path(__file__).parent.parent / "src" / "document_to_podcast"))
+sys.path.insert(0, str(Path(__file__).parent.parent / "benchmarks"))
+
+
+@pytest.fixture
+def warnings():
+    """The messages of the warnings logged during the test."""
+    messages = []
+    sink = logger.add(lambda message: messages.append(message.record["message"]), level="WARNING")
+    yield messages
+    logger.remove(sink)
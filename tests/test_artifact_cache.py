@@ -0,0 +1,45 @@
+import os
+
+from artifact_cache import ArtifactCache, cached_file, cached_text
+
+
+def test_key_depends_on_content_and_params():
+    key = ArtifactCache.key("script", "text", {"model": "a"})
+    assert key == ArtifactCache.key("script", b"text", {"model": "a"})
+    assert key != ArtifactCache.key("script", "other text", {"model": "a"})
+    assert key != ArtifactCache.key("script", "text", {"model": "b"})
+    assert key != ArtifactCache.key("cleaned", "text", {"model": "a"})
+
+
+def test_cached_text_only_produces_once(tmp_path):
+    cache = ArtifactCache(tmp_path)
+    produced = []
+
+    def produce():
+        produced.append(True)
+        return "script"
+
+    assert cached_text(cache, "script", "key", produce) == "script"
+    assert cached_text(cache, "script", "key", produce) == "script"
+    assert len(produced) == 1
+    assert cached_text(ArtifactCache(tmp_path, force=True), "script", "key", produce) == "script"
+    assert len(produced) == 2
+
+
+def test_cached_file_copies_the_stored_file(tmp_path):
+    cache = ArtifactCache(tmp_path / "cache")
+    cached_file(cache, "audio", "key", tmp_path / "first.wav", lambda path: path.write_bytes(b"audio"))
+    output = cached_file(cache, "audio", "key", tmp_path / "second.wav", lambda path: path.write_bytes(b"other"))
+    assert (tmp_path / "second.wav").read_bytes() == b"audio"
+    assert output == str(tmp_path / "second.wav")
+
+
+def test_evicts_the_least_recently_used(tmp_path):
+    cache = ArtifactCache(tmp_path, max_bytes=35)
+    for i in range(3):
+        cache.put_text("script", f"key{i}", "x" * 10)
+        os.utime(tmp_path / "script" / f"key{i}.txt", (i, i))
+    cache.get_text("script", "key0")
+    cache.put_text("script", "key3", "x" * 10)
+    assert [cache.get_text("script", f"key{i}") is not None for i in range(4)] == [True, False, True, True]
+    assert not list(tmp_path.glob("*/*.tmp"))
@@ -0,0 +1,68 @@
+import json
+
+import generate_audio
+import numpy as np
+import pytest
+import soundfile as sf
+from audio_checkpoint import AudioCheckpoint
+from fakes import canned_script, fake_tts_model
+from models import SpeakerConfig
+from script_parsing import ScriptTurn
+
+TURNS = [ScriptTurn(1, "Hello!"), ScriptTurn(2, "Hi."), ScriptTurn(1, "Bye!")]
+
+
+def synthesize(turns) -> list[np.ndarray]:
+    return [np.full(10, index, dtype=np.float32) for index, _ in enumerate(turns)]
+
+
+def test_resumes_after_the_saved_turns(tmp_path):
+    checkpoint = AudioCheckpoint(tmp_path, "script", {})
+    remaining = checkpoint.remaining(TURNS)
+    segments = checkpoint.segments(synthesize(next(remaining) for _ in range(2)), 24000)
+    assert len(list(segments)) == 2
+    manifest = json.loads((tmp_path / "manifest.json").read_text())
+    assert [turn["speaker_id"] for turn in manifest["turns"]] == [1, 2]
+
+    resumed = AudioCheckpoint(tmp_path, "script", {})
+    assert resumed.completed == 2
+    remaining = list(resumed.remaining(TURNS))
+    assert remaining == TURNS[2:]
+    audio = list(resumed.segments([np.full(10, 2, dtype=np.float32)], 24000))
+    assert [segment[0] for segment in audio] == [0, 1, 2]
+
+
+def test_discards_the_turns_of_another_script(tmp_path):
+    checkpoint = AudioCheckpoint(tmp_path, "script", {})
+    list(checkpoint.segments(synthesize(checkpoint.remaining(TURNS)), 24000))
+    assert AudioCheckpoint(tmp_path, "other script", {}).completed == 0
+    assert not list(tmp_path.glob("*.npy"))
+
+
+def test_sweeps_temporary_files_and_removes_the_folder(tmp_path):
+    folder = tmp_path / "podcast_turns"
+    folder.mkdir()
+    (folder / ".turn_00000.abc.npy.tmp").write_bytes(b"partial")
+    checkpoint = AudioCheckpoint(folder, "script", {})
+    assert not list(folder.glob("*.tmp"))
+    checkpoint.remove()
+    assert not folder.exists()
+
+
+def test_rejects_another_sample_rate(tmp_path):
+    checkpoint = AudioCheckpoint(tmp_path, "script", {})
+    list(checkpoint.segments(synthesize(checkpoint.remaining(TURNS[:1])), 24000))
+    with pytest.raises(ValueError, match="24000Hz"):
+        list(AudioCheckpoint(tmp_path, "script", {}).segments([], 16000))
+
+
+def test_write_checkpointed_audio_removes_the_turns(tmp_path, monkeypatch):
+    monkeypatch.setattr(generate_audio, "load_text_to_speech_model", lambda *args, **kwargs: fake_tts_model())
+    output_path = tmp_path / "podcast.wav"
+    speakers = SpeakerConfig().speakers
+
+    result = generate_audio.write_checkpointed_audio(output_path, canned_script(3, 5), "hexgrad/Kokoro-82M", speakers)
+
+    assert result == str(output_path)
+    assert len(sf.read(output_path)[0]) > 0
+    assert not (tmp_path / "podcast_turns").exists()
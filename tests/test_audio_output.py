@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+import soundfile as sf
+from audio_output import AudioWriter
+
+
+def tone(samples: int) -> np.ndarray:
+    return np.sin(np.arange(samples, dtype=np.float32) / 10) * 0.5
+
+
+@pytest.mark.parametrize("extension", [".wav", ".flac"])
+def test_writes_a_single_file(tmp_path, extension):
+    path = tmp_path / f"podcast{extension}"
+    with AudioWriter(path, 24000) as writer:
+        writer.write(tone(1000))
+        writer.write(tone(500))
+    audio, sample_rate = sf.read(path, dtype="float32")
+    assert sample_rate == 24000
+    np.testing.assert_allclose(audio, np.concatenate([tone(1000), tone(500)]), atol=1e-4)
+    assert writer.path == str(path)
+
+
+def test_splits_into_segments_listed_in_a_playlist(tmp_path):
+    with AudioWriter(tmp_path / "podcast.wav", 1000, segment_seconds=1.0) as writer:
+        writer.write(tone(1500))
+        writer.write(tone(1000))
+    assert writer.path == str(tmp_path / "podcast.m3u")
+    lines = (tmp_path / "podcast.m3u").read_text().splitlines()
+    assert lines == [
+        "#EXTM3U",
+        "#EXTINF:1.000,",
+        "podcast_00000.wav",
+        "#EXTINF:1.000,",
+        "podcast_00001.wav",
+        "#EXTINF:0.500,",
+        "podcast_00002.wav",
+    ]
+    audio = np.concatenate([sf.read(tmp_path / f"podcast_0000{i}.wav", dtype="float32")[0] for i in range(3)])
+    np.testing.assert_allclose(audio, np.concatenate([tone(1500), tone(1000)]), atol=1e-4)
+
+
+def test_empty_output_is_still_a_valid_file(tmp_path):
+    with AudioWriter(tmp_path / "podcast.wav", 24000):
+        pass
+    assert len(sf.read(tmp_path / "podcast.wav")[0]) == 0
+
+
+def test_rejects_sample_rates_the_format_does_not_support(tmp_path):
+    with pytest.raises(ValueError, match="22050Hz"):
+        AudioWriter(tmp_path / "podcast.opus", 22050)
@@ -0,0 +1,55 @@
+import asyncio
+
+import generate_audio
+import numpy as np
+import pytest
+from audio_stream import aiter_podcast_audio, iter_podcast_audio
+from fakes import canned_script, fake_tts_model
+from models import SpeakerConfig, SynthesisConfig
+
+MODEL_ID = "hexgrad/Kokoro-82M"
+SPEAKERS = SpeakerConfig().speakers
+
+
+@pytest.fixture(autouse=True)
+def fake_model(monkeypatch):
+    monkeypatch.setattr(generate_audio, "load_text_to_speech_model", lambda *args, **kwargs: fake_tts_model())
+
+
+def test_chunks_add_up_to_the_whole_podcast():
+    script = canned_script(4, words_per_turn=5)
+    chunks = list(iter_podcast_audio(script, MODEL_ID, SPEAKERS))
+    audio, _ = generate_audio.do_audio_generation(script, MODEL_ID, SPEAKERS)
+
+    np.testing.assert_array_equal(np.concatenate([chunk.samples for chunk in chunks]), audio)
+    assert sorted({chunk.turn_index for chunk in chunks}) == [0, 1, 2, 3]
+    for previous, chunk in zip(chunks, chunks[1:], strict=False):
+        assert chunk.start_seconds == pytest.approx(previous.end_seconds)
+
+
+def test_audio_dtype():
+    chunks = iter_podcast_audio(canned_script(2), MODEL_ID, SPEAKERS, SynthesisConfig(audio_dtype="int16"))
+    assert {chunk.samples.dtype for chunk in chunks} == {np.dtype(np.int16)}
+
+
+def test_async_chunks_match_the_iterator():
+    script = canned_script(4, words_per_turn=5)
+
+    async def collect():
+        return [chunk async for chunk in aiter_podcast_audio(script, MODEL_ID, SPEAKERS, max_buffered_chunks=1)]
+
+    chunks = asyncio.run(collect())
+    expected = list(iter_podcast_audio(script, MODEL_ID, SPEAKERS))
+    assert len(chunks) == len(expected)
+    for chunk, expected_chunk in zip(chunks, expected, strict=True):
+        np.testing.assert_array_equal(chunk.samples, expected_chunk.samples)
+
+
+def test_async_iterator_stops_early():
+    async def first_chunk():
+        audio = aiter_podcast_audio(canned_script(50), MODEL_ID, SPEAKERS)
+        async for chunk in audio:
+            await audio.aclose()
+            return chunk
+
+    assert asyncio.run(first_chunk()).turn_index == 0
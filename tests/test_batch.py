@@ -0,0 +1,41 @@
+import json
+
+from batch import read_manifest
+
+
+def test_invalid_entries_become_failed_items(tmp_path):
+    document = tmp_path / "document.md"
+    document.write_text("# A document")
+    manifest = tmp_path / "manifest.jsonl"
+    lines = [
+        json.dumps({"input_file": str(document)}),
+        json.dumps({"output_folder": str(tmp_path / "out")}),
+        "not json",
+        json.dumps({"input_file": str(document), "audio_format": "mp3"}),
+        json.dumps({"input_file": str(document)}),
+    ]
+    manifest.write_text("\n".join(lines) + "\n")
+
+    items = read_manifest(manifest, tmp_path / "output")
+
+    assert [item.error is None for item in items] == [True, False, False, False, True]
+    assert [item.input_file for item in items] == [
+        str(document),
+        f"{manifest}:2",
+        f"{manifest}:3",
+        str(document),
+        str(document),
+    ]
+    assert items[1].to_dict()["status"] == "failed"
+    assert items[0].config.output_folder == tmp_path / "output" / "document"
+    assert items[4].config.output_folder == tmp_path / "output" / "document_3"
+
+
+def test_directory_manifest_lists_supported_documents(tmp_path):
+    (tmp_path / "a.md").write_text("# A")
+    (tmp_path / "b.txt").write_text("B")
+    (tmp_path / "notes.xyz").write_text("C")
+
+    items = read_manifest(tmp_path, tmp_path / "output")
+
+    assert [item.input_file for item in items] == [str(tmp_path / "a.md"), str(tmp_path / "b.txt")]
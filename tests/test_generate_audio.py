@@ -0,0 +1,30 @@
+import pytest
+from fakes import fake_tts_model
+from generate_audio import script_turns, synthesize_turns_pipelined
+from models import SpeakerConfig
+
+VOICE = "af_sarah"
+SPEAKERS = SpeakerConfig().speakers
+
+
+def test_pipelined_synthesis_yields_every_turn():
+    # The fake model, like Kokoro, yields no chunk for a turn without words.
+    turns = [("One. Two.", VOICE), ("...", VOICE), ("Three.", VOICE)]
+    chunks_per_turn = [len(list(chunks)) for chunks in synthesize_turns_pipelined(turns, fake_tts_model())]
+    assert chunks_per_turn == [2, 0, 1]
+
+
+def test_pipelined_synthesis_skips_the_rest_of_an_unconsumed_turn():
+    turns = [("One. Two. Three.", VOICE), ("Four.", VOICE)]
+    groups = synthesize_turns_pipelined(turns, fake_tts_model())
+    next(next(groups))
+    assert len(list(next(groups))) == 1
+    assert next(groups, None) is None
+
+
+def test_scripts_without_turns_raise(warnings):
+    with pytest.raises(ValueError, match="no turn"):
+        list(script_turns("Speaker 1: Hello!", SPEAKERS))
+    with pytest.raises(ValueError, match="no turn"):
+        list(script_turns('{"Speaker 9": "Hello!"}', SPEAKERS))
+    assert warnings
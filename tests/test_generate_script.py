@@ -0,0 +1,35 @@
+import generate_script
+from fakes import FakeLlama
+from generate_script import condense_text, count_tokens, split_text
+
+
+class NotesLlama(FakeLlama):
+    """Answers every completion with short notes, recording the excerpts and settings it was called with."""
+
+    def __init__(self):
+        super().__init__("Short notes.")
+        self.calls = []
+
+    def create_chat_completion(self, messages, **kwargs):
+        self.calls.append((messages[1]["content"], kwargs.get("max_tokens")))
+        return super().create_chat_completion(messages, **kwargs)
+
+
+def test_split_text_keeps_sentences_together():
+    text = "One two. Three four five. Six."
+    assert split_text(text, 16) == ["One two.", "Three four five.", "Six."]
+    assert "".join(split_text("x" * 25, 10)) == "x" * 25
+
+
+def test_condense_text_chunks_fit_the_condense_context(monkeypatch):
+    monkeypatch.setattr(generate_script, "get_prompt_prefix_cache", lambda: None)
+    model = NotesLlama()
+    text = " ".join(f"Sentence number {i} of the document." for i in range(200))
+
+    condensed = condense_text(text, [model], max_tokens=100, summary_tokens=20)
+
+    assert count_tokens(condensed, model) <= 100
+    assert model.calls
+    for excerpt, max_tokens in model.calls:
+        assert count_tokens(excerpt, model) <= 100
+        assert max_tokens == 20
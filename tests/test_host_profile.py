@@ -0,0 +1,20 @@
+import json
+
+from preprocessing.host_profile import host_fingerprint, load_host_profile, save_host_profile
+
+
+def test_saves_and_loads_settings(tmp_path):
+    path = tmp_path / "host_profile.json"
+    save_host_profile("tts", "hexgrad/Kokoro-82M", {"solo": {"torch_threads": 4}}, path)
+    profile = load_host_profile(path)
+    assert profile["host"] == host_fingerprint()
+    assert profile["tts"] == {"hexgrad/Kokoro-82M": {"solo": {"torch_threads": 4}}}
+
+
+def test_warns_once_about_a_profile_of_another_host(tmp_path, warnings):
+    path = tmp_path / "host_profile.json"
+    path.write_text(json.dumps({"host": {"system": "Plan 9"}, "llama_cpp": {"model": {}}, "tts": {}}))
+    for _ in range(3):
+        assert load_host_profile(path)["llama_cpp"] == {}
+    assert len(warnings) == 1
+    assert "another host" in warnings[0]
@@ -0,0 +1,82 @@
+import threading
+import time
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from load_data import iter_load_and_clean_urls
+
+PAGES = {f"/page{i}": f"<html><body><p>Page number {i}.</p></body></html>".encode() for i in range(6)}
+
+
+class PageHandler(BaseHTTPRequestHandler):
+    """Serves `PAGES` with an ETag, the first one slower than the others, answering revalidations with a 304."""
+
+    requests: list[tuple[str, int]]
+
+    def do_GET(self):
+        body = PAGES.get(self.path)
+        if body is None:
+            status = HTTPStatus.NOT_FOUND
+        elif self.headers.get("If-None-Match") == f'"{self.path}"':
+            status = HTTPStatus.NOT_MODIFIED
+        else:
+            status = HTTPStatus.OK
+        if self.path == "/page0":
+            time.sleep(0.2)
+        self.requests.append((self.path, status))
+        self.send_response(status)
+        if status == HTTPStatus.OK:
+            self.send_header("ETag", f'"{self.path}"')
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    handler = type("Handler", (PageHandler,), {"requests": []})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def urls_of(server, paths: list[str]) -> list[str]:
+    host, port = server.server_address
+    return [f"http://{host}:{port}{path}" for path in paths]
+
+
+def test_keeps_the_order_and_records_failures_as_none(server):
+    paths = [*PAGES, "/missing", "/page1"]
+    results = list(iter_load_and_clean_urls(urls_of(server, paths), workers=4))
+
+    assert [url for url, _ in results] == urls_of(server, paths)
+    assert [text and text.strip() for _, text in results] == [
+        *(f"Page number {i}." for i in range(6)),
+        None,
+        "Page number 1.",
+    ]
+
+
+def test_revalidates_cached_pages(server, tmp_path):
+    urls = urls_of(server, ["/page1", "/page2"])
+    first = list(iter_load_and_clean_urls(urls, workers=2, cache_dir=tmp_path))
+    second = list(iter_load_and_clean_urls(urls, workers=2, cache_dir=tmp_path))
+
+    assert second == first
+    assert sorted(server.RequestHandlerClass.requests) == [
+        ("/page1", HTTPStatus.OK),
+        ("/page1", HTTPStatus.NOT_MODIFIED),
+        ("/page2", HTTPStatus.OK),
+        ("/page2", HTTPStatus.NOT_MODIFIED),
+    ]
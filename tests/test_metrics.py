@@ -0,0 +1,82 @@
+import time
+
+import pytest
+from fakes import FakeLlama
+from inference.text_to_text import PromptPrefixCache, text_to_text, text_to_text_stream
+from metrics import Metrics
+
+
+@pytest.fixture
+def metrics(monkeypatch):
+    metrics = Metrics()
+    monkeypatch.setattr("inference.text_to_text.METRICS", metrics)
+    return metrics
+
+
+def value(metrics: Metrics, name: str) -> float:
+    sample = metrics.to_dict()[name][0]
+    return sample.get("value", sample.get("total"))
+
+
+def test_counters_summaries_and_ratios():
+    metrics = Metrics()
+    metrics.add("tts_audio_seconds", 10.0)
+    metrics.add("tts_compute_seconds", 2.0)
+    metrics.add("tts_audio_seconds", 2.0)
+    metrics.observe("stage_seconds", 1.0, stage="load")
+    metrics.observe("stage_seconds", 3.0, stage="load")
+
+    assert value(metrics, "tts_real_time_factor") == 6.0
+    assert metrics.to_dict()["stage_seconds"] == [
+        {"labels": {"stage": "load"}, "count": 2, "sum": 4.0, "max": 3.0, "mean": 2.0}
+    ]
+    prometheus = metrics.to_prometheus()
+    assert "document_to_podcast_tts_audio_seconds_total 12.0" in prometheus
+    assert 'document_to_podcast_stage_seconds_count{stage="load"} 2' in prometheus
+
+
+def test_stream_records_prompt_and_generation_apart(metrics):
+    model = FakeLlama("one two three four five", tokens_per_second=100)
+    chunks = list(text_to_text_stream("some input text", model, "system prompt", prefix_cache=None))
+
+    assert len(chunks) == 5
+    assert value(metrics, "llm_prompt_tokens") == 5
+    assert value(metrics, "llm_generated_tokens") == 5
+    assert value(metrics, "llm_decoded_tokens") == 4
+    # Four tokens after the first one, decoded at 100 tokens/s.
+    assert value(metrics, "llm_generation_seconds") >= 0.04
+    assert value(metrics, "llm_generation_tokens_per_second") == pytest.approx(100, rel=0.5)
+    assert value(metrics, "llm_prompt_seconds") <= value(metrics, "llm_seconds")
+    assert "llm_prompt_tokens_per_second" in metrics.to_dict()
+
+
+def test_text_to_text_records_prompt_tokens(metrics):
+    model = FakeLlama("notes")
+    start = time.perf_counter()
+    assert text_to_text("input", model, "system", return_json=False) == "notes"
+    assert value(metrics, "llm_prompt_tokens") == 2
+    assert value(metrics, "llm_seconds") <= time.perf_counter() - start
+
+
+def test_prompt_tokens_exclude_the_cached_system_prompt(metrics, monkeypatch):
+    monkeypatch.setattr(
+        "inference.text_to_text._system_prompt_tokens", lambda model, prompt: model.tokenize(prompt.encode())
+    )
+    cache = PromptPrefixCache()
+    # A first model evaluates the system prompt, the next one restores it from the cache.
+    cache.prime(FakeLlama("notes"), "a long system prompt")
+    model = FakeLlama("notes")
+    text_to_text("some input text", model, "a long system prompt", return_json=False, prefix_cache=cache)
+    assert value(metrics, "llm_prompt_tokens") == 3
+    # The system prompt is still in the context for the next completion.
+    text_to_text("other input", model, "a long system prompt", return_json=False, prefix_cache=cache)
+    assert value(metrics, "llm_prompt_tokens") == 3 + 2
+
+
+def test_prompt_tokens_include_the_system_prompt_evaluated_for_the_cache(metrics, monkeypatch):
+    monkeypatch.setattr(
+        "inference.text_to_text._system_prompt_tokens", lambda model, prompt: model.tokenize(prompt.encode())
+    )
+    model = FakeLlama("notes")
+    text_to_text("some input text", model, "a long system prompt", return_json=False, prefix_cache=PromptPrefixCache())
+    assert value(metrics, "llm_prompt_tokens") == 4 + 3
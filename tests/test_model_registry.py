@@ -0,0 +1,74 @@
+from preprocessing import model_loaders
+from preprocessing.model_loaders import ModelRegistry
+
+
+class Model:
+    closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def test_returns_the_cached_model():
+    registry = ModelRegistry()
+    loads = []
+    first = registry.get("a", lambda: loads.append("a") or Model(), lambda _: 10)
+    assert registry.get("a", lambda: loads.append("a") or Model(), lambda _: 10) is first
+    assert loads == ["a"]
+
+
+def test_evicts_before_loading_without_closing():
+    registry = ModelRegistry(max_bytes=100)
+    old = registry.get("old", Model, lambda _: 60)
+    resident_while_loading = []
+
+    def load():
+        resident_while_loading.append(registry.resident_bytes)
+        return Model()
+
+    registry.get("new", load, lambda _: 60, estimate=lambda: 60)
+    assert resident_while_loading == [0]
+    assert registry.resident_bytes == 60
+    # Whoever still holds the evicted model keeps using it.
+    assert not old.closed
+
+
+def test_evicts_after_loading_when_the_estimate_is_low():
+    registry = ModelRegistry(max_bytes=100)
+    old = registry.get("old", Model, lambda _: 60)
+    registry.get("new", Model, lambda _: 60)
+    assert registry.resident_bytes == 60
+    assert registry.get("old", Model, lambda _: 60) is not old
+
+
+def test_serves_a_request_from_a_cached_model_that_fits():
+    registry = ModelRegistry()
+
+    def fits(n_ctx):
+        return lambda cached: cached[0] == "llm" and cached[1] >= n_ctx
+
+    large = registry.get(("llm", 8192), Model, lambda _: 10)
+    assert registry.get(("llm", 4096), Model, lambda _: 10, fits=fits(4096)) is large
+    assert registry.get(("llm", 16384), Model, lambda _: 10, fits=fits(16384)) is not large
+    assert registry.resident_bytes == 20
+
+
+def test_llama_cpp_models_are_shared_by_smaller_contexts(monkeypatch):
+    registry = ModelRegistry()
+    monkeypatch.setattr(model_loaders, "MODEL_REGISTRY", registry)
+    monkeypatch.setattr(model_loaders, "load_llama_cpp_model", lambda model_id, **kwargs: Model())
+    monkeypatch.setattr(model_loaders, "_llama_cpp_model_size", lambda _: 10)
+    monkeypatch.setattr(model_loaders, "_stored_file_size", lambda *_: 0)
+    model_id = "owner/repo/model.gguf"
+
+    large = model_loaders.get_llama_cpp_model(model_id, n_ctx=8192, host_mode="solo")
+    assert model_loaders.get_llama_cpp_model(model_id, n_ctx=2048, host_mode="solo") is large
+    assert model_loaders.get_llama_cpp_model(model_id, n_ctx=2048, host_mode="shared") is not large
+    assert model_loaders.get_llama_cpp_model(model_id, n_ctx=16384, host_mode="solo") is not large
+
+
+def test_the_default_budget_follows_the_environment(monkeypatch):
+    monkeypatch.setenv("DOCUMENT_TO_PODCAST_MODEL_MEMORY_MB", "512")
+    assert model_loaders._default_budget() == 512 * 1024 * 1024
+    monkeypatch.delenv("DOCUMENT_TO_PODCAST_MODEL_MEMORY_MB")
+    assert model_loaders._default_budget() > 0
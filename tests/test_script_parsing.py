@@ -0,0 +1,76 @@
+import pytest
+from script_parsing import ScriptTurn, ScriptTurnParser, parse_script, script_grammar
+
+
+def feed_in_chunks(script: str, size: int) -> list[ScriptTurn]:
+    parser = ScriptTurnParser()
+    turns = []
+    for start in range(0, len(script), size):
+        turns.extend(parser.feed(script[start : start + size]))
+    return turns
+
+
+def test_parses_turns_in_order():
+    script = '{"Speaker 1": "Hello!", "Speaker 2": "Hi there."}'
+    assert parse_script(script) == [ScriptTurn(1, "Hello!"), ScriptTurn(2, "Hi there.")]
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7])
+def test_chunking_does_not_change_the_turns(size):
+    script = '{"Speaker 1": "Say \\"hi\\" \\\\ bye", "Speaker 2": "Caf\\u00e9\\nnext"}'
+    assert feed_in_chunks(script, size) == parse_script(script)
+
+
+def test_decodes_escapes():
+    script = '{"Speaker 1": "Say \\"hi\\" \\\\ bye\\tnow", "Speaker 2": "Caf\\u00e9\\nnext"}'
+    assert parse_script(script) == [ScriptTurn(1, 'Say "hi" \\ bye\tnow'), ScriptTurn(2, "Café\nnext")]
+
+
+def test_skips_keys_that_are_not_speakers():
+    script = '{"title": "An episode", "Speaker 1": "Hello!"}'
+    assert parse_script(script) == [ScriptTurn(1, "Hello!")]
+
+
+def test_replaces_raw_control_characters():
+    script = '{"Speaker 1": "First line\nsecond\tline", "Speaker 2": "Next"}'
+    assert parse_script(script) == [ScriptTurn(1, "First line second line"), ScriptTurn(2, "Next")]
+
+
+def test_keeps_invalid_escapes_as_is():
+    script = '{"Speaker 1": "What \\q is this?", "Speaker 2": "Next"}'
+    assert parse_script(script) == [ScriptTurn(1, "What \\q is this?"), ScriptTurn(2, "Next")]
+
+
+def test_truncated_input_returns_the_complete_turns():
+    script = '{"Speaker 1": "Hello!", "Speaker 2": "Cut sho'
+    assert parse_script(script) == [ScriptTurn(1, "Hello!")]
+    assert parse_script('{"Speaker 1": "Unfinished \\') == []
+
+
+def test_logs_the_truncated_last_turn(warnings):
+    assert parse_script('{"Speaker 1": "Hello!", "Speaker 2": "Cut sho') == [ScriptTurn(1, "Hello!")]
+    assert warnings == ["Discarding the truncated last turn of 'Speaker 2': 'Cut sho'"]
+
+
+def test_logs_unquoted_lines(warnings):
+    script = 'Speaker 1: Hello!\n{"Speaker 2": "Hi there."}'
+    assert parse_script(script) == [ScriptTurn(2, "Hi there.")]
+    assert warnings == ["Discarding text outside the script's strings: 'Speaker 1: Hello!'"]
+
+
+def test_logs_keys_that_are_not_speakers(warnings):
+    parse_script('{"title": "An episode", "Speaker 1": "Hello!"}')
+    assert len(warnings) == 1
+    assert "'title'" in warnings[0]
+
+
+def test_well_formed_scripts_log_nothing(warnings):
+    parse_script('{\n  "Speaker 1": "Hello!",\n  "Speaker 2": "Hi there."\n}')
+    assert warnings == []
+
+
+def test_script_grammar_only_allows_the_given_speakers():
+    grammar = script_grammar([2, 1, 2])
+    assert 'speaker ::= "\\"Speaker 1\\"" | "\\"Speaker 2\\""' in grammar.splitlines()
+    assert grammar.startswith('root ::= "{" ws turn ("," ws turn)* ws "}"')
+    assert "{SPEAKERS}" not in grammar
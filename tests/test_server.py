@@ -0,0 +1,81 @@
+import http.client
+import json
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+from models import PodcastGenerationConfig
+from server import Job, JobRequestHandler, JobRunner
+
+
+class RecordingRunner(JobRunner):
+    """Records submitted jobs without running them."""
+
+    def start(self) -> None:
+        pass
+
+
+@pytest.fixture
+def server():
+    runner = RecordingRunner()
+    handler = type("Handler", (JobRequestHandler,), {"runner": runner})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def post(server, body: bytes, headers: dict) -> tuple[int, dict]:
+    connection = http.client.HTTPConnection(*server.server_address)
+    connection.putrequest("POST", "/jobs")
+    for name, value in headers.items():
+        connection.putheader(name, value)
+    connection.endheaders(body)
+    response = connection.getresponse()
+    return response.status, json.loads(response.read())
+
+
+@pytest.mark.parametrize("headers", [{}, {"Content-Length": "abc"}, {"Content-Length": "-1"}])
+def test_post_without_a_valid_content_length_is_a_bad_request(server, headers):
+    status, payload = post(server, b"", headers)
+    assert status == 400
+    assert "Content-Length" in payload["error"]
+
+
+def test_post_with_an_invalid_config_is_a_bad_request(server):
+    body = b'{"input_file": 42}'
+    status, _ = post(server, body, {"Content-Length": str(len(body))})
+    assert status == 400
+
+
+def test_finished_jobs_beyond_the_limit_are_forgotten():
+    runner = JobRunner(max_finished_jobs=2)
+    jobs = [Job(config=None) for _ in range(4)]
+    for job in jobs:
+        runner.jobs[job.id] = job
+    for job in jobs[:3]:
+        job.finished_at = 1.0
+    runner._forget_finished_jobs()
+    assert runner.all_jobs() == jobs[1:]
+
+
+def test_jobs_run_solo_unless_their_config_says_otherwise():
+    runner = RecordingRunner()
+    config = PodcastGenerationConfig(input_file="a.txt", output_folder="out")
+    assert runner.submit(config).config.host_mode == "solo"
+    shared = PodcastGenerationConfig(input_file="a.txt", output_folder="out", host_mode="shared")
+    assert runner.submit(shared).config.host_mode == "shared"
+
+
+def test_jobs_share_the_tts_worker_pool_of_their_model():
+    runner = RecordingRunner()
+    config = PodcastGenerationConfig(input_file="a.txt", output_folder="out", tts_workers=2)
+    try:
+        pool = runner._pool(config)
+        assert pool is not None
+        assert runner._pool(config.model_copy(update={"input_file": "b.txt"})) is pool
+        assert runner._pool(config.model_copy(update={"tts_workers": 1})) is None
+    finally:
+        runner.close()
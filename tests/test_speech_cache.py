@@ -0,0 +1,38 @@
+import numpy as np
+from inference.speech_cache import SpeechCache
+from utils import to_audio_dtype
+
+
+def test_hit_after_put_ignores_formatting(tmp_path):
+    cache = SpeechCache(tmp_path)
+    audio = np.linspace(-1.0, 1.0, 100, dtype=np.float32)
+    cache.put("model", "af_sarah", "Hello,  world!", 24000, audio)
+    cached = cache.get("model", "af_sarah", "Hello, world!\n", 24000)
+    np.testing.assert_allclose(cached, audio, atol=1e-4)
+    assert cache.get("model", "am_michael", "Hello, world!", 24000) is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_evicts_down_to_max_bytes(tmp_path):
+    cache = SpeechCache(tmp_path, max_bytes=1000)
+    for i in range(5):
+        cache.put("model", "af_sarah", f"turn {i}", 24000, np.zeros(200, dtype=np.float32))
+    sizes = [path.stat().st_size for path in tmp_path.glob("*.npy")]
+    assert sum(sizes) <= 1000
+    assert cache.get("model", "af_sarah", "turn 4", 24000) is not None
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_stores_the_same_samples_as_the_audio_file(tmp_path):
+    cache = SpeechCache(tmp_path)
+    audio = np.array([0.1, -0.2, 0.33333, 0.99999, -1.5], dtype=np.float32)
+    cache.put("model", "af_sarah", "Hello", 24000, audio)
+    cached = cache.get("model", "af_sarah", "Hello", 24000)
+    np.testing.assert_array_equal(to_audio_dtype(cached, np.int16), to_audio_dtype(audio, np.int16))
+
+
+def test_overwriting_a_segment_keeps_the_size(tmp_path):
+    cache = SpeechCache(tmp_path)
+    for _ in range(3):
+        cache.put("model", "af_sarah", "Hello", 24000, np.zeros(200, dtype=np.float32))
+    assert cache._size == sum(path.stat().st_size for path in tmp_path.glob("*.npy"))
@@ -0,0 +1,15 @@
+from fakes import FakeLlama
+from inference.text_to_text import PromptPrefixCache
+
+
+def test_prefix_cache_keeps_the_most_recently_used_states(monkeypatch):
+    monkeypatch.setattr(
+        "inference.text_to_text._system_prompt_tokens", lambda model, prompt: model.tokenize(prompt.encode())
+    )
+    cache = PromptPrefixCache(max_states=2)
+    for system_prompt in ("first prompt", "second prompt", "first prompt", "third prompt"):
+        cache.prime(FakeLlama("notes"), system_prompt)
+    assert len(cache._states) == 2
+    # The first prompt was used more recently than the second, so it was kept.
+    assert cache.prime(FakeLlama("notes"), "first prompt") == 0
+    assert cache.prime(FakeLlama("notes"), "second prompt") == 2
@@ -0,0 +1,39 @@
+import os
+
+import pytest
+from utils import atomic_path, atomic_write_text, evict_least_recently_used
+
+
+def test_atomic_write_text_replaces_the_file(tmp_path):
+    path = tmp_path / "index.json"
+    path.write_text("old")
+    atomic_write_text(path, "new")
+    assert path.read_text() == "new"
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def test_atomic_path_keeps_the_file_when_the_write_fails(tmp_path):
+    path = tmp_path / "turn.npy"
+    path.write_text("old")
+    with pytest.raises(RuntimeError), atomic_path(path) as tmp:
+        tmp.write_text("partial")
+        raise RuntimeError
+    assert path.read_text() == "old"
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def test_atomic_path_keeps_the_suffix(tmp_path):
+    with atomic_path(tmp_path / "podcast.wav") as tmp:
+        assert tmp.name.endswith(".wav.tmp")
+        tmp.write_bytes(b"")
+
+
+def test_evict_least_recently_used(tmp_path):
+    paths = []
+    for i in range(4):
+        path = tmp_path / f"{i}.npy"
+        path.write_bytes(b"x" * 10)
+        os.utime(path, (i, i))
+        paths.append(path)
+    assert evict_least_recently_used([*paths, tmp_path / "missing.npy"], max_bytes=25) == 20
+    assert [path.exists() for path in paths] == [False, False, True, True]
@@ -0,0 +1,20 @@
+import pytest
+from preprocessing.data_loaders import parse_page_range
+from validators import validate_pdf_pages
+
+
+@pytest.mark.parametrize("value", [None, "5", "1-50", "10-", "-3", "3-3", "01-2"])
+def test_valid_pdf_pages(value):
+    assert validate_pdf_pages(value) == value
+
+
+@pytest.mark.parametrize("value", ["", "-", "a", "1-2-3", "1,2", "5-3", "0", "0-2", "-0", "00-"])
+def test_invalid_pdf_pages(value):
+    with pytest.raises(ValueError, match="pdf_pages"):
+        validate_pdf_pages(value)
+
+
+def test_page_range_past_the_last_page_selects_nothing():
+    assert parse_page_range("2-", 3) == range(1, 3)
+    with pytest.raises(ValueError, match="selects no page"):
+        parse_page_range("5-8", 3)